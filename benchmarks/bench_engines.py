@@ -0,0 +1,129 @@
+"""
+Offline end-to-end benchmark of the threaded and async pipeline engines.
+
+Runs the whole pipeline (search pages, article pages, LLM calls and the wide
+CSV output) on --articles articles with both engines, against the local
+replay server (see replay_server.py) with --page-latency seconds added to
+every page and --chat-latency to every completion. Each engine's wall-clock
+time is compared with the bound set by the slowest dependency: the article
+pages at SCRAPER_MAX_WORKERS at a time, or the LLM calls at
+LLM_MAX_CONCURRENCY at a time. Caches, checkpoints and the dedup index are
+disabled so both engines do the same work, and their outputs are compared.
+
+Usage:
+    python benchmarks/bench_engines.py [--articles 1000] [--page-latency 0.1]
+                                       [--chat-latency 1] [--output results.json]
+"""
+
+import argparse
+import filecmp
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from bench_pipeline import RESULTS_DIR, git_commit  # noqa: E402
+from replay_server import ReplayServer  # noqa: E402
+
+
+def bench_engine(engine, articles, server, output_dir):
+    """Run the pipeline on `articles` articles and return the run's statistics."""
+    from async_pipeline import AsyncPipeline
+    from data_saver import DataSaver
+    from llm_processor import LLMProcessor
+    from metrics import METRICS
+    from pipeline import Pipeline
+    from scraper import Scraper
+
+    METRICS.reset()
+    scraper = Scraper(
+        cache=False,
+        requests_per_second=1e9,
+        adaptive=False,
+        base_url=server.url.rstrip("/"),
+    )
+    llm = LLMProcessor(api_key="replay", cache=False, api_url=server.url + "chat")
+    data_saver = DataSaver()
+    data_saver.output_dir = output_dir
+    pipeline_class = AsyncPipeline if engine == "async" else Pipeline
+    pipeline = pipeline_class(scraper, llm, data_saver, output_format="wide")
+    start = time.perf_counter()
+    summary = pipeline.run("breast cancer", (articles + 9) // 10)
+    seconds = time.perf_counter() - start
+    counters = METRICS.report()["counters"]
+    return {
+        "engine": engine,
+        "seconds": seconds,
+        "trials": summary["trials"],
+        "trials_per_second": summary["trials"] / seconds if seconds else None,
+        "llm_requests": counters.get("llm_requests", 0),
+        "output_file": summary["output_file"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=1000)
+    parser.add_argument("--page-latency", type=float, default=0.1)
+    parser.add_argument("--chat-latency", type=float, default=1)
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    fetch_workers = int(os.getenv("SCRAPER_MAX_WORKERS", 4))
+    llm_workers = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+    batches = (args.articles + 9) // int(os.getenv("LLM_TRIALS_PER_REQUEST", 10))
+    bound = max(
+        args.articles * args.page_latency / fetch_workers,
+        batches * args.chat_latency / llm_workers,
+    )
+    report = {
+        "benchmark": "bench_engines",
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "articles": args.articles,
+        "page_latency": args.page_latency,
+        "chat_latency": args.chat_latency,
+        "bound_seconds": bound,
+        "results": [],
+    }
+
+    with ReplayServer(
+        total_results=args.articles,
+        page_latency=args.page_latency,
+        chat_latency=args.chat_latency,
+    ) as server, tempfile.TemporaryDirectory() as tmp:
+        print(f"Slowest dependency bound: {bound:.2f}s")
+        print(
+            f"{'engine':>8} {'seconds':>8} {'trials':>7} {'trials/s':>9} {'x bound':>8}"
+        )
+        for engine in ("threads", "async"):
+            output_dir = os.path.join(tmp, engine)
+            result = bench_engine(engine, args.articles, server, output_dir)
+            report["results"].append(result)
+            print(
+                f"{engine:>8} {result['seconds']:8.2f} {result['trials']:>7} "
+                f"{result['trials_per_second']:9.1f} "
+                f"{result['seconds'] / bound if bound else 0:8.2f}"
+            )
+        threads, async_ = (result.pop("output_file") for result in report["results"])
+        report["same_output"] = filecmp.cmp(threads, async_, shallow=False)
+        print(f"Same output: {report['same_output']}")
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"bench_engines-{report['commit'] or 'unknown'}-"
+        f"{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Offline check and benchmark of the E-utilities source against the web pages.
+
+Lists and fetches --articles articles from the local replay server (see
+replay_server.py) twice: with Scraper, one search page per 10 articles and
+one article page per article, and with EutilsScraper, from the recorded
+esearch and efetch responses. Both runs are timed and their requests
+counted. For each PMID, the {title, abstract, url} record of EutilsScraper
+must match the one Scraper.scrape_article_page() extracts from the article
+page; abstracts are compared line by line, without the indentation of the
+page's HTML. The exit status is 1 if a record differs or is missing, so the
+script can guard the E-utilities parser in CI.
+
+Results are printed and written as JSON, by default to
+benchmarks/results/bench_eutils_source-<commit>-<time>.json.
+
+Usage:
+    python benchmarks/bench_eutils_source.py [--articles 200] [--batch-size 50]
+                                             [--output results.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from bench_pipeline import RESULTS_DIR, git_commit  # noqa: E402
+from replay_server import ReplayServer  # noqa: E402
+
+
+def normalized(record):
+    """Return a record with its abstract's lines stripped of extra whitespace."""
+    lines = (" ".join(line.split()) for line in record["abstract"].splitlines())
+    return dict(record, abstract="\n".join(line for line in lines if line))
+
+
+def scrape(scraper, articles, server):
+    """Return the records of `articles` articles and the run's statistics."""
+    before = dict(server.requests)
+    start = time.perf_counter()
+    records = list(scraper.iter_trials("breast cancer", (articles + 9) // 10))
+    seconds = time.perf_counter() - start
+    requests = sum(server.requests.values()) - sum(before.values())
+    return records, {"seconds": seconds, "records": len(records), "requests": requests}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    from eutils_source import EutilsScraper
+    from scraper import Scraper
+
+    report = {
+        "benchmark": "bench_eutils_source",
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "articles": args.articles,
+        "batch_size": args.batch_size,
+        "results": [],
+    }
+    with ReplayServer(total_results=args.articles) as server:
+        options = {
+            "cache": False,
+            "requests_per_second": 1e9,
+            "adaptive": False,
+            "base_url": server.url.rstrip("/"),
+        }
+        html_records, html_result = scrape(Scraper(**options), args.articles, server)
+        eutils = EutilsScraper(
+            eutils_url=server.url, batch_size=args.batch_size, **options
+        )
+        eutils_records, eutils_result = scrape(eutils, args.articles, server)
+
+    print(f"{'source':>8} {'seconds':>8} {'records':>8} {'requests':>9}")
+    for source, result in (("html", html_result), ("eutils", eutils_result)):
+        report["results"].append(dict(result, source=source))
+        print(
+            f"{source:>8} {result['seconds']:8.2f} {result['records']:>8} "
+            f"{result['requests']:>9}"
+        )
+
+    expected = {record["url"]: normalized(record) for record in html_records}
+    actual = {record["url"]: normalized(record) for record in eutils_records}
+    mismatches = []
+    for url in sorted(expected.keys() | actual.keys()):
+        if url not in actual or url not in expected:
+            mismatches.append({"url": url, "field": "record"})
+            continue
+        for field in ("title", "abstract", "url"):
+            if expected[url][field] != actual[url][field]:
+                mismatches.append({"url": url, "field": field})
+    report["mismatches"] = mismatches
+    report["ok"] = len(expected) == args.articles and not mismatches
+    for mismatch in mismatches[:10]:
+        url, field = mismatch["url"], mismatch["field"]
+        if field == "record":
+            print(f"{url}: only found by one source")
+        else:
+            print(f"{url} {field}: {expected[url][field]!r}")
+            print(f"{' ' * len(url)} != {actual[url][field]!r}")
+    print(
+        f"Records match for {len(expected)} articles"
+        if report["ok"]
+        else f"{len(mismatches)} mismatches"
+    )
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"bench_eutils_source-{report['commit'] or 'unknown'}-"
+        f"{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark of the HTML extractor backends.
+
+Parses the saved search and article page fixtures with every installed
+backend, checks that they all extract the same fields as BeautifulSoup
+(ignoring differences in whitespace between tags, which BeautifulSoup
+collapses), and reports pages per second.
+
+Usage:
+    python benchmarks/bench_html_extractors.py [--seconds S]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from html_extractors import BACKENDS  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def normalized(fields):
+    """Collapse whitespace runs so backends are compared on text content only."""
+    if isinstance(fields, (list, tuple)):
+        return [normalized(field) for field in fields]
+    return " ".join(fields.split()) if isinstance(fields, str) else fields
+
+
+def pages_per_second(func, html, seconds):
+    """Call func(html) repeatedly for about `seconds` and return the call rate."""
+    count = 0
+    start = time.perf_counter()
+    while True:
+        func(html)
+        count += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return count / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    article_html = load_fixture("article.html")
+    search_html = load_fixture("search.html")
+
+    expected = BACKENDS["soup"]()
+    expected_article = normalized(expected.article(article_html))
+    expected_links = expected.article_links(search_html)
+    expected_total = expected.total_results(search_html)
+
+    print(f"{'backend':>12} {'articles/s':>12} {'search pages/s':>16}")
+    for name, backend_class in BACKENDS.items():
+        try:
+            backend = backend_class()
+        except ImportError:
+            print(f"{name:>12} {'not installed':>12}")
+            continue
+
+        if (
+            normalized(backend.article(article_html)) != expected_article
+            or backend.article_links(search_html) != expected_links
+            or backend.total_results(search_html) != expected_total
+        ):
+            print(f"{name:>12} extracted different fields than soup")
+
+        articles = pages_per_second(backend.article, article_html, args.seconds)
+
+        def search_page(html):
+            backend.total_results(html)
+            backend.article_links(html)
+
+        searches = pages_per_second(search_page, search_html, args.seconds)
+        print(f"{name:>12} {articles:12.1f} {searches:16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Import-time budget of the CLI and the library modules.
+
+Imports each module but the pandas-based results_frame in a fresh interpreter
+with `python -X importtime` and BASE_URL unset, and reports the time spent
+importing it. requests is needed by every run, and asyncio by the async
+modules, so their import time is reported apart and not counted against
+the budget. A module fails the check when it can't be imported, when its own
+import time is over --budget-ms in the best of --repeat runs, or when it
+loads a dependency it should only import when it is used (pandas, bs4,
+dotenv...). The exit status is 1 if any module failed, so the script can
+guard startup time in CI.
+
+Results are printed and written as JSON, by default to
+benchmarks/results/bench_import_time-<commit>-<time>.json.
+
+Usage:
+    python benchmarks/bench_import_time.py [--budget-ms 50] [--repeat 5]
+                                           [--output results.json]
+"""
+
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import time
+
+from bench_pipeline import RESULTS_DIR, git_commit
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../src"))
+
+# pandas code, only imported by the writers that use it.
+EXCLUDED = ("results_frame",)
+
+# Dependencies that are always imported and not counted against the budget.
+EAGER_DEPENDENCIES = ("requests",)
+# Modules that must only be imported by the code that uses them.
+DEFERRED = ("pandas", "numpy", "bs4", "pyarrow", "aiohttp", "dotenv", "asyncio")
+# The deferred modules each library module is allowed to import. Like the
+# eager dependencies, they are not counted against the module's budget.
+ALLOWED = {
+    "async_llm_processor": {"asyncio"},
+    "async_pipeline": {"asyncio"},
+    "async_scraper": {"asyncio"},
+}
+
+
+def import_time(module):
+    """
+    Import `module` in a new interpreter and return its -X importtime report.
+
+    Returns:
+        dict: The module's total import time and that of its eager and
+            allowed dependencies in milliseconds, and the deferred modules it
+            loaded, or None if the import failed.
+    """
+    env = {k: v for k, v in os.environ.items() if k != "BASE_URL"}
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode:
+        return None
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times.setdefault(name.strip(), int(cumulative) / 1000)
+    dependencies = EAGER_DEPENDENCIES + tuple(ALLOWED.get(module, ()))
+    eager = sum(times.get(name, 0) for name in dependencies)
+    return {
+        "total_ms": times[module],
+        "eager_ms": eager,
+        "own_ms": times[module] - eager,
+        "deferred": sorted(
+            name
+            for name in DEFERRED
+            if name in times and name not in ALLOWED.get(module, ())
+        ),
+    }
+
+
+def library_modules():
+    """Return the names of the modules in src/ that are checked."""
+    modules = sorted(
+        os.path.splitext(os.path.basename(path))[0]
+        for path in glob.glob(os.path.join(SRC_DIR, "*.py"))
+        if not path.endswith("__init__.py")
+    )
+    return [module for module in modules if module not in EXCLUDED]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budget-ms", type=float, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    args = parser.parse_args()
+
+    modules = library_modules()
+    report = {
+        "benchmark": "bench_import_time",
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "budget_ms": args.budget_ms,
+        "results": [],
+    }
+    print(f"{'module':>20} {'own ms':>8} {'total ms':>9}  status")
+    for module in modules:
+        runs = [import_time(module) for _ in range(args.repeat)]
+        if None in runs:
+            result = {"module": module, "ok": False, "error": "import failed"}
+            print(f"{module:>20} {'':>8} {'':>9}  import failed")
+        else:
+            result = dict(min(runs, key=lambda run: run["own_ms"]), module=module)
+            problems = []
+            if result["own_ms"] > args.budget_ms:
+                problems.append("over budget")
+            if result["deferred"]:
+                problems.append("loads " + ", ".join(result["deferred"]))
+            result["ok"] = not problems
+            print(
+                f"{module:>20} {result['own_ms']:8.1f} {result['total_ms']:9.1f}  "
+                f"{'; '.join(problems) or 'ok'}"
+            )
+        report["results"].append(result)
+    report["ok"] = all(result["ok"] for result in report["results"])
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"bench_import_time-{report['commit'] or 'unknown'}-"
+        f"{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Offline check of the LLM request retries against a throttling API.
+
+Replays chat completions from the local replay server (see replay_server.py)
+whose first answers are throttling and server errors, through the sync
+LLMProcessor and the async AsyncLLMProcessor, and checks that:
+
+- recovers: a request answered 503, 429 and 500 before the completion
+  succeeds after exactly 4 attempts, waiting out the Retry-After delays;
+- gives up: a request answered 429 every time fails after exactly
+  --max-retries + 1 attempts, so the transport adds no retries of its own.
+
+The exit status is 1 if a check fails, so the script can guard the retry
+policy in CI. Results are printed and written as JSON, by default to
+benchmarks/results/bench_llm_retries-<commit>-<time>.json.
+
+Usage:
+    python benchmarks/bench_llm_retries.py [--max-retries 3] [--retry-after 0.2]
+                                           [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from bench_pipeline import RESULTS_DIR, git_commit  # noqa: E402
+from replay_server import ReplayServer  # noqa: E402
+
+
+def post(llm, engine, data):
+    """POST a completion with the given engine and return the decoded JSON."""
+    if engine == "threads":
+        return llm.post_completion(data)
+
+    from async_llm_processor import AsyncLLMProcessor
+    from transport import create_async_session
+
+    async def post_async():
+        async with create_async_session() as session:
+            return await AsyncLLMProcessor(llm, session).post_completion(data)
+
+    return asyncio.run(post_async())
+
+
+def run_case(engine, server, errors, max_retries):
+    """Request a completion answered with `errors` first and return the outcome."""
+    import requests
+
+    from llm_processor import LLMProcessor
+    from transport import create_session
+
+    llm = LLMProcessor(
+        api_key="replay",
+        cache=False,
+        api_url=server.url + "chat",
+        max_retries=max_retries,
+        session=create_session(),
+    )
+    data = {"model": "replay", "messages": llm._messages("Analyze the trials.")}
+    server.chat_errors.extend(errors)
+    attempts = server.requests["chat"]
+    error = None
+    start = time.perf_counter()
+    try:
+        post(llm, engine, data)
+    except requests.RequestException as e:
+        error = str(e)
+    seconds = time.perf_counter() - start
+    server.chat_errors.clear()
+    return {
+        "attempts": server.requests["chat"] - attempts,
+        "seconds": seconds,
+        "error": error,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--max-retries", type=int, default=3)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    # Keep the backoff of errors without Retry-After short.
+    os.environ.setdefault("LLM_BACKOFF_BASE", "0.05")
+
+    report = {
+        "benchmark": "bench_llm_retries",
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "max_retries": args.max_retries,
+        "retry_after": args.retry_after,
+        "results": [],
+    }
+    print(f"{'engine':>8} {'check':>9} {'attempts':>9} {'seconds':>8}  status")
+    with ReplayServer(chat_retry_after=args.retry_after) as server:
+        for engine in ("threads", "async"):
+            result = run_case(engine, server, [503, 429, 500], args.max_retries)
+            result.update(
+                engine=engine,
+                check="recovers",
+                ok=not result["error"]
+                and result["attempts"] == 4
+                and result["seconds"] >= 2 * args.retry_after,
+            )
+            report["results"].append(result)
+
+            result = run_case(
+                engine, server, [429] * (args.max_retries + 2), args.max_retries
+            )
+            result.update(
+                engine=engine,
+                check="gives up",
+                ok=bool(result["error"]) and result["attempts"] == args.max_retries + 1,
+            )
+            report["results"].append(result)
+    for result in report["results"]:
+        print(
+            f"{result['engine']:>8} {result['check']:>9} {result['attempts']:>9} "
+            f"{result['seconds']:8.2f}  {'ok' if result['ok'] else 'FAILED'}"
+        )
+    report["ok"] = all(result["ok"] for result in report["results"])
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"bench_llm_retries-{report['commit'] or 'unknown'}-"
+        f"{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""
+Offline check and benchmark of streamed LLM completions.
+
+Requests the recorded completion from the local replay server (see
+replay_server.py) as server-sent events, with --chunk-latency seconds before
+each 16-character chunk, through the sync LLMProcessor and the async
+AsyncLLMProcessor, and checks that:
+
+- early: the first on_line event arrives within the first quarter of the
+  stream, well before the completion is done;
+- abort: a stream of unrecognizable lines raises MalformedResponseError after
+  LLM_STREAM_ABORT_LINES lines, within the first half of the stream;
+- parity: the streamed content, its usage, its on_line events and its parsed
+  records are those of the same completion requested without streaming.
+
+The exit status is 1 if a check fails, so the script can guard streaming in
+CI. Results are printed and written as JSON, by default to
+benchmarks/results/bench_llm_stream-<commit>-<time>.json.
+
+Usage:
+    python benchmarks/bench_llm_stream.py [--chunk-latency 0.005]
+                                          [--abort-lines 40]
+                                          [--output results.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from bench_pipeline import RESULTS_DIR, git_commit  # noqa: E402
+from replay_server import STREAM_CHUNK_CHARS, ReplayServer  # noqa: E402
+
+# A reply that ignores the requested format, one STREAM_CHUNK_CHARS line per chunk.
+OFF_FORMAT_LINE = "Let me think...\n"
+
+
+def stream(llm, engine, data):
+    """Stream a completion with the given engine and return (content, usage)."""
+    if engine == "threads":
+        return llm.stream_completion(data)
+
+    from async_llm_processor import AsyncLLMProcessor
+    from transport import create_async_session
+
+    async def stream_async():
+        async with create_async_session() as session:
+            return await AsyncLLMProcessor(llm, session).stream_completion(data)
+
+    return asyncio.run(stream_async())
+
+
+def check_engine(engine, server, args):
+    """Run the early, abort and parity checks with one engine."""
+    from llm_processor import LLMProcessor, MalformedResponseError
+    from response_parser import ResponseIndexer
+
+    events = []
+    start = time.perf_counter()
+    llm = LLMProcessor(
+        api_key="replay",
+        cache=False,
+        api_url=server.url + "chat",
+        stream=True,
+        on_line=lambda event: events.append((time.perf_counter() - start, event)),
+    )
+    llm.stream_abort_lines = args.abort_lines
+    data = {"model": "replay", "messages": llm._messages("Analyze the trials.")}
+    results = []
+
+    # early: lines are handed to on_line while the completion still streams.
+    start = time.perf_counter()
+    content, usage = stream(llm, engine, data)
+    seconds = time.perf_counter() - start
+    first_line = events[0][0] if events else None
+    results.append(
+        {
+            "check": "early",
+            "seconds": seconds,
+            "first_line_seconds": first_line,
+            "ok": first_line is not None and first_line < seconds / 4,
+            "detail": f"first line after {first_line or 0:.3f}s of {seconds:.3f}s",
+        }
+    )
+
+    # parity: the same content, events and records as without streaming.
+    expected = llm.post_completion(data)
+    expected_content = expected["choices"][0]["message"]["content"]
+    indexer = ResponseIndexer()
+    expected_events = indexer.feed(expected_content) + indexer.close()
+    results.append(
+        {
+            "check": "parity",
+            "events": len(events),
+            "detail": f"{len(events)} line events",
+            "ok": content == expected_content
+            and usage == expected["usage"]
+            and [event for _, event in events] == expected_events
+            and llm.parse_llm_response([content])
+            == llm.parse_llm_response([expected_content]),
+        }
+    )
+
+    # abort: an off-format stream is abandoned after abort_lines lines.
+    completion = server.completion
+    server.completion = OFF_FORMAT_LINE * args.abort_lines * 10
+    full_stream = len(server.completion) / STREAM_CHUNK_CHARS * args.chunk_latency
+    error = None
+    start = time.perf_counter()
+    try:
+        stream(llm, engine, data)
+    except MalformedResponseError as e:
+        error = str(e)
+    finally:
+        server.completion = completion
+    seconds = time.perf_counter() - start
+    results.append(
+        {
+            "check": "abort",
+            "seconds": seconds,
+            "full_stream_seconds": full_stream,
+            "error": error,
+            "ok": error is not None and seconds < full_stream / 2,
+            "detail": f"abandoned after {seconds:.3f}s of {full_stream:.3f}s",
+        }
+    )
+    return [dict(result, engine=engine) for result in results]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--chunk-latency", type=float, default=0.005)
+    parser.add_argument("--abort-lines", type=int, default=40)
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    report = {
+        "benchmark": "bench_llm_stream",
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "chunk_latency": args.chunk_latency,
+        "abort_lines": args.abort_lines,
+        "results": [],
+    }
+    print(f"{'engine':>8} {'check':>7} {'status':>7}  details")
+    with ReplayServer(stream_chunk_latency=args.chunk_latency) as server:
+        for engine in ("threads", "async"):
+            for result in check_engine(engine, server, args):
+                report["results"].append(result)
+                print(
+                    f"{engine:>8} {result['check']:>7} "
+                    f"{'ok' if result['ok'] else 'FAILED':>7}  {result['detail']}"
+                )
+    report["ok"] = all(result["ok"] for result in report["results"])
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"bench_llm_stream-{report['commit'] or 'unknown'}-"
+        f"{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+    sys.exit(0 if report["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Micro-benchmark of the LLM response parser.
+
+Compares the single-pass indexed parser used by LLMProcessor.parse_llm_response
+with the previous parser, which scanned every line once per question prefix,
+on large synthetic responses.
+
+Usage:
+    python benchmarks/bench_parse_llm_response.py [--groups N] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from response_parser import parse_response  # noqa: E402
+
+
+def synthetic_response(trials, groups, filler_lines):
+    """Build an LLM response with the given number of trials and study groups."""
+    lines = ["1. How many Clinical Trials are there?", f"1A. {trials}"]
+    lines += [
+        f"Trial{t}-Info: NCT{t:08d}: Synthetic trial {t}: {100 + t}"
+        for t in range(1, trials + 1)
+    ]
+    for i in range(2, 10):
+        lines += [f"{i}. Trial question {i}?", f"{i}A. Trial answer {i}"]
+    lines += [f"Group{g}: Cohort {g}: None: Arm {g}" for g in range(1, groups + 1)]
+    for g in range(1, groups + 1):
+        for i in range(1, 25):
+            lines += [f"Group{g}-{i}. Group question {i}?", f"Group{g}-{i}A. Answer"]
+    lines += [f"Additional commentary line {i}." for i in range(filler_lines)]
+    return "\n".join(lines)
+
+
+# The parser as it was before the single-pass index, kept for comparison.
+
+
+def legacy_parse_llm_response(responses):
+    parsed_data = {
+        "Trial Identification": [],
+        "Trial Questions": [],
+        "Study Groups": [],
+        "Group Questions": [],
+    }
+
+    for response in responses:
+        lines = response.split("\n")
+
+        # Parse Trial Identification
+        trial_count_line = next((line for line in lines if line.startswith("1A.")), "")
+        trial_count = (
+            trial_count_line.split(".")[-1].strip() if trial_count_line else "NA"
+        )
+        parsed_data["Trial Identification"].append(
+            f"1,How many Clinical Trials are there?,,\n1A,{trial_count},,\n,,,"
+        )
+
+        # Parse Trial Info
+        for line in lines:
+            if line.startswith("Trial"):
+                parts = line.split(":")
+                if len(parts) >= 4:
+                    parsed_data["Trial Identification"].append(
+                        f'{parts[0]},{parts[1]}," {parts[2]}",{parts[-1]}'
+                    )
+                elif len(parts) == 3:
+                    parsed_data["Trial Identification"].append(
+                        f'{parts[0]},{parts[1]}," {parts[2]}",NA'
+                    )
+                else:
+                    parsed_data["Trial Identification"].append(f"{parts[0]},NA,NA,NA")
+
+        # Parse Trial Questions
+        trial_questions = []
+        for i in range(1, 10):  # Assuming 9 trial questions
+            question_line = next(
+                (line for line in lines if line.startswith(f"{i}.")), ""
+            )
+            answer_line = next(
+                (line for line in lines if line.startswith(f"{i}A.")), ""
+            )
+
+            question = question_line.split(".", 1)[1].strip() if question_line else "NA"
+            answer = answer_line.split(".", 1)[1].strip() if answer_line else "NA"
+
+            trial_questions.append(f'{i}," {question}",,\n{i}A," {answer}",,')
+        parsed_data["Trial Questions"].extend(trial_questions)
+
+        # Parse Study Groups
+        study_groups = [
+            line for line in lines if line.startswith("Group") and ":" in line
+        ]
+        parsed_data["Study Groups"].extend(study_groups)
+
+        # Parse Group Questions
+        group_questions = []
+        for i in range(1, 25):  # Assuming 24 group questions
+            question_line = next(
+                (line for line in lines if line.startswith(f"Group1-{i}.")), ""
+            )
+            answer_line = next(
+                (line for line in lines if line.startswith(f"Group1-{i}A.")), ""
+            )
+
+            question = question_line.split(".", 1)[1].strip() if question_line else "NA"
+            answer = answer_line.split(".", 1)[1].strip() if answer_line else "NA"
+
+            group_questions.append(
+                f'Group1-{i}," {question}",,\nGroup1-{i}A," {answer}",,'
+            )
+        parsed_data["Group Questions"].extend(group_questions)
+
+    return parsed_data
+
+
+def legacy_scan_all_groups(responses, groups):
+    """The legacy per-prefix scan extended to every group, for a like-for-like cost."""
+    parsed_data = legacy_parse_llm_response(responses)
+    for response in responses:
+        lines = response.split("\n")
+        for g in range(2, groups + 1):
+            for i in range(1, 25):
+                next((line for line in lines if line.startswith(f"Group{g}-{i}.")), "")
+                next((line for line in lines if line.startswith(f"Group{g}-{i}A.")), "")
+    return parsed_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--groups", type=int, default=20)
+    parser.add_argument("--filler", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    response = synthetic_response(args.trials, args.groups, args.filler)
+    print(
+        f"Response: {len(response.splitlines())} lines, "
+        f"{args.trials} trials, {args.groups} groups"
+    )
+    for name, func in (
+        ("legacy (Group1 only)", lambda: legacy_parse_llm_response([response])),
+        (
+            "legacy (all groups)",
+            lambda: legacy_scan_all_groups([response], args.groups),
+        ),
+        ("indexed", lambda: parse_response(response)),
+    ):
+        best = min(timeit.repeat(func, number=1, repeat=args.repeat))
+        print(f"{name:>20}: {best * 1000:8.2f} ms per response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Offline end-to-end benchmark of the pipeline stages.
+
+Replays the recorded PubMed pages and LLM completion from benchmarks/fixtures
+through a local server (see replay_server.py), then measures the throughput of
+Scraper.scrape, LLMProcessor.create_prompt and process_trials,
+parse_llm_response and format_parsed_data_as_csv, and the DataSaver writers
+at each article count. Caches are disabled so every run does the same work.
+
+Results are printed and written as JSON, by default to
+benchmarks/results/bench_pipeline-<commit>-<time>.json, so runs of different
+versions can be compared.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--sizes 10 100 1000] [--repeat N]
+                                        [--output results.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from replay_server import ReplayServer  # noqa: E402
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def best_of(repeat, func):
+    """Run func() `repeat` times; return the fastest time and the last result."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_size(size, repeat, server):
+    """Benchmark every stage on `size` articles and return {stage: result}."""
+    from data_saver import DataSaver, ParquetTrialWriter, WideCsvWriter
+    from llm_processor import LLMProcessor
+    from scraper import Scraper
+    from trial_store import TrialStore
+
+    scraper = Scraper(
+        cache=False, requests_per_second=1e9, base_url=server.url.rstrip("/")
+    )
+    llm = LLMProcessor(api_key="replay", cache=False, api_url=server.url + "chat")
+    results = {}
+
+    def record(stage, seconds, items):
+        results[stage] = {
+            "seconds": seconds,
+            "items": items,
+            "items_per_second": items / seconds if seconds else None,
+        }
+
+    def scrape():
+        filepath = scraper.scrape("breast cancer", (size + 9) // 10)
+        with TrialStore(filepath) as store:
+            trials = [record.to_dict() for record in store]
+        os.remove(filepath)
+        return trials
+
+    seconds, trials = best_of(repeat, scrape)
+    trials = trials[:size]
+    record("scrape", seconds, len(trials))
+
+    batches = llm.batcher.batches(trials)
+    seconds, _ = best_of(repeat, lambda: [llm.create_prompt(b) for b in batches])
+    record("create_prompt", seconds, len(trials))
+
+    seconds, responses = best_of(
+        repeat, lambda: [llm.process_trials(b) for b in batches]
+    )
+    record("process_trials", seconds, len(trials))
+
+    seconds, parsed = best_of(
+        repeat, lambda: [llm.parse_llm_response([r]) for r in responses]
+    )
+    record("parse_llm_response", seconds, len(responses))
+
+    seconds, csv_chunks = best_of(
+        repeat, lambda: [llm.format_parsed_data_as_csv(p) for p in parsed]
+    )
+    record("format_parsed_data_as_csv", seconds, len(parsed))
+
+    urls = [" ".join(trial["url"] for trial in batch) for batch in batches]
+    with tempfile.TemporaryDirectory() as tmp:
+        data_saver = DataSaver()
+        data_saver.output_dir = tmp
+
+        def sections_csv():
+            data_saver.save_csv_string(csv_chunks[0] + "\n", "sections.csv")
+            for chunk in csv_chunks[1:]:
+                data_saver.append_csv_string(chunk, "sections.csv")
+
+        seconds, _ = best_of(repeat, sections_csv)
+        record("write_sections_csv", seconds, len(csv_chunks))
+
+        def write_all(writer):
+            for url, parsed_data in zip(urls, parsed):
+                writer.write(url, parsed_data)
+            writer.close()
+
+        seconds, _ = best_of(
+            repeat,
+            lambda: write_all(
+                WideCsvWriter(os.path.join(tmp, f"{time.time_ns()}.csv"))
+            ),
+        )
+        record("write_wide_csv", seconds, len(parsed))
+
+        try:
+            seconds, _ = best_of(
+                repeat,
+                lambda: write_all(ParquetTrialWriter(os.path.join(tmp, "parquet"))),
+            )
+            record("write_parquet", seconds, len(parsed))
+        except ImportError:
+            print("pyarrow is not installed; skipping the Parquet writer.")
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    report = {
+        "benchmark": "bench_pipeline",
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": {},
+    }
+
+    with ReplayServer(total_results=max(args.sizes)) as server:
+        os.environ.setdefault("MODEL", "replay")
+        print(f"{'articles':>8} {'stage':>26} {'seconds':>9} {'items/s':>10}")
+        for size in args.sizes:
+            results = bench_size(size, args.repeat, server)
+            report["results"][str(size)] = results
+            for stage, result in results.items():
+                print(
+                    f"{size:>8} {stage:>26} {result['seconds']:9.4f} "
+                    f"{result['items_per_second'] or 0:10.1f}"
+                )
+        report["requests"] = server.requests
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"bench_pipeline-{report['commit'] or 'unknown'}-"
+        f"{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Offline benchmark of the scraper's politeness against a throttling server.
+
+Replays the recorded PubMed pages from a local server (see replay_server.py)
+that answers 429 to anything above --throttle-rate requests per second, and
+scrapes the same pages with a fixed rate limiter at --start-rate, a fixed
+limiter at --fast-rate, and the adaptive (AIMD) limiter starting at
+--start-rate. For each it reports the time taken, the articles scraped, the
+429 responses the server sent, the search pages retried and the limiter's
+final rate. Caches are disabled so every run does the same work.
+
+Usage:
+    python benchmarks/bench_politeness.py [--pages 10] [--throttle-rate 15]
+                                          [--start-rate 2] [--fast-rate 50]
+                                          [--output results.json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../src"))
+
+from bench_pipeline import RESULTS_DIR, git_commit  # noqa: E402
+from replay_server import ReplayServer  # noqa: E402
+
+
+def bench_limiter(name, pages, rate, adaptive, server):
+    """Scrape `pages` search pages and return the run's statistics."""
+    from metrics import METRICS
+    from scraper import Scraper
+
+    METRICS.reset()
+    throttled_before = server.requests["throttled"]
+    scraper = Scraper(
+        cache=False,
+        requests_per_second=rate,
+        adaptive=adaptive,
+        base_url=server.url.rstrip("/"),
+    )
+    start = time.perf_counter()
+    articles = sum(1 for _ in scraper.iter_trials("breast cancer", pages))
+    seconds = time.perf_counter() - start
+    counters = METRICS.report()["counters"]
+    host_stats = next(iter(scraper.rate_limiter.stats().values()), {})
+    return {
+        "limiter": name,
+        "seconds": seconds,
+        "articles": articles,
+        "articles_per_second": articles / seconds if seconds else None,
+        "throttled": server.requests["throttled"] - throttled_before,
+        "pages_retried": counters.get("pages_retried", 0),
+        "final_rate": host_stats.get("rate"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--throttle-rate", type=float, default=15)
+    parser.add_argument("--start-rate", type=float, default=2)
+    parser.add_argument("--fast-rate", type=float, default=50)
+    parser.add_argument("--output", help="Where to write the JSON results.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    report = {
+        "benchmark": "bench_politeness",
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "pages": args.pages,
+        "throttle_rate": args.throttle_rate,
+        "results": [],
+    }
+
+    with ReplayServer(
+        total_results=args.pages * 10, throttle_rate=args.throttle_rate
+    ) as server:
+        os.environ.setdefault("SCRAPER_MAX_REQUESTS_PER_SECOND", str(args.fast_rate))
+        runs = [
+            (f"fixed {args.start_rate:g}/s", args.start_rate, False),
+            (f"fixed {args.fast_rate:g}/s", args.fast_rate, False),
+            (f"adaptive from {args.start_rate:g}/s", args.start_rate, True),
+        ]
+        print(
+            f"{'limiter':>20} {'seconds':>8} {'articles':>8} {'429s':>6} "
+            f"{'retried':>7} {'final rate':>10}"
+        )
+        for name, rate, adaptive in runs:
+            result = bench_limiter(name, args.pages, rate, adaptive, server)
+            report["results"].append(result)
+            print(
+                f"{name:>20} {result['seconds']:8.2f} {result['articles']:>8} "
+                f"{result['throttled']:>6} {result['pages_retried']:>7} "
+                f"{result['final_rate']:10.2f}"
+            )
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"bench_politeness-{report['commit'] or 'unknown'}-"
+        f"{time.strftime('%Y%m%d-%H%M%S')}.json",
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
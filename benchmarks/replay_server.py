@@ -0,0 +1,279 @@
+"""
+Local replay server for offline benchmarks.
+
+Serves the recorded fixtures in place of PubMed and the OpenRouter API:
+
+- GET /?term=...&page=N   fixtures/search.html, with the result count and the
+                          10 article links rewritten for page N
+- GET /<pmid>/            fixtures/article.html, with the PMID in the title
+- POST /chat              fixtures/completion.txt as a chat completion, or as
+                          server-sent events of STREAM_CHUNK_CHARS characters
+                          when the request asks for "stream": true
+- GET /esearch.fcgi       fixtures/esearch.json, with the result count and the
+                          PMIDs of retstart and retmax
+- GET /efetch.fcgi?id=... fixtures/efetch.xml, with one article per PMID
+
+Point BASE_URL at server.url and OPENROUTER_API_URL at server.url + "chat",
+and EUTILS_URL at server.url for the E-utilities source. PMIDs are listed in
+the same order by the search pages and by esearch, and the efetch articles
+have the titles and abstracts of the article pages.
+With throttle_rate set, GET requests above that many per second are answered
+with 429 Too Many Requests and a Retry-After header, like a server that
+throttles on purpose. page_latency and chat_latency delay every page and
+chat completion response by that many seconds, like a slow remote server, and
+stream_chunk_latency delays every event of a streamed completion. The
+completion attribute can be replaced to stream another text. chat_errors
+lists the statuses of the next chat requests, e.g. [503, 429], so the LLM
+retries can be replayed; 429 and 503 responses carry a Retry-After header of
+chat_retry_after seconds.
+"""
+
+import http
+import http.server
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+FIRST_PMID = 38000000
+LINK_PATTERN = re.compile(r'href="/(\d+)/"')
+COUNT_PATTERN = re.compile(r'(<div class="results-amount"><span class="value">)[\d,]+')
+TITLE_PATTERN = re.compile(r'(<h1 class="heading-title">\s*)')
+EFETCH_ARTICLE = re.compile(r"  <PubmedArticle>.*</PubmedArticle>\n", re.S)
+EFETCH_PMID = "38000000"
+STREAM_CHUNK_CHARS = 16
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+class ReplayServer:
+    """
+    A threaded HTTP server replaying the fixtures for `total_results` articles.
+
+    Use it as a context manager; request counts are kept in `requests`.
+    """
+
+    def __init__(
+        self,
+        total_results=1000,
+        port=0,
+        throttle_rate=None,
+        page_latency=0,
+        chat_latency=0,
+        stream_chunk_latency=0,
+        chat_errors=(),
+        chat_retry_after=1,
+    ):
+        self.total_results = total_results
+        self.throttle_rate = throttle_rate
+        self.page_latency = page_latency
+        self.chat_latency = chat_latency
+        self.stream_chunk_latency = stream_chunk_latency
+        self.chat_errors = deque(chat_errors)
+        self.chat_retry_after = chat_retry_after
+        self.recent = deque()
+        self.lock = threading.Lock()
+        self.search_html = COUNT_PATTERN.sub(
+            rf"\g<1>{total_results:,}", load_fixture("search.html")
+        )
+        self.article_html = load_fixture("article.html")
+        self.completion = load_fixture("completion.txt")
+        self.esearch = json.loads(load_fixture("esearch.json"))
+        efetch = load_fixture("efetch.xml")
+        match = EFETCH_ARTICLE.search(efetch)
+        self.efetch_head = efetch[: match.start()]
+        self.efetch_article = match.group()
+        self.efetch_tail = efetch[match.end() :]
+        self.requests = {
+            "search": 0,
+            "article": 0,
+            "chat": 0,
+            "esearch": 0,
+            "efetch": 0,
+            "throttled": 0,
+            "chat_errors": 0,
+        }
+        self.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", port), self._handler_class()
+        )
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+
+    def throttled(self):
+        """Return True if a GET now would exceed throttle_rate over the last second."""
+        if not self.throttle_rate:
+            return False
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and self.recent[0] <= now - 1:
+                self.recent.popleft()
+            if len(self.recent) >= self.throttle_rate:
+                self.requests["throttled"] += 1
+                return True
+            self.recent.append(now)
+            return False
+
+    def chat_error(self):
+        """Return the status to answer the next chat request with, or None."""
+        with self.lock:
+            if not self.chat_errors:
+                return None
+            self.requests["chat_errors"] += 1
+            return self.chat_errors.popleft()
+
+    def search_page(self, page):
+        first = FIRST_PMID + (page - 1) * 10
+        links = iter(range(first, first + 10))
+        return LINK_PATTERN.sub(lambda m: f'href="/{next(links)}/"', self.search_html)
+
+    def article_page(self, pmid):
+        return TITLE_PATTERN.sub(rf"\g<1>[{pmid}] ", self.article_html, count=1)
+
+    def esearch_result(self, retstart, retmax):
+        first = FIRST_PMID + retstart
+        last = FIRST_PMID + min(retstart + retmax, self.total_results)
+        result = dict(
+            self.esearch["esearchresult"],
+            count=str(self.total_results),
+            retmax=str(max(0, last - first)),
+            retstart=str(retstart),
+            idlist=[str(pmid) for pmid in range(first, last)],
+        )
+        return dict(self.esearch, esearchresult=result)
+
+    def efetch_result(self, pmids):
+        articles = (
+            self.efetch_article.replace(EFETCH_PMID, pmid).replace(
+                "<ArticleTitle>", f"<ArticleTitle>[{pmid}] ", 1
+            )
+            for pmid in pmids
+        )
+        return self.efetch_head + "".join(articles) + self.efetch_tail
+
+    def chat_completion(self, request_body):
+        prompt = request_body["messages"][-1]["content"]
+        return {
+            "choices": [{"message": {"role": "assistant", "content": self.completion}}],
+            "usage": {
+                "prompt_tokens": len(prompt) // 4,
+                "completion_tokens": len(self.completion) // 4,
+                "total_tokens": (len(prompt) + len(self.completion)) // 4,
+            },
+        }
+
+    def completion_events(self, request_body):
+        """Yield the server-sent events of the completion, chunk by chunk."""
+        completion = self.completion
+        for i in range(0, len(completion), STREAM_CHUNK_CHARS):
+            delta = completion[i : i + STREAM_CHUNK_CHARS]
+            yield {"choices": [{"index": 0, "delta": {"content": delta}}]}
+        yield {
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "usage": self.chat_completion(request_body)["usage"],
+        }
+
+    def _handler_class(self):
+        replay = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are separate writes; without this, Nagle's
+            # algorithm and delayed ACKs add ~40 ms to every keep-alive request.
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, content_type):
+                body = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, events):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    self.wfile.write(b": PROCESSING\n\n")
+                    for event in events:
+                        time.sleep(replay.stream_chunk_latency)
+                        self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client abandoned the stream.
+                    pass
+
+            def _send_error(self, status, retry_after=None):
+                body = http.HTTPStatus(status).phrase.encode("utf-8")
+                self.send_response(status)
+                if retry_after is not None:
+                    self.send_header("Retry-After", str(retry_after))
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if replay.throttled():
+                    self._send_error(429, retry_after=1)
+                    return
+                time.sleep(replay.page_latency)
+                url = urlsplit(self.path)
+                query = parse_qs(url.query)
+                pmid = url.path.strip("/")
+                if url.path.endswith("/esearch.fcgi"):
+                    replay.requests["esearch"] += 1
+                    result = replay.esearch_result(
+                        int(query.get("retstart", ["0"])[0]),
+                        int(query.get("retmax", ["20"])[0]),
+                    )
+                    self._send(json.dumps(result), "application/json")
+                elif url.path.endswith("/efetch.fcgi"):
+                    replay.requests["efetch"] += 1
+                    pmids = query.get("id", [""])[0].split(",")
+                    self._send(replay.efetch_result(pmids), "text/xml")
+                elif pmid.isdigit():
+                    replay.requests["article"] += 1
+                    self._send(replay.article_page(pmid), "text/html")
+                else:
+                    replay.requests["search"] += 1
+                    page = int(query.get("page", ["1"])[0])
+                    self._send(replay.search_page(page), "text/html")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                request_body = json.loads(self.rfile.read(length))
+                replay.requests["chat"] += 1
+                time.sleep(replay.chat_latency)
+                status = replay.chat_error()
+                if status:
+                    throttling = status in (429, 503)
+                    retry_after = replay.chat_retry_after if throttling else None
+                    self._send_error(status, retry_after)
+                    return
+                if request_body.get("stream"):
+                    self._stream(replay.completion_events(request_body))
+                    return
+                response = replay.chat_completion(request_body)
+                self._send(json.dumps(response), "application/json")
+
+        return Handler
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,212 @@
+import logging
+import re
+import threading
+
+from batching import estimate_tokens
+from metrics import METRICS
+from settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Placeholders the scrapers store when an article has no abstract.
+PLACEHOLDER_ABSTRACTS = {"abstract not available", "no abstract available"}
+
+# Runs of horizontal whitespace, including the non-breaking spaces of the HTML.
+SPACES = re.compile(r"[^\S\n]+")
+
+# From a copyright notice to the end of its line, e.g.
+# "© 2023 The Authors. Published by Elsevier Ltd." or "Copyright © 2021 Wiley".
+COPYRIGHT = re.compile(
+    r"(?:©|\(c\)\s*\d{4}|\bcopyright\b).*$", re.IGNORECASE | re.MULTILINE
+)
+RIGHTS_RESERVED = re.compile(r"\s*\ball rights reserved\b\.?", re.IGNORECASE)
+
+# A trial registration section, with or without a "Label:" prefix.
+REGISTRATION = re.compile(
+    r"^(?:clinical )?trials? registration(?: number| no\.?| information)?\b.*$|"
+    r"^registration\b.*$|"
+    r"^clinicaltrials\.gov (?:identifier|id)\b.*$",
+    re.IGNORECASE | re.MULTILINE,
+)
+REGISTRY_ID = re.compile(
+    r"\b(?:NCT\d{8}|ISRCTN\d{8}|ACTRN\d{14}|ChiCTR[-\w]*\d+|DRKS\d{8}"
+    r"|CTRI/\d{4}/\d+/\d+|EudraCT[\s:]*\d{4}-\d{6}-\d{2}|\d{4}-\d{6}-\d{2}"
+    r"|JPRN-\w+|IRCT\w+|UMIN\d{9}|NTR\d+|PACTR\d+|KCT\d{7})\b",
+    re.IGNORECASE,
+)
+
+RCT_KEYWORDS = (
+    r"\brandomi[sz](?:ed|ation)\b|\brandomly\b|\bplacebo\b|\bcontrolled trial\b"
+    r"|\b(?:double|single|triple)[- ]blind(?:ed)?\b|\bcrossover\b|\ballocat(?:ed|ion)\b"
+)
+
+
+class AbstractFilter:
+    """
+    A pre-LLM stage that drops unusable records and compacts the rest.
+
+    Records without a usable abstract (the scrapers' "Abstract not available"
+    placeholder, or one shorter than min_chars) are dropped. Whitespace is
+    collapsed, copyright notices are removed and trial registration sections
+    are reduced to their registry IDs, which the prompt still asks for. When
+    require_rct is set, abstracts without any randomized-trial keyword are
+    dropped as well. The tokens removed are counted for the run report.
+    """
+
+    def __init__(
+        self, min_chars=None, strip_boilerplate=None, require_rct=None, rct_pattern=None
+    ):
+        """
+        Initialize the filter.
+
+        Args:
+            min_chars (int): Shortest abstract, after cleaning, that is sent.
+                Defaults to the ABSTRACT_MIN_CHARS env var, or 100.
+            strip_boilerplate (bool): Remove copyright notices and shorten
+                trial registration sections. Defaults to the
+                ABSTRACT_STRIP_BOILERPLATE env var, or True.
+            require_rct (bool): Drop abstracts that match no RCT keyword.
+                Defaults to the ABSTRACT_REQUIRE_RCT env var, or False.
+            rct_pattern (str): Case-insensitive regex of the RCT keywords.
+                Defaults to the ABSTRACT_RCT_PATTERN env var, or RCT_KEYWORDS.
+        """
+        if min_chars is None:
+            min_chars = int(SETTINGS.get("ABSTRACT_MIN_CHARS", 100))
+        self.min_chars = min_chars
+        if strip_boilerplate is None:
+            strip_boilerplate = (
+                SETTINGS.get("ABSTRACT_STRIP_BOILERPLATE", "true").lower() != "false"
+            )
+        self.strip_boilerplate = strip_boilerplate
+        if require_rct is None:
+            require_rct = SETTINGS.get("ABSTRACT_REQUIRE_RCT", "false").lower() in (
+                "1",
+                "true",
+            )
+        self.require_rct = require_rct
+        self.rct_pattern = re.compile(
+            rct_pattern or SETTINGS.get("ABSTRACT_RCT_PATTERN") or RCT_KEYWORDS,
+            re.IGNORECASE,
+        )
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear the counters."""
+        with self.lock:
+            self.counts = {"records": 0, "kept": 0, "dropped": {}}
+            self.chars_removed = 0
+            self.tokens_before = 0
+            self.tokens_after = 0
+
+    def clean(self, abstract):
+        """
+        Normalize an abstract's whitespace and strip its boilerplate.
+
+        Args:
+            abstract (str): The scraped abstract.
+
+        Returns:
+            str: The compacted abstract, one section per line.
+        """
+        text = self._collapse(abstract)
+        if self.strip_boilerplate:
+            text = COPYRIGHT.sub("", text)
+            text = RIGHTS_RESERVED.sub("", text)
+            text = REGISTRATION.sub(self._registration, text)
+            text = self._collapse(text)
+        return text
+
+    @staticmethod
+    def _collapse(text):
+        lines = (SPACES.sub(" ", line).strip() for line in text.split("\n"))
+        return "\n".join(line for line in lines if line)
+
+    @staticmethod
+    def _registration(match):
+        ids = dict.fromkeys(m.group(0) for m in REGISTRY_ID.finditer(match.group(0)))
+        return f"Registration: {', '.join(ids)}" if ids else ""
+
+    def check(self, trial):
+        """
+        Clean a record, or tell why it is dropped.
+
+        Args:
+            trial (dict): A dictionary containing the trial's title and abstract.
+
+        Returns:
+            tuple: (compacted copy of the record, None), or (None, reason) with
+                reason "no_abstract", "too_short" or "not_rct".
+        """
+        abstract = trial["abstract"] or ""
+        if abstract.strip().rstrip(".").lower() in PLACEHOLDER_ABSTRACTS:
+            return None, "no_abstract"
+        abstract = self.clean(abstract)
+        if len(abstract) < self.min_chars:
+            return None, "too_short"
+        title = SPACES.sub(" ", trial["title"] or "").strip()
+        if self.require_rct and not self.rct_pattern.search(f"{title}\n{abstract}"):
+            return None, "not_rct"
+        return dict(trial, title=title, abstract=abstract), None
+
+    def iter_filter(self, trials, on_drop=None):
+        """
+        Yield the compacted records that are worth sending to the LLM.
+
+        Args:
+            trials (iterable): Dictionaries containing trial data.
+            on_drop (callable): Called with each dropped record and the reason.
+
+        Yields:
+            dict: The compacted records, in their original order.
+        """
+        for trial in trials:
+            title, abstract = trial["title"] or "", trial["abstract"] or ""
+            before = estimate_tokens(title) + estimate_tokens(abstract)
+            chars = len(title) + len(abstract)
+            cleaned, reason = self.check(trial)
+            after = 0
+            if cleaned:
+                after = estimate_tokens(cleaned["title"]) + estimate_tokens(
+                    cleaned["abstract"]
+                )
+                chars -= len(cleaned["title"]) + len(cleaned["abstract"])
+            with self.lock:
+                self.counts["records"] += 1
+                self.chars_removed += chars
+                self.tokens_before += before
+                self.tokens_after += after
+                if reason:
+                    dropped = self.counts["dropped"]
+                    dropped[reason] = dropped.get(reason, 0) + 1
+                else:
+                    self.counts["kept"] += 1
+            METRICS.incr("prefilter_tokens_removed", before - after)
+            if reason:
+                METRICS.incr("prefilter_dropped")
+                logger.debug(f"Not sending {trial.get('url')} to the LLM: {reason}")
+                if on_drop:
+                    on_drop(trial, reason)
+                continue
+            yield cleaned
+
+    def stats(self):
+        """
+        Return what the filter removed so far.
+
+        Returns:
+            dict: Records seen and kept, drops per reason, the characters
+                removed, and the estimated tokens before and after filtering
+                and their difference. Whitespace doesn't count towards the
+                token estimate, so its removal only shows in the characters.
+        """
+        with self.lock:
+            return {
+                "records": self.counts["records"],
+                "kept": self.counts["kept"],
+                "dropped": dict(self.counts["dropped"]),
+                "chars_removed": self.chars_removed,
+                "tokens_before": self.tokens_before,
+                "tokens_after": self.tokens_after,
+                "tokens_removed": self.tokens_before - self.tokens_after,
+            }
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+
+import requests
+
+from llm_processor import CompletionStream, MalformedResponseError
+from metrics import METRICS
+from transport import BufferedResponse, async_errors
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLLMProcessor:
+    """
+    The asyncio counterpart of LLMProcessor, for the async pipeline engine.
+
+    Chat completions are requested over an aiohttp session, at most
+    max_concurrency at a time. Prompts, the cache, the abstract filter, the
+    batcher, retries and streaming follow the wrapped LLMProcessor, so both
+    engines send the same requests. Structured output, with its per-trial
+    re-requests, runs the sync implementation in a worker thread.
+    """
+
+    def __init__(self, llm_processor, session, max_concurrency=None):
+        """
+        Initialize the processor.
+
+        Args:
+            llm_processor (LLMProcessor): The processor whose settings and
+                helpers are used.
+            session (aiohttp.ClientSession): The session, see
+                transport.create_async_session().
+            max_concurrency (int): Maximum number of LLM requests in flight.
+                Defaults to the LLM processor's dispatcher setting
+                (LLM_MAX_CONCURRENCY).
+        """
+        self.llm = llm_processor
+        self.session = session
+        self.semaphore = asyncio.Semaphore(
+            max_concurrency or llm_processor.dispatcher.max_concurrency
+        )
+
+    async def process_trials(self, trials_data):
+        """
+        Process a batch of trials with the LLM, like LLMProcessor.process_trials.
+
+        Args:
+            trials_data (list): A list of dictionaries containing trial data.
+
+        Returns:
+            str: The LLM's response, or None if the request failed.
+        """
+        llm = self.llm
+        async with self.semaphore:
+            if llm.structured:
+                return await asyncio.to_thread(llm.process_trials, trials_data)
+            with METRICS.timer("process_trials"):
+                try:
+                    # The cache lookup and store are SQLite I/O, so they run
+                    # in worker threads.
+                    data, cache_key, cached = await asyncio.to_thread(
+                        llm.begin_completion, trials_data
+                    )
+                    if cached is not None:
+                        return cached
+                    if llm.stream:
+                        content, usage = await self.stream_completion(data)
+                    else:
+                        response_json = await self.post_completion(data)
+                        content = response_json["choices"][0]["message"]["content"]
+                        usage = response_json.get("usage") or {}
+                    return await asyncio.to_thread(
+                        llm.finish_completion,
+                        trials_data,
+                        data,
+                        cache_key,
+                        content,
+                        usage,
+                    )
+                except requests.Timeout:
+                    logger.error(
+                        "The request to the LLM API timed out. Please try again later."
+                    )
+                except requests.RequestException as e:
+                    logger.error(
+                        f"Network error when processing trials with LLM: {str(e)}"
+                    )
+                except (KeyError, MalformedResponseError) as e:
+                    logger.error(f"Unexpected response format: {str(e)}")
+                except Exception as e:
+                    logger.error(f"An unexpected error occurred: {str(e)}")
+        return None
+
+    async def post_completion(self, data):
+        """
+        POST a chat-completions request, retrying like LLMProcessor.post_completion.
+
+        Returns:
+            dict: The decoded JSON response.
+        """
+        raw = await self._post(data)
+        with async_errors():
+            async with raw:
+                response = BufferedResponse(
+                    str(raw.url), raw.status, raw.headers, await raw.read()
+                )
+        return response.json()
+
+    async def stream_completion(self, data):
+        """
+        Request a completion as server-sent events, like LLMProcessor.stream_completion.
+
+        Returns:
+            tuple: (content, usage) with usage {} if the API didn't report it.
+        """
+        stream = CompletionStream(self.llm)
+        raw = await self._post(dict(data, stream=True))
+        with async_errors():
+            async with raw:
+                async for line in raw.content:
+                    if not stream.feed(line.decode("utf-8").rstrip("\r\n")):
+                        break
+        return stream.close()
+
+    async def _post(self, data):
+        import aiohttp
+
+        llm = self.llm
+        connect, read = llm.timeout
+        timeout = aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        for attempt in range(llm.max_retries + 1):
+            if attempt:
+                METRICS.incr("llm_retries")
+            try:
+                with METRICS.timer("llm_request"), async_errors():
+                    response = await self.session.post(
+                        llm.api_url, headers=llm.headers(), json=data, timeout=timeout
+                    )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == llm.max_retries:
+                    raise
+                delay = llm._backoff(attempt)
+                logger.warning(f"LLM request failed ({e}). Retrying in {delay:.1f}s...")
+            else:
+                if (
+                    response.status not in llm.RETRY_STATUS_CODES
+                    or attempt == llm.max_retries
+                ):
+                    if response.status >= 400:
+                        response.release()
+                        raise requests.HTTPError(
+                            f"{response.status} Error for url: {llm.api_url}"
+                        )
+                    return response
+                delay = llm._retry_after(response)
+                response.release()
+                if delay is None:
+                    delay = llm._backoff(attempt)
+                logger.warning(
+                    f"LLM API returned {response.status}. Retrying in {delay:.1f}s..."
+                )
+            await asyncio.sleep(delay)
+
+    async def iter_batches(self, trials, on_drop=None):
+        """
+        Filter trials and pack them into batches as they arrive.
+
+        Gives the batches TrialBatcher.iter_batches() gives for the trials
+        from LLMProcessor.prepare_trials().
+
+        Args:
+            trials (async iterable): Dictionaries containing trial data.
+            on_drop (callable): Called with each trial the abstract filter drops
+                and the reason.
+
+        Yields:
+            list: A batch of trials, in their original order.
+        """
+        batcher = self.llm.batcher
+        # Drop the trials of a run that stopped before its last batch.
+        batcher.flush()
+        async for trial in trials:
+            # on_drop may checkpoint the trial, so filter it in a worker thread.
+            prepared_trials = await asyncio.to_thread(
+                list, self.llm.prepare_trials([trial], on_drop)
+            )
+            for prepared in prepared_trials:
+                for batch in batcher.add(prepared):
+                    yield batch
+        for batch in batcher.flush():
+            yield batch
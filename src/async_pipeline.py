@@ -0,0 +1,139 @@
+import asyncio
+import logging
+
+from async_llm_processor import AsyncLLMProcessor
+from async_scraper import AsyncScraper
+from checkpoint_store import CheckpointStore
+from pipeline import KeywordRun, Pipeline
+from transport import create_async_session
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncPipeline(Pipeline):
+    """
+    A Pipeline whose stages share one asyncio event loop instead of threads.
+
+    Search page listing, article fetching and LLM calls are coroutines on a
+    single aiohttp session. Each stage has its own concurrency limit: the
+    scraper's list_concurrency and max_workers and the LLM's max_concurrency.
+    Bounded queues between the stages provide backpressure. Checkpoint,
+    dedup and cache writes, HTML parsing and the output writers block, so
+    they run in worker threads and never stall the loop. run() keeps the
+    blocking Pipeline interface, so the two engines are interchangeable; the
+    outputs, checkpoints and dedup results are the same.
+
+    Needs the optional aiohttp package.
+    """
+
+    def run(self, keyword, num_pages, start_page=1):
+        """
+        Scrape, analyze and save the trials for a keyword on a new event loop.
+
+        Takes the same arguments and returns the same summary as Pipeline.run.
+        """
+        return asyncio.run(self.run_async(keyword, num_pages, start_page))
+
+    async def run_async(self, keyword, num_pages, start_page=1):
+        """
+        Scrape, analyze and save the trials for a keyword.
+
+        Args:
+            keyword (str): The search keyword.
+            num_pages (int): The number of search result pages to scrape.
+            start_page (int): The first search result page to scrape.
+
+        Returns:
+            dict: A summary with the keyword, the trial count and the output path.
+        """
+        records = asyncio.Queue(maxsize=self.queue_size)
+        # Results in output order; LLM results are tasks that may still run.
+        results = asyncio.Queue(maxsize=self.queue_size)
+
+        async with create_async_session() as session:
+            run = KeywordRun(self, keyword)
+            scraper = AsyncScraper(self.scraper, session, queue_size=self.queue_size)
+            llm = AsyncLLMProcessor(self.llm_processor, session)
+
+            async def scrape_stage():
+                trials = scraper.iter_trials(
+                    keyword,
+                    num_pages,
+                    start_page,
+                    checkpoints=self.checkpoints,
+                    dedup=self.dedup,
+                )
+                async for trial in trials:
+                    trial, result = await asyncio.to_thread(run.route, trial)
+                    if result:
+                        await results.put(result)
+                    elif trial:
+                        await records.put(trial)
+
+            async def llm_stage():
+                try:
+                    batches = llm.iter_batches(
+                        self._drain_async(records), on_drop=run.skip
+                    )
+                    async for batch in batches:
+                        await asyncio.to_thread(
+                            self._mark, keyword, batch, CheckpointStore.SENT
+                        )
+                        task = asyncio.create_task(llm.process_trials(batch))
+                        await results.put((batch, task, None, None))
+                except Exception:
+                    # Stop the scrape stage rather than fetch pages nobody will send.
+                    stages[0].cancel()
+                    raise
+
+            stages = [
+                asyncio.create_task(self._run_stage_async(scrape_stage, records)),
+                asyncio.create_task(self._run_stage_async(llm_stage, results)),
+            ]
+            try:
+                async for batch, task, parsed_data, urls in self._drain_async(results):
+                    response = None
+                    if task:
+                        response = await task
+                        if not response:
+                            await asyncio.to_thread(run.fail, batch)
+                            continue
+                    await asyncio.to_thread(
+                        run.write, batch, response, parsed_data, urls
+                    )
+            except BaseException:
+                for stage in stages:
+                    stage.cancel()
+                while not results.empty():
+                    item = results.get_nowait()
+                    if item is not self._DONE and item[1]:
+                        item[1].cancel()
+                raise
+            finally:
+                await asyncio.to_thread(run.close)
+            # Raise the first stage error, if any. The scrape stage was
+            # cancelled if the LLM stage failed.
+            await asyncio.wait(stages)
+            for stage in stages:
+                if not stage.cancelled() and stage.exception():
+                    raise stage.exception()
+        return run.summary()
+
+    async def _run_stage_async(self, stage, out_queue):
+        try:
+            await stage()
+        except asyncio.CancelledError:
+            # Nothing reads the queue of a cancelled stage any more.
+            raise
+        except BaseException:
+            await out_queue.put(self._DONE)
+            raise
+        else:
+            await out_queue.put(self._DONE)
+
+    async def _drain_async(self, in_queue):
+        while True:
+            item = await in_queue.get()
+            if item is self._DONE:
+                return
+            yield item
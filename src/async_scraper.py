@@ -0,0 +1,298 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import requests
+
+from metrics import METRICS
+from rate_limiter import parse_retry_after
+from scraper import Scraper
+from settings import SETTINGS
+from transport import BufferedResponse, async_errors
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncScraper:
+    """
+    The asyncio counterpart of Scraper, for the async pipeline engine.
+
+    Search and article pages are fetched over an aiohttp session, so waiting
+    on a slow page never holds a thread. The wrapped Scraper still provides
+    the rate limiter, HTTP cache, HTML extractor and checkpoint and dedup
+    bookkeeping, so both engines yield the same records; their disk I/O and
+    HTML parsing run in worker threads, off the event loop. Up to
+    list_concurrency search pages are fetched ahead of the article pages,
+    which are fetched under their own semaphore.
+    """
+
+    # The statuses the sync transport's adapter retries.
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    _DONE = object()
+
+    def __init__(
+        self,
+        scraper,
+        session,
+        max_concurrency=None,
+        list_concurrency=None,
+        queue_size=None,
+    ):
+        """
+        Initialize the scraper.
+
+        Args:
+            scraper (Scraper): The scraper whose settings and helpers are used.
+                Sources other than the PubMed web pages (e.g. EutilsScraper)
+                run their own iter_trials() in a worker thread.
+            session (aiohttp.ClientSession): The session, see
+                transport.create_async_session().
+            max_concurrency (int): Article pages fetched at once. Defaults to
+                the scraper's max_workers.
+            list_concurrency (int): Search pages fetched at once. Defaults to
+                the SCRAPER_LIST_CONCURRENCY env var, or 2.
+            queue_size (int): Article pages listed but not yet yielded.
+                Defaults to the PIPELINE_QUEUE_SIZE env var, or 50.
+        """
+        self.scraper = scraper
+        self.session = session
+        self.fetch_semaphore = asyncio.Semaphore(max_concurrency or scraper.max_workers)
+        self.list_concurrency = list_concurrency or int(
+            SETTINGS.get("SCRAPER_LIST_CONCURRENCY", 2)
+        )
+        self.queue_size = queue_size or int(SETTINGS.get("PIPELINE_QUEUE_SIZE", 50))
+        self.max_retries = int(SETTINGS.get("HTTP_MAX_RETRIES", 3))
+        self.backoff_factor = float(SETTINGS.get("HTTP_BACKOFF_FACTOR", 0.5))
+
+    async def fetch(self, url, use_cache=False):
+        """
+        GET a URL once the host's rate limit allows it, like Scraper.fetch.
+
+        429 and 5xx responses and network errors are retried with
+        exponential backoff, honoring Retry-After, as the sync transport's
+        adapter does. Every attempt takes its own slot from the rate limiter.
+
+        Args:
+            url (str): The URL to fetch.
+            use_cache (bool): Serve the page from the HTTP cache when possible.
+
+        Returns:
+            BufferedResponse | CachedResponse: The response.
+
+        Raises:
+            requests.RequestException: If the request fails after all retries.
+        """
+        cache = self.scraper.cache
+        entry = None
+        headers = {}
+        if use_cache and cache:
+            entry, fresh = await asyncio.to_thread(cache.lookup, url)
+            if fresh:
+                METRICS.incr("http_cache_hits")
+                return await asyncio.to_thread(cache.response_for, entry)
+            headers = cache.validators(entry)
+
+        rate_limiter = self.scraper.rate_limiter
+        for attempt in range(self.max_retries + 1):
+            # Retries are requests too, so each one waits for the rate limit.
+            with METRICS.timer("rate_limit_wait"):
+                await rate_limiter.wait_async(url)
+            start = time.perf_counter()
+            try:
+                with METRICS.timer("http_get"), async_errors():
+                    async with self.session.get(url, headers=headers) as raw:
+                        response = BufferedResponse(
+                            url, raw.status, raw.headers, await raw.read(), raw.charset
+                        )
+            except (requests.ConnectionError, requests.Timeout):
+                rate_limiter.record(url, None, time.perf_counter() - start)
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_factor * 2**attempt
+            else:
+                METRICS.incr("http_requests")
+                self.scraper._record_outcome(url, response, time.perf_counter() - start)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if (
+                    response.status_code not in self.RETRY_STATUSES
+                    or attempt == self.max_retries
+                ):
+                    break
+                delay = retry_after or self.backoff_factor * 2**attempt
+            await asyncio.sleep(delay)
+
+        if entry and response.status_code == 304:
+            METRICS.incr("http_cache_revalidated")
+            return await asyncio.to_thread(cache.mark_revalidated, url, entry)
+        response.raise_for_status()
+        METRICS.incr("bytes_fetched", len(response.content))
+        if use_cache and cache:
+            await asyncio.to_thread(cache.store, url, response)
+        return response
+
+    async def iter_trials(
+        self, keyword, num_pages, start_page=1, checkpoints=None, dedup=None
+    ):
+        """
+        Yield trial records as their article pages are scraped, in search order.
+
+        Takes the same arguments as Scraper.iter_trials. Search pages are
+        listed ahead while earlier articles are still being fetched; at most
+        queue_size listed articles wait to be yielded.
+
+        Yields:
+            dict: A dictionary containing the article's title, abstract and url.
+        """
+        if type(self.scraper).iter_trials is not Scraper.iter_trials:
+            async for trial in self._iter_in_thread(
+                self.scraper.iter_trials(
+                    keyword, num_pages, start_page, checkpoints, dedup
+                )
+            ):
+                yield trial
+            return
+        if num_pages <= 0:
+            logger.warning("Number of pages must be greater than 0.")
+            return
+
+        total_pages = await asyncio.to_thread(self.scraper.get_total_pages, keyword)
+        total_pages = total_pages or start_page + num_pages - 1
+        pages = range(start_page, min(start_page + num_pages, total_pages + 1))
+        # Each article's fetch task, in search order.
+        articles = asyncio.Queue(maxsize=self.queue_size)
+        lister = asyncio.create_task(
+            self._run_lister(keyword, pages, articles, checkpoints, dedup)
+        )
+        try:
+            while True:
+                task = await articles.get()
+                if task is self._DONE:
+                    break
+                trial_data = await task
+                if trial_data is Scraper._ALREADY_PARSED:
+                    continue
+                if trial_data:
+                    yield trial_data
+                else:
+                    logger.warning("Skipping trial due to scraping failure")
+            await lister
+        finally:
+            lister.cancel()
+            while not articles.empty():
+                task = articles.get_nowait()
+                if task is not self._DONE:
+                    task.cancel()
+
+    async def _iter_in_thread(self, trials):
+        while True:
+            trial = await asyncio.to_thread(next, trials, None)
+            if trial is None:
+                return
+            yield trial
+
+    async def _run_lister(self, keyword, pages, articles, checkpoints, dedup):
+        try:
+            await self._list_pages(keyword, pages, articles, checkpoints, dedup)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            await articles.put(self._DONE)
+            raise
+        await articles.put(self._DONE)
+
+    async def _list_pages(self, keyword, pages, articles, checkpoints, dedup):
+        """Fetch the search pages and queue a fetch task for each article."""
+        search_url = self.scraper.search_url.format(keyword)
+
+        async def fetch_page(page):
+            logger.info(f"Scraping page {page}...")
+            return await self.fetch(search_url + f"&page={page}")
+
+        # Up to list_concurrency pages are fetched at once and handled in page
+        # order. Pages that failed are tried again after the others.
+        pages = deque(pages)
+        attempts = {}
+        in_flight = deque()
+        try:
+            while pages or in_flight:
+                while pages and len(in_flight) < self.list_concurrency:
+                    page = pages.popleft()
+                    in_flight.append((page, asyncio.create_task(fetch_page(page))))
+                page, task = in_flight.popleft()
+                try:
+                    response = await task
+                except requests.RequestException as e:
+                    attempts[page] = attempts.get(page, 0) + 1
+                    if attempts[page] > self.scraper.page_retries:
+                        logger.error(f"Error scraping page {page}: {e}. Giving up.")
+                    else:
+                        logger.warning(
+                            f"Error scraping page {page}: {e}. Retrying it later."
+                        )
+                        METRICS.incr("pages_retried")
+                        pages.append(page)
+                    continue
+
+                article_links = await asyncio.to_thread(
+                    self.scraper.extractor.article_links, response.text
+                )
+                if not article_links:
+                    logger.warning(
+                        f"No articles found on page {page}. Stopping scrape."
+                    )
+                    break
+                article_urls = [self.scraper.base_url + href for href in article_links]
+                if checkpoints:
+                    await asyncio.to_thread(
+                        checkpoints.mark_listed, keyword, article_urls
+                    )
+                for url in article_urls:
+                    await articles.put(
+                        asyncio.create_task(
+                            self._scrape_or_resume(url, keyword, checkpoints, dedup)
+                        )
+                    )
+                logger.info(f"Listed the articles of page {page}...")
+        finally:
+            for _, task in in_flight:
+                task.cancel()
+
+    async def _scrape_or_resume(self, url, keyword, checkpoints, dedup):
+        trial_data = await asyncio.to_thread(
+            self.scraper._resume, url, keyword, checkpoints, dedup
+        )
+        if trial_data is not None:
+            return trial_data
+        async with self.fetch_semaphore:
+            trial_data = await self.scrape_article_page(url)
+        return await asyncio.to_thread(
+            self.scraper._record_fetched, url, keyword, trial_data, checkpoints, dedup
+        )
+
+    async def scrape_article_page(self, url):
+        """
+        Scrape an individual article page for title and abstract.
+
+        Args:
+            url (str): The URL of the article page.
+
+        Returns:
+            dict: A dictionary containing the article's title, abstract and
+                url, or None if the page couldn't be scraped.
+        """
+        with METRICS.timer("scrape_article_page"):
+            try:
+                response = await self.fetch(url, use_cache=True)
+                return await asyncio.to_thread(
+                    self.scraper.article_record, url, response
+                )
+            except requests.RequestException as e:
+                logger.error(f"Network error when accessing {url}: {e}")
+            except AttributeError as e:
+                logger.warning(
+                    f"Element not found when scraping article page {url}: {e}"
+                )
+            except Exception as e:
+                logger.error(f"Unexpected error when scraping article page {url}: {e}")
+        return None
@@ -0,0 +1,157 @@
+import logging
+import math
+import re
+
+from settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a text without a model-specific tokenizer.
+
+    Words are counted as one token per 4 characters (at least one) and every
+    punctuation mark as one token, which slightly overestimates BPE tokenizers
+    on English text and so errs on the safe side.
+
+    Args:
+        text (str): The text to estimate.
+
+    Returns:
+        int: The estimated token count.
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in TOKEN_PATTERN.findall(text))
+
+
+class TrialBatcher:
+    """
+    A class to pack trials into LLM requests that stay within a token budget.
+    """
+
+    def __init__(self, token_budget=None, max_trials=None, overhead_tokens=0):
+        """
+        Initialize the batcher.
+
+        Args:
+            token_budget (int): Maximum estimated prompt tokens per request.
+                Defaults to the LLM_TOKEN_BUDGET env var, or 8000.
+            max_trials (int): Maximum number of trials per request.
+                Defaults to the LLM_TRIALS_PER_REQUEST env var, or 10.
+            overhead_tokens (int): Tokens used by the prompt template and system
+                message, subtracted from the budget.
+        """
+        self.token_budget = token_budget or int(SETTINGS.get("LLM_TOKEN_BUDGET", 8000))
+        self.max_trials = max_trials or int(SETTINGS.get("LLM_TRIALS_PER_REQUEST", 10))
+        self.trial_budget = self.token_budget - overhead_tokens
+        if self.trial_budget <= 0:
+            raise ValueError("The token budget doesn't leave room for any trial.")
+        # The batch add() is filling.
+        self.pending, self.pending_tokens = [], 0
+
+    def trial_tokens(self, trial):
+        """
+        Estimate the tokens a trial adds to the prompt.
+
+        Args:
+            trial (dict): A dictionary containing the trial's title and abstract.
+
+        Returns:
+            int: The estimated token count.
+        """
+        # "Trial N:", "Headline:" and "Body:" labels plus separators.
+        return 10 + estimate_tokens(trial["title"]) + estimate_tokens(trial["abstract"])
+
+    def fit(self, trial):
+        """
+        Shorten a trial's abstract so the trial alone fits in the budget.
+
+        Args:
+            trial (dict): A dictionary containing trial data.
+
+        Returns:
+            dict: The trial itself, or a copy with a truncated abstract.
+        """
+        excess = self.trial_tokens(trial) - self.trial_budget
+        if excess <= 0:
+            return trial
+        logger.warning(
+            f"Truncating the abstract of {trial.get('url')} to fit the token budget."
+        )
+        abstract = trial["abstract"]
+        # Trim proportionally, then keep trimming until the estimate fits.
+        keep = len(abstract) * (1 - excess / max(1, estimate_tokens(abstract)))
+        trimmed = dict(trial, abstract=abstract[: max(0, int(keep))])
+        while trimmed["abstract"] and self.trial_tokens(trimmed) > self.trial_budget:
+            trimmed["abstract"] = trimmed["abstract"][
+                : int(len(trimmed["abstract"]) * 0.9)
+            ]
+        return trimmed
+
+    def add(self, trial):
+        """
+        Add a trial to the pending batch.
+
+        Trials are packed greedily, in order: a batch is complete when the next
+        trial would take it over the budget or when it holds max_trials trials.
+
+        Args:
+            trial (dict): A dictionary containing trial data.
+
+        Returns:
+            list: The batches this trial completed, in order; empty while the
+                pending batch still has room.
+        """
+        trial = self.fit(trial)
+        tokens = self.trial_tokens(trial)
+        full = []
+        if self.pending and self.pending_tokens + tokens > self.trial_budget:
+            full += self.flush()
+        self.pending.append(trial)
+        self.pending_tokens += tokens
+        if len(self.pending) >= self.max_trials:
+            full += self.flush()
+        return full
+
+    def flush(self):
+        """
+        Complete the pending batch, however full it is.
+
+        Returns:
+            list: The pending batch as a one-item list, or an empty list if no
+                trial is pending.
+        """
+        full = [self.pending] if self.pending else []
+        self.pending, self.pending_tokens = [], 0
+        return full
+
+    def iter_batches(self, trials):
+        """
+        Greedily pack trials, in order, into batches that fit the budget.
+
+        Args:
+            trials (iterable): Dictionaries containing trial data. May be a
+                generator; batches are yielded as soon as they are full.
+
+        Yields:
+            list: A batch of trials, in their original order.
+        """
+        # Drop the trials of a run that stopped before its last batch.
+        self.flush()
+        for trial in trials:
+            yield from self.add(trial)
+        yield from self.flush()
+
+    def batches(self, trials):
+        """
+        Pack a list of trials into batches.
+
+        Args:
+            trials (list): A list of dictionaries containing trial data.
+
+        Returns:
+            list: A list of batches, each a list of trials.
+        """
+        return list(self.iter_batches(trials))
@@ -0,0 +1,172 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from settings import SETTINGS
+
+PMID_PATTERN = re.compile(r"/(\d+)/?$")
+
+
+def pmid_from_url(url):
+    """
+    Extract the PMID from an article URL.
+
+    Args:
+        url (str): The article URL, e.g. https://.../12345678/.
+
+    Returns:
+        str: The PMID, or the URL itself if it has no numeric last segment.
+    """
+    match = PMID_PATTERN.search(url)
+    return match.group(1) if match else url
+
+
+class CheckpointStore:
+    """
+    A persistent SQLite record of where each article of a keyword's run stands.
+
+    Every PMID moves through the states listed -> fetched -> sent -> parsed, or
+    to failed, or to skipped when the abstract filter kept it from the LLM.
+    Re-running a keyword skips parsed articles, reuses the stored record of
+    fetched and skipped ones, so they meet the current filter rules again, and
+    only downloads articles that are new or failed.
+    """
+
+    LISTED = "listed"
+    FETCHED = "fetched"
+    SENT = "sent"
+    PARSED = "parsed"
+    FAILED = "failed"
+    SKIPPED = "skipped"
+
+    def __init__(self, path=None):
+        """
+        Initialize the store and open its database.
+
+        Args:
+            path (str): Path of the SQLite file.
+                Defaults to the CHECKPOINT_PATH env var, or output/checkpoints.sqlite3.
+        """
+        script_dir = os.path.dirname(__file__)
+        self.path = path or SETTINGS.get(
+            "CHECKPOINT_PATH", os.path.join(script_dir, "../output/checkpoints.sqlite3")
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    keyword TEXT NOT NULL,
+                    pmid TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    record TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (keyword, pmid)
+                )
+                """)
+
+    def mark_listed(self, keyword, urls):
+        """
+        Record article URLs found on a search page, keeping known articles' states.
+
+        Args:
+            keyword (str): The search keyword.
+            urls (list): The article URLs.
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO articles VALUES (?, ?, ?, ?, NULL, ?)",
+                [(keyword, pmid_from_url(url), url, self.LISTED, now) for url in urls],
+            )
+
+    def mark_fetched(self, keyword, record):
+        """
+        Store a scraped record and move its article to the fetched state.
+
+        Args:
+            keyword (str): The search keyword.
+            record (dict): The record from Scraper.scrape_article_page.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    keyword,
+                    pmid_from_url(record["url"]),
+                    record["url"],
+                    self.FETCHED,
+                    json.dumps(record),
+                    time.time(),
+                ),
+            )
+
+    def mark(self, keyword, urls, state):
+        """
+        Move articles to a new state.
+
+        Args:
+            keyword (str): The search keyword.
+            urls (list): The article URLs.
+            state (str): One of the state constants.
+        """
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE articles SET state = ?, updated_at = ? "
+                "WHERE keyword = ? AND pmid = ?",
+                [(state, now, keyword, pmid_from_url(url)) for url in urls],
+            )
+
+    def lookup(self, keyword, url):
+        """
+        Return an article's state and stored record.
+
+        Args:
+            keyword (str): The search keyword.
+            url (str): The article URL.
+
+        Returns:
+            tuple: (state, record) with record None if it was never fetched,
+                or (None, None) for an unknown article.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT state, record FROM articles WHERE keyword = ? AND pmid = ?",
+                (keyword, pmid_from_url(url)),
+            ).fetchone()
+        if row is None:
+            return None, None
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def counts(self, keyword):
+        """
+        Count a keyword's articles per state.
+
+        Args:
+            keyword (str): The search keyword.
+
+        Returns:
+            dict: The number of articles in each state.
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT state, COUNT(*) FROM articles WHERE keyword = ? GROUP BY state",
+                (keyword,),
+            ).fetchall()
+        return dict(rows)
+
+    def reset(self, keyword):
+        """
+        Forget every checkpoint of a keyword so its next run starts over.
+
+        Args:
+            keyword (str): The search keyword.
+        """
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM articles WHERE keyword = ?", (keyword,))
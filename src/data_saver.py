@@ -1,5 +1,347 @@
-import pandas as pd
+import logging
+import csv
+import json
 import os
+import time
+
+from metrics import METRICS
+from response_parser import TRIAL_INFO_ID, record_rows
+from settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Shape of the one-row-per-URL layout, as in output/pubmedsample.csv.
+WIDE_TRIAL_INFOS = 5
+WIDE_TRIAL_QUESTIONS = 10
+WIDE_GROUPS = 12
+WIDE_GROUP_QUESTIONS = 24
+
+
+def wide_columns():
+    """
+    Return the fixed column names of the wide per-URL layout.
+
+    Returns:
+        list: URL, Trial Count, TrialID-Info1-5, T1-1/T1-1A..T1-10/T1-10A, then
+            for each of 12 groups GroupN followed by T1-GN-1/T1-GN-1A..T1-GN-24A.
+    """
+    columns = ["URL", "Trial Count"]
+    columns += [f"TrialID-Info{i}" for i in range(1, WIDE_TRIAL_INFOS + 1)]
+    for q in range(1, WIDE_TRIAL_QUESTIONS + 1):
+        columns += [f"T1-{q}", f"T1-{q}A"]
+    for g in range(1, WIDE_GROUPS + 1):
+        columns.append(f"Group{g}")
+        for q in range(1, WIDE_GROUP_QUESTIONS + 1):
+            columns += [f"T1-G{g}-{q}", f"T1-G{g}-{q}A"]
+    return columns
+
+
+def wide_rows(url, parsed_data):
+    """
+    Flatten the parsed records of one LLM response into wide layout rows.
+
+    A response covering several URLs has one trial per article, so the
+    records of trial N go to the row of the Nth URL. The trials of a
+    single-URL response all come from that article: its row gets every trial
+    info and group, and the first trial's questions. Records without a trial
+    number (the line format's questions and study groups) belong to the first
+    trial, and each row's groups are numbered from 1 in their order. Values
+    that don't fit the fixed
+    schema (more than 5 trial infos, 10 trial questions, 12 groups or 24
+    group questions per URL, or a trial beyond the response's URLs) are
+    dropped with a warning and counted as wide_values_dropped.
+
+    Args:
+        url (str): The space-separated article URLs the response covers.
+        parsed_data (dict): Records from LLMProcessor.parse_llm_response.
+
+    Returns:
+        list: One dict per URL, column name to value. Trial Count is the LLM's
+            count for a single-URL response and the number of trial infos of
+            the URL otherwise (an int or None); every other value is a string.
+    """
+    urls = url.split() or [url]
+    rows = [{"URL": row_url, "Trial Count": None} for row_url in urls]
+    infos = [[] for _ in rows]
+    groups = [{} for _ in rows]
+    dropped = 0
+
+    def row_index(trial, questions=False):
+        if len(rows) == 1:
+            return 0 if trial == 1 or not questions else None
+        return trial - 1 if 1 <= trial <= len(rows) else None
+
+    for record in parsed_data["Trial Identification"]:
+        if "fields" not in record:
+            if record["id"] == "1" and len(rows) == 1:
+                try:
+                    rows[0]["Trial Count"] = int(record["answer"])
+                except ValueError:
+                    pass
+            continue
+        match = TRIAL_INFO_ID.match(record["id"])
+        i = row_index(int(match.group(1)) if match else 1)
+        if i is None:
+            dropped += 1
+        else:
+            infos[i].append(":".join(record["fields"]))
+    for i, (row, trial_infos) in enumerate(zip(rows, infos)):
+        if len(rows) > 1:
+            row["Trial Count"] = len(trial_infos) or None
+        for n, info in enumerate(trial_infos, start=1):
+            if n <= WIDE_TRIAL_INFOS:
+                row[f"TrialID-Info{n}"] = info
+            else:
+                dropped += 1
+
+    for record in parsed_data["Trial Questions"]:
+        i = row_index(record.get("trial", 1), questions=True)
+        number = int(record["id"])
+        if i is None or number > WIDE_TRIAL_QUESTIONS:
+            dropped += 1
+            continue
+        rows[i][f"T1-{number}"] = record["question"]
+        rows[i][f"T1-{number}A"] = record["answer"]
+
+    # Each row's groups, renumbered from 1 in the order of their numbers.
+    for record in parsed_data["Study Groups"]:
+        i = row_index(record.get("trial", 1))
+        if i is not None:
+            groups[i].setdefault(int(record["id"][len("Group") :]), None)
+    for record in parsed_data["Group Questions"]:
+        i = row_index(record.get("trial", 1))
+        if i is not None:
+            groups[i].setdefault(record["group"], None)
+    groups = [
+        {group: n for n, group in enumerate(sorted(row_groups), start=1)}
+        for row_groups in groups
+    ]
+
+    for record in parsed_data["Study Groups"]:
+        i = row_index(record.get("trial", 1))
+        group = None if i is None else groups[i][int(record["id"][len("Group") :])]
+        if group is None or group > WIDE_GROUPS:
+            dropped += 1
+            continue
+        rows[i][f"Group{group}"] = ":".join(record["fields"])
+
+    for record in parsed_data["Group Questions"]:
+        i = row_index(record.get("trial", 1))
+        group = None if i is None else groups[i][record["group"]]
+        number = int(record["id"].rsplit("-", 1)[1])
+        if group is None or group > WIDE_GROUPS or number > WIDE_GROUP_QUESTIONS:
+            dropped += 1
+            continue
+        rows[i][f"T1-G{group}-{number}"] = record["question"]
+        rows[i][f"T1-G{group}-{number}A"] = record["answer"]
+
+    if dropped:
+        logger.warning(f"{dropped} values of {url} don't fit the wide layout.")
+        METRICS.incr("wide_values_dropped", dropped)
+    return rows
+
+
+class WideCsvWriter:
+    """
+    Streams wide layout rows to a CSV file, one row per URL.
+
+    The file is rewritten unless append is set, so re-running a keyword
+    doesn't duplicate its rows.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.columns = wide_columns()
+        write_header = (
+            not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        )
+        # utf-8-sig matches output/pubmedsample.csv and opens cleanly in Excel.
+        encoding = "utf-8-sig" if write_header else "utf-8"
+        self.file = open(path, "a" if append else "w", newline="", encoding=encoding)
+        self.writer = csv.DictWriter(self.file, fieldnames=self.columns)
+        if write_header:
+            self.writer.writeheader()
+
+    @METRICS.timed("data_saver_write")
+    def write(self, url, parsed_data):
+        self.writer.writerows(wide_rows(url, parsed_data))
+        self.file.flush()
+        return url.split()
+
+    def close(self):
+        self.file.close()
+        return []
+
+
+class JsonlTrialWriter:
+    """
+    Streams each response's URLs and parsed records to a JSON Lines file.
+
+    Used for the per-shard outputs of sharded runs, which the coordinator
+    merges into the final layout. The file is rewritten unless append is set.
+    """
+
+    def __init__(self, path, append=False):
+        self.path = path
+        self.file = open(path, "a" if append else "w", encoding="utf-8")
+
+    @METRICS.timed("data_saver_write")
+    def write(self, url, parsed_data):
+        line = json.dumps({"url": url, "parsed_data": parsed_data}, ensure_ascii=False)
+        self.file.write(line + "\n")
+        self.file.flush()
+        return url.split()
+
+    def close(self):
+        self.file.close()
+        return []
+
+
+class LongCsvWriter:
+    """
+    Writes the parsed records of a run as a tidy long-format CSV.
+
+    Responses are collected and appended in batches of batch_size, so cleaning
+    and NA filtering run as vectorized frame operations rather than per record;
+    see results_frame.long_frame() for the columns. The file is rewritten
+    unless append is set.
+    """
+
+    def __init__(self, path, batch_size=None, drop_na=None, append=False):
+        self.path = path
+        if not append:
+            open(path, "w", encoding="utf-8").close()
+        self.batch_size = batch_size or int(SETTINGS.get("LONG_BATCH_SIZE", 500))
+        if drop_na is None:
+            drop_na = SETTINGS.get("LONG_DROP_NA", "false").lower() in ("1", "true")
+        self.drop_na = drop_na
+        self.results = []
+
+    def write(self, url, parsed_data):
+        """
+        Add a response's records, appending a batch once batch_size are due.
+
+        Returns:
+            list: The article URLs whose records were written by this call,
+                which may include earlier responses' URLs or none at all.
+        """
+        self.results.append((url, parsed_data))
+        if len(self.results) >= self.batch_size:
+            return self.flush()
+        return []
+
+    @METRICS.timed("data_saver_write")
+    def flush(self):
+        """
+        Append the pending responses' records to the file.
+
+        Returns:
+            list: The article URLs whose records were written.
+        """
+        from results_frame import clean_long, long_frame
+
+        if not self.results:
+            return []
+        long = clean_long(long_frame(self.results), drop_na=self.drop_na)
+        write_header = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        long.to_csv(
+            self.path,
+            mode="w" if write_header else "a",
+            header=write_header,
+            index=False,
+            encoding="utf-8",
+        )
+        urls = [part for url, _ in self.results for part in url.split()]
+        self.results = []
+        return urls
+
+    def close(self):
+        return self.flush()
+
+
+class ParquetTrialWriter:
+    """
+    Streams wide layout rows to a Parquet dataset directory in row groups.
+
+    Rows come from wide_rows(), like those of the wide CSV.
+
+    Each row group is written to its own part file, under a hidden temporary
+    name that is renamed once the file is complete, so a crash never leaves a
+    part without its footer and the directory can always be loaded at once
+    with pandas.read_parquet(path). Resumed runs (append set) add part files
+    instead of rewriting earlier ones; otherwise the earlier part files are
+    removed.
+    """
+
+    def __init__(self, directory, row_group_size=None, append=False):
+        import pyarrow as pa
+
+        self.pa = pa
+        self.path = directory
+        self.columns = wide_columns()
+        self.schema = pa.schema(
+            [
+                pa.field(name, pa.int32() if name == "Trial Count" else pa.string())
+                for name in self.columns
+            ]
+        )
+        self.row_group_size = row_group_size or int(
+            SETTINGS.get("PARQUET_ROW_GROUP_SIZE", 100)
+        )
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            # Parts left incomplete by a crash are always removed.
+            if name.startswith(".part-") or (
+                not append and name.startswith("part-") and name.endswith(".parquet")
+            ):
+                os.remove(os.path.join(directory, name))
+        self.results = []
+        self.row_count = 0
+
+    @METRICS.timed("data_saver_write")
+    def write(self, url, parsed_data):
+        """
+        Add a response's rows, writing a row group once row_group_size are due.
+
+        Returns:
+            list: The article URLs whose rows were written by this call, which
+                may include earlier responses' URLs or none at all.
+        """
+        self.results.append((url, parsed_data))
+        self.row_count += len(url.split()) or 1
+        if self.row_count >= self.row_group_size:
+            return self.flush()
+        return []
+
+    @METRICS.timed("parquet_flush")
+    def flush(self):
+        """
+        Write the pending rows as a new part file.
+
+        Returns:
+            list: The article URLs whose rows were written.
+        """
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        if not self.results:
+            return []
+        rows = [row for url, data in self.results for row in wide_rows(url, data)]
+        wide = pd.DataFrame(rows, columns=self.columns)
+        wide["Trial Count"] = wide["Trial Count"].astype("Int64")
+        table = self.pa.Table.from_pandas(
+            wide, schema=self.schema, preserve_index=False
+        )
+        name = f"part-{time.time_ns()}.parquet"
+        temp_path = os.path.join(self.path, f".{name}.tmp")
+        pq.write_table(table, temp_path)
+        os.replace(temp_path, os.path.join(self.path, name))
+        urls = [part for url, _ in self.results for part in url.split()]
+        self.results, self.row_count = [], 0
+        return urls
+
+    def close(self):
+        return self.flush()
 
 
 class DataSaver:
@@ -11,6 +353,7 @@ class DataSaver:
         self.script_dir = os.path.dirname(__file__)
         self.output_dir = os.path.join(self.script_dir, "../output/csv-data")
 
+    @METRICS.timed("data_saver_write")
     def save_to_csv(self, data, filename):
         """
         Save the processed trial data to a CSV file.
@@ -33,6 +376,8 @@ class DataSaver:
                     "Invalid data format. Expected a non-empty list of dictionaries."
                 )
 
+            import pandas as pd
+
             df = pd.DataFrame(data)
 
             # Update the filename to include the output directory
@@ -42,14 +387,15 @@ class DataSaver:
             os.makedirs(os.path.dirname(full_path), exist_ok=True)
 
             df.to_csv(full_path, index=False)
-            print(f"Data successfully saved to {full_path}")
+            logger.info(f"Data successfully saved to {full_path}")
         except ValueError as ve:
-            print(f"Error: {ve}")
+            logger.error(f"Error: {ve}")
         except IOError as ioe:
-            print(f"Error writing to file {filename}: {ioe}")
+            logger.error(f"Error writing to file {filename}: {ioe}")
         except Exception as e:
-            print(f"An unexpected error occurred while saving data: {e}")
+            logger.error(f"An unexpected error occurred while saving data: {e}")
 
+    @METRICS.timed("data_saver_write")
     def append_to_csv(self, data, filename):
         """
         Append the processed trial data to an existing CSV file or create a new one if it doesn't exist.
@@ -72,6 +418,8 @@ class DataSaver:
                     "Invalid data format. Expected a non-empty list of dictionaries."
                 )
 
+            import pandas as pd
+
             df = pd.DataFrame(data)
 
             # Update the filename to include the output directory
@@ -83,17 +431,18 @@ class DataSaver:
             # Check if file exists and append without header if it does
             if os.path.exists(full_path):
                 df.to_csv(full_path, mode="a", header=False, index=False)
-                print(f"Data successfully appended to {full_path}")
+                logger.info(f"Data successfully appended to {full_path}")
             else:
                 df.to_csv(full_path, index=False)
-                print(f"New file created and data saved to {full_path}")
+                logger.info(f"New file created and data saved to {full_path}")
         except ValueError as ve:
-            print(f"Error: {ve}")
+            logger.error(f"Error: {ve}")
         except IOError as ioe:
-            print(f"Error writing to file {filename}: {ioe}")
+            logger.error(f"Error writing to file {filename}: {ioe}")
         except Exception as e:
-            print(f"An unexpected error occurred while saving data: {e}")
+            logger.error(f"An unexpected error occurred while saving data: {e}")
 
+    @METRICS.timed("data_saver_write")
     def save_csv_string(self, csv_string, filename):
         """
         Save a CSV string directly to a file using UTF-8 encoding.
@@ -111,18 +460,85 @@ class DataSaver:
 
             with open(full_path, "w", newline="", encoding="utf-8") as f:
                 f.write(csv_string)
-            print(f"Data successfully saved to {full_path}")
+            logger.info(f"Data successfully saved to {full_path}")
+        except IOError as ioe:
+            logger.error(f"Error writing to file {filename}: {ioe}")
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while saving data: {e}")
+
+    @METRICS.timed("data_saver_write")
+    def append_csv_string(self, csv_string, filename):
+        """
+        Append a CSV string to a file, creating the file if it doesn't exist.
+
+        Args:
+            csv_string (str): The CSV data as a string.
+            filename (str): The name of the file to append the data to.
+
+        Raises:
+            IOError: If there's an error writing to the file.
+        """
+        try:
+            full_path = os.path.join(self.output_dir, filename)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+            with open(full_path, "a", newline="", encoding="utf-8") as f:
+                f.write(csv_string)
+                if not csv_string.endswith("\n"):
+                    f.write("\n")
+            return full_path
         except IOError as ioe:
-            print(f"Error writing to file {filename}: {ioe}")
+            logger.error(f"Error writing to file {filename}: {ioe}")
         except Exception as e:
-            print(f"An unexpected error occurred while saving data: {e}")
+            logger.error(f"An unexpected error occurred while saving data: {e}")
+        return None
+
+    def open_trial_writer(self, name, output_format="wide", append=False):
+        """
+        Open a writer that streams parsed trial records in the wide per-URL layout.
+
+        Args:
+            name (str): The output name without extension.
+            output_format (str): "wide" for a CSV file, "parquet" for a
+                Parquet dataset directory, "jsonl" for a JSON Lines file of
+                the parsed records or "long" for a tidy long-format CSV.
+            append (bool): Keep the rows of an earlier run, when resuming it.
+                Otherwise the output is rewritten.
+
+        Returns:
+            WideCsvWriter | ParquetTrialWriter | JsonlTrialWriter |
+                LongCsvWriter: An open writer with write(url, parsed_data) and
+                close() methods. Both return the article URLs whose rows they
+                wrote to the output, which for a writer that buffers rows can
+                be earlier responses' URLs, or none yet.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        if output_format == "parquet":
+            return ParquetTrialWriter(
+                os.path.join(self.output_dir, name), append=append
+            )
+        if output_format == "wide":
+            # Its own file, so it never mixes with the sections layout's CSV.
+            return WideCsvWriter(
+                os.path.join(self.output_dir, f"{name}_wide.csv"), append=append
+            )
+        if output_format == "jsonl":
+            return JsonlTrialWriter(
+                os.path.join(self.output_dir, f"{name}.jsonl"), append=append
+            )
+        if output_format == "long":
+            return LongCsvWriter(
+                os.path.join(self.output_dir, f"{name}_long.csv"), append=append
+            )
+        raise ValueError(f"Unknown output format: {output_format}")
 
+    @METRICS.timed("data_saver_write")
     def save_parsed_data_to_csv(self, parsed_data, filename):
         """
         Save the parsed LLM response data to a CSV file.
 
         Args:
-            parsed_data (dict): A dictionary containing parsed trial data.
+            parsed_data (dict): A dictionary of parsed trial records per section.
             filename (str): The name of the file to save the data to.
 
         Raises:
@@ -139,16 +555,17 @@ class DataSaver:
             os.makedirs(os.path.dirname(full_path), exist_ok=True)
 
             with open(full_path, "w", newline="", encoding="utf-8") as f:
-                for section, data in parsed_data.items():
+                writer = csv.writer(f, lineterminator="\n")
+                for section, records in parsed_data.items():
                     f.write(f"{section}\n")
-                    for item in data:
-                        f.write(f"{item}\n")
+                    for record in records:
+                        writer.writerows(record_rows(record))
                     f.write("\n")  # Add a blank line between sections
 
-            print(f"Parsed data successfully saved to {full_path}")
+            logger.info(f"Parsed data successfully saved to {full_path}")
         except ValueError as ve:
-            print(f"Error: {ve}")
+            logger.error(f"Error: {ve}")
         except IOError as ioe:
-            print(f"Error writing to file {filename}: {ioe}")
+            logger.error(f"Error writing to file {filename}: {ioe}")
         except Exception as e:
-            print(f"An unexpected error occurred while saving data: {e}")
+            logger.error(f"An unexpected error occurred while saving data: {e}")
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from checkpoint_store import pmid_from_url
+from response_parser import split_by_article
+from settings import SETTINGS
+
+PLACEHOLDER_ABSTRACTS = {"", "Abstract not available"}
+
+
+def content_hash(abstract):
+    """
+    Hash an abstract's text, ignoring case and whitespace differences.
+
+    Args:
+        abstract (str): The abstract text.
+
+    Returns:
+        str: The hash, or None for a missing/placeholder abstract.
+    """
+    text = " ".join(abstract.split()).lower()
+    if text in {a.lower() for a in PLACEHOLDER_ABSTRACTS}:
+        return None
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _result_id(url):
+    return hashlib.sha256(pmid_from_url(url).encode("utf-8")).hexdigest()
+
+
+class DedupIndex:
+    """
+    A persistent SQLite index of every article seen, across all keywords.
+
+    Articles are keyed by PMID and by a hash of their abstract. Each article's
+    LLM result is stored on its own, split from the batch it was sent in. Once
+    it is stored, any later keyword that lists the same PMID (or an article
+    with the same abstract) reuses that result instead of fetching and
+    analyzing the article again.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initialize the index and open its database.
+
+        Args:
+            path (str): Path of the SQLite file.
+                Defaults to the DEDUP_PATH env var, or output/dedup.sqlite3.
+        """
+        script_dir = os.path.dirname(__file__)
+        self.path = path or SETTINGS.get(
+            "DEDUP_PATH", os.path.join(script_dir, "../output/dedup.sqlite3")
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.linked = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS articles (
+                    pmid TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    record TEXT NOT NULL,
+                    result_id TEXT,
+                    first_keyword TEXT,
+                    updated_at REAL
+                )
+                """)
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS articles_content_hash "
+                "ON articles (content_hash)"
+            )
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    result_id TEXT PRIMARY KEY,
+                    urls TEXT NOT NULL,
+                    parsed_data TEXT NOT NULL,
+                    created_at REAL
+                )
+                """)
+            # Earlier versions stored one result per LLM batch, which would
+            # link every article of the batch. Drop them so their articles are
+            # analyzed again and stored per article.
+            batch_results = [
+                (result_id,)
+                for result_id, urls in self.conn.execute(
+                    "SELECT result_id, urls FROM results"
+                )
+                if len(json.loads(urls)) > 1
+            ]
+            if batch_results:
+                self.conn.executemany(
+                    "DELETE FROM results WHERE result_id = ?", batch_results
+                )
+                self.conn.executemany(
+                    "UPDATE articles SET result_id = NULL WHERE result_id = ?",
+                    batch_results,
+                )
+
+    def lookup(self, url):
+        """
+        Return what the index knows about an article URL.
+
+        Args:
+            url (str): The article URL.
+
+        Returns:
+            tuple: (record, result_id) with None for anything not stored yet.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT record, result_id FROM articles WHERE pmid = ?",
+                (pmid_from_url(url),),
+            ).fetchone()
+        if row is None:
+            return None, None
+        return json.loads(row[0]), row[1]
+
+    def add_record(self, keyword, record):
+        """
+        Index a freshly scraped record and return the result of a duplicate.
+
+        Args:
+            keyword (str): The keyword the article was found under.
+            record (dict): The record from Scraper.scrape_article_page.
+
+        Returns:
+            str: The result_id of an already analyzed article with the same
+                abstract, or None.
+        """
+        digest = content_hash(record["abstract"])
+        with self.lock, self.conn:
+            result_id = None
+            if digest:
+                row = self.conn.execute(
+                    "SELECT result_id FROM articles "
+                    "WHERE content_hash = ? AND result_id IS NOT NULL LIMIT 1",
+                    (digest,),
+                ).fetchone()
+                result_id = row[0] if row else None
+            self.conn.execute(
+                "INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (pmid) DO UPDATE SET content_hash = excluded.content_hash, "
+                "record = excluded.record, updated_at = excluded.updated_at",
+                (
+                    pmid_from_url(record["url"]),
+                    digest,
+                    json.dumps(record),
+                    result_id,
+                    keyword,
+                    time.time(),
+                ),
+            )
+        return result_id
+
+    def store_result(self, batch, parsed_data):
+        """
+        Store the parsed LLM result of a batch, split per article, and link each
+        article to its own result.
+
+        Args:
+            batch (list): The trial records sent in one request.
+            parsed_data (dict): Records from LLMProcessor.parse_llm_response.
+
+        Returns:
+            list: The result_id of each trial, in batch order.
+        """
+        urls = [trial["url"] for trial in batch]
+        rows = [
+            (_result_id(url), json.dumps([url]), json.dumps(data), time.time())
+            for url, data in split_by_article(urls, parsed_data)
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", rows
+            )
+            self.conn.executemany(
+                "UPDATE articles SET result_id = ? WHERE pmid = ?",
+                [(row[0], pmid_from_url(url)) for row, url in zip(rows, urls)],
+            )
+        return [row[0] for row in rows]
+
+    def result(self, result_id):
+        """
+        Return a stored result.
+
+        Args:
+            result_id (str): The result's id.
+
+        Returns:
+            tuple: (urls, parsed_data) with the URL of the article the result
+                was made for and its parsed records.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT urls, parsed_data FROM results WHERE result_id = ?",
+                (result_id,),
+            ).fetchone()
+            self.linked += 1
+        return json.loads(row[0]), json.loads(row[1])
+
+    def stats(self):
+        """
+        Report the size of the index and how many results were reused.
+
+        Returns:
+            dict: Indexed articles, stored results and results linked this run.
+        """
+        with self.lock:
+            (articles,) = self.conn.execute("SELECT COUNT(*) FROM articles").fetchone()
+            (results,) = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()
+        return {"articles": articles, "results": results, "linked": self.linked}
@@ -0,0 +1,238 @@
+import json
+import logging
+import xml.etree.ElementTree as ET
+
+import requests
+
+from checkpoint_store import pmid_from_url
+from metrics import METRICS
+from rate_limiter import AdaptiveRateLimiter
+from scraper import Scraper
+from settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+class EutilsScraper(Scraper):
+    """
+    A scraper that reads PubMed through the NCBI E-utilities bulk endpoints.
+
+    esearch returns thousands of PMIDs per call and efetch returns the title
+    and abstract of a whole batch of articles as one XML document, so a run
+    needs a few requests instead of one per search page plus one per article.
+    Records are the same {"title", "abstract", "url"} dicts that the HTML
+    scraper yields, and "pages" still count 10 results each.
+    """
+
+    PAGE_SIZE = 10
+    SEARCH_FILTER = "randomized controlled trial[pt]"
+    MAX_RETMAX = 10000
+
+    def __init__(self, eutils_url=None, api_key=None, batch_size=None, **kwargs):
+        """
+        Initialize the scraper.
+
+        Args:
+            eutils_url (str): Base URL of the E-utilities.
+                Defaults to the EUTILS_URL env var, or NCBI's public endpoint.
+            api_key (str): NCBI API key, which raises NCBI's rate limit.
+                Defaults to the NCBI_API_KEY env var.
+            batch_size (int): PMIDs per efetch request.
+                Defaults to the EUTILS_BATCH_SIZE env var, or 200.
+            **kwargs: Passed on to Scraper.
+        """
+        super().__init__(**kwargs)
+        self.eutils_url = (
+            eutils_url
+            or SETTINGS.get("EUTILS_URL")
+            or "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/"
+        ).rstrip("/")
+        self.api_key = api_key or SETTINGS.get("NCBI_API_KEY")
+        self.batch_size = batch_size or int(SETTINGS.get("EUTILS_BATCH_SIZE", 200))
+        if isinstance(self.rate_limiter, AdaptiveRateLimiter):
+            # NCBI's documented limit; probing above it only earns 429s.
+            self.rate_limiter.max_rate = min(
+                self.rate_limiter.max_rate, 10 if self.api_key else 3
+            )
+
+    def _eutils_url(self, endpoint, **params):
+        if self.api_key:
+            params["api_key"] = self.api_key
+        request = requests.Request(
+            "GET", f"{self.eutils_url}/{endpoint}.fcgi", params=params
+        )
+        return request.prepare().url
+
+    def _esearch(self, keyword, retstart, retmax, use_cache=False):
+        url = self._eutils_url(
+            "esearch",
+            db="pubmed",
+            term=f"{keyword} AND {self.SEARCH_FILTER}",
+            sort="pub_date",
+            retmode="json",
+            retstart=retstart,
+            retmax=retmax,
+        )
+        response = self.fetch(url, use_cache=use_cache)
+        return json.loads(response.text)["esearchresult"]
+
+    def search_pmids(self, keyword, num_pages, start_page=1):
+        """
+        Return the PMIDs of the given search result pages.
+
+        Args:
+            keyword (str): The search keyword.
+            num_pages (int): The number of 10-result pages.
+            start_page (int): The first page.
+
+        Returns:
+            list: The PMIDs, newest first, as on the search pages.
+        """
+        pmids = []
+        retstart = (start_page - 1) * self.PAGE_SIZE
+        wanted = num_pages * self.PAGE_SIZE
+        while len(pmids) < wanted:
+            retmax = min(wanted - len(pmids), self.MAX_RETMAX)
+            found = self._esearch(keyword, retstart + len(pmids), retmax)["idlist"]
+            pmids.extend(found)
+            if len(found) < retmax:
+                break
+        return pmids
+
+    @METRICS.timed("efetch_batch")
+    def fetch_articles(self, pmids):
+        """
+        Fetch the title and abstract of several articles with one efetch request.
+
+        Args:
+            pmids (list): The PMIDs.
+
+        Returns:
+            dict: PMID -> record for every article that has a title.
+        """
+        url = self._eutils_url("efetch", db="pubmed", id=",".join(pmids), retmode="xml")
+        response = self.fetch(url, use_cache=True)
+        with METRICS.timer("xml_parse"):
+            root = ET.fromstring(response.text)
+        records = {}
+        for article in root.iter("PubmedArticle"):
+            pmid = article.findtext("MedlineCitation/PMID")
+            title = article.find("MedlineCitation/Article/ArticleTitle")
+            if not pmid or title is None:
+                logger.warning(f"Element not found when parsing efetch article {pmid}")
+                continue
+            records[pmid] = {
+                "title": " ".join("".join(title.itertext()).split()),
+                "abstract": self._abstract_text(article),
+                "url": self.article_url(pmid),
+            }
+        return records
+
+    @staticmethod
+    def _abstract_text(article):
+        sections = []
+        for text in article.iterfind("MedlineCitation/Article/Abstract/AbstractText"):
+            body = " ".join("".join(text.itertext()).split())
+            label = text.get("Label")
+            if label and label.isupper():
+                # efetch labels are upper case; the article pages show
+                # "BACKGROUND" as "Background".
+                label = label.capitalize()
+            sections.append(f"{label}: {body}" if label else body)
+        return "\n".join(sections) or "Abstract not available"
+
+    def article_url(self, pmid):
+        """Return the article page URL of a PMID, as linked from the search pages."""
+        return f"{self.base_url}/{pmid}/"
+
+    def iter_trials(
+        self, keyword, num_pages, start_page=1, checkpoints=None, dedup=None
+    ):
+        """
+        Yield trial records in search order, fetched in efetch batches.
+
+        Takes the same arguments as Scraper.iter_trials.
+
+        Yields:
+            dict: A dictionary containing the article's title, abstract and url.
+        """
+        if num_pages <= 0:
+            logger.warning("Number of pages must be greater than 0.")
+            return
+        try:
+            pmids = self.search_pmids(keyword, num_pages, start_page)
+        except (requests.RequestException, KeyError, ValueError) as e:
+            logger.error(f"Error searching for {keyword}: {e}")
+            return
+        logger.info(f"Found {len(pmids)} articles for {keyword}.")
+
+        for i in range(0, len(pmids), self.batch_size):
+            urls = [self.article_url(pmid) for pmid in pmids[i : i + self.batch_size]]
+            if checkpoints:
+                checkpoints.mark_listed(keyword, urls)
+            known = {
+                url: self._resume(url, keyword, checkpoints, dedup) for url in urls
+            }
+
+            missing = [
+                pmid_from_url(url) for url, data in known.items() if data is None
+            ]
+            fetched = {}
+            if missing:
+                try:
+                    fetched = self.fetch_articles(missing)
+                except (requests.RequestException, ET.ParseError) as e:
+                    logger.error(f"Error fetching {len(missing)} articles: {e}")
+
+            for url in urls:
+                trial_data = known[url]
+                if trial_data is None:
+                    trial_data = self._record_fetched(
+                        url,
+                        keyword,
+                        fetched.get(pmid_from_url(url)),
+                        checkpoints,
+                        dedup,
+                    )
+                if trial_data is self._ALREADY_PARSED:
+                    continue
+                if trial_data:
+                    yield trial_data
+                else:
+                    logger.warning(f"Skipping trial {url} due to fetch failure")
+            logger.info(f"Fetched {i + len(urls)} of {len(pmids)} articles...")
+
+    @METRICS.timed("get_total_pages")
+    def get_total_pages(self, keyword):
+        try:
+            total_results = int(self._esearch(keyword, 0, 0, use_cache=True)["count"])
+            return (total_results + self.PAGE_SIZE - 1) // self.PAGE_SIZE
+        except requests.RequestException as e:
+            logger.error(f"Network error when getting total pages: {e}")
+        except (KeyError, ValueError) as e:
+            logger.error(f"Error parsing total results: {e}")
+        return None
+
+
+SOURCES = {
+    "html": Scraper,
+    "eutils": EutilsScraper,
+}
+
+
+def get_scraper(source=None, **kwargs):
+    """
+    Create the scraper for a source backend name.
+
+    Args:
+        source (str): "html" to scrape the PubMed web pages or "eutils" for the
+            E-utilities API. Defaults to the SCRAPER_SOURCE env var, or "html".
+        **kwargs: Passed on to the scraper.
+
+    Returns:
+        Scraper: The scraper.
+    """
+    source = (source or SETTINGS.get("SCRAPER_SOURCE", "html")).lower()
+    if source not in SOURCES:
+        raise ValueError(f"Unknown scraper source: {source}")
+    return SOURCES[source](**kwargs)
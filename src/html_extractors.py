@@ -0,0 +1,320 @@
+from html.parser import HTMLParser
+
+from settings import SETTINGS
+
+
+class SoupExtractor:
+    """
+    Extracts PubMed page fields with BeautifulSoup and the built-in html.parser.
+
+    This builds the full document tree, so it is the slowest backend but the
+    most forgiving one; the other backends fall back to it.
+    """
+
+    name = "soup"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+
+        self.soup_class = BeautifulSoup
+
+    def article_links(self, html):
+        """
+        Return the href of every search result link on a search page.
+
+        Args:
+            html (str): The search page HTML.
+
+        Returns:
+            list: The article hrefs, in page order.
+        """
+        soup = self.soup_class(html, "html.parser")
+        return [link["href"] for link in soup.find_all("a", class_="docsum-title")]
+
+    def article(self, html):
+        """
+        Return the title and abstract of an article page.
+
+        Args:
+            html (str): The article page HTML.
+
+        Returns:
+            tuple: (title, abstract) stripped of surrounding whitespace, with
+                None for an element that is missing.
+        """
+        soup = self.soup_class(html, "html.parser")
+        title = soup.find("h1", class_="heading-title")
+        abstract = soup.find("div", class_="abstract-content selected")
+        return (
+            title.text.strip() if title else None,
+            abstract.text.strip() if abstract else None,
+        )
+
+    def total_results(self, html):
+        """
+        Return the result count shown on a search page.
+
+        Args:
+            html (str): The search page HTML.
+
+        Returns:
+            str: The displayed count, e.g. "1,234", or None if it is missing.
+        """
+        soup = self.soup_class(html, "html.parser")
+        results_info = soup.find("div", class_="results-amount")
+        if not results_info:
+            return None
+        value = results_info.find("span", class_="value")
+        return value.text if value else None
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class _TargetedParser(HTMLParser):
+    """
+    An html.parser subclass that only collects the text of the wanted elements.
+
+    Each target is (tag, class, exact): with exact, the class attribute must
+    equal the class string (like BeautifulSoup's class_="a b"); otherwise the
+    class must be one of the element's classes. Parsing stops as soon as every
+    single-match target has been found.
+    """
+
+    def __init__(self, targets, collect_links=False):
+        super().__init__(convert_charrefs=True)
+        self.targets = targets
+        self.collect_links = collect_links
+        self.found = {}
+        self.links = []
+        self.current = None
+        self.depth = 0
+        self.parts = []
+
+    def _matches(self, tag, attrs, target):
+        target_tag, target_class, exact = target
+        if tag != target_tag:
+            return False
+        classes = dict(attrs).get("class") or ""
+        if exact:
+            return classes == target_class
+        return target_class in classes.split()
+
+    def handle_starttag(self, tag, attrs):
+        if self.current is not None:
+            if tag == self.targets[self.current][0]:
+                self.depth += 1
+            return
+        if (
+            self.collect_links
+            and tag == "a"
+            and "docsum-title" in (dict(attrs).get("class") or "").split()
+        ):
+            self.links.append(dict(attrs).get("href"))
+        for name, target in self.targets.items():
+            if name not in self.found and self._matches(tag, attrs, target):
+                self.current = name
+                self.depth = 1
+                self.parts = []
+                return
+
+    def handle_endtag(self, tag):
+        if self.current is None or tag != self.targets[self.current][0]:
+            return
+        self.depth -= 1
+        if self.depth == 0:
+            self.found[self.current] = "".join(self.parts)
+            self.current = None
+            if not self.collect_links and len(self.found) == len(self.targets):
+                raise _StopParsing()
+
+    def handle_data(self, data):
+        if self.current is not None:
+            # BeautifulSoup collapses whitespace-only strings containing a
+            # newline to "\n"; do the same so both give identical text.
+            if "\n" in data and not data.strip():
+                data = "\n"
+            self.parts.append(data)
+
+
+class StreamingExtractor:
+    """
+    Extracts PubMed page fields with a targeted, early-stopping html.parser.
+
+    No tree is built, and article pages stop being parsed once the title and
+    abstract have been read.
+    """
+
+    name = "streaming"
+
+    def _parse(self, html, targets, collect_links=False):
+        parser = _TargetedParser(targets, collect_links)
+        try:
+            parser.feed(html)
+            parser.close()
+        except _StopParsing:
+            pass
+        return parser
+
+    def article_links(self, html):
+        return self._parse(html, {}, collect_links=True).links
+
+    def article(self, html):
+        found = self._parse(
+            html,
+            {
+                "title": ("h1", "heading-title", False),
+                "abstract": ("div", "abstract-content selected", True),
+            },
+        ).found
+        title, abstract = found.get("title"), found.get("abstract")
+        return (
+            title.strip() if title is not None else None,
+            abstract.strip() if abstract is not None else None,
+        )
+
+    def total_results(self, html):
+        # The count is the first span.value inside div.results-amount, so only
+        # parse from the start of that div onwards.
+        position = html.find("results-amount")
+        if position == -1:
+            return None
+        start = html.rfind("<", 0, position)
+        found = self._parse(html[start:], {"value": ("span", "value", False)}).found
+        return found.get("value")
+
+
+class LxmlExtractor:
+    """
+    Extracts PubMed page fields with lxml's C HTML parser and XPath.
+    """
+
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+
+        self.lxml_html = lxml.html
+
+    @staticmethod
+    def _has_class(name):
+        return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+    def article_links(self, html):
+        tree = self.lxml_html.fromstring(html)
+        return tree.xpath(f"//a[{self._has_class('docsum-title')}]/@href")
+
+    def article(self, html):
+        tree = self.lxml_html.fromstring(html)
+        title = tree.xpath(f"//h1[{self._has_class('heading-title')}]")
+        abstract = tree.xpath("//div[@class='abstract-content selected']")
+        return (
+            title[0].text_content().strip() if title else None,
+            abstract[0].text_content().strip() if abstract else None,
+        )
+
+    def total_results(self, html):
+        tree = self.lxml_html.fromstring(html)
+        value = tree.xpath(
+            f"//div[{self._has_class('results-amount')}]"
+            f"//span[{self._has_class('value')}]"
+        )
+        return value[0].text_content() if value else None
+
+
+class SelectolaxExtractor:
+    """
+    Extracts PubMed page fields with selectolax's Lexbor-based CSS selectors.
+    """
+
+    name = "selectolax"
+
+    def __init__(self):
+        from selectolax.lexbor import LexborHTMLParser
+
+        self.parser_class = LexborHTMLParser
+
+    def article_links(self, html):
+        tree = self.parser_class(html)
+        return [node.attributes.get("href") for node in tree.css("a.docsum-title")]
+
+    def article(self, html):
+        tree = self.parser_class(html)
+        title = tree.css_first("h1.heading-title")
+        abstract = tree.css_first('div[class="abstract-content selected"]')
+        return (
+            title.text().strip() if title else None,
+            abstract.text().strip() if abstract else None,
+        )
+
+    def total_results(self, html):
+        value = self.parser_class(html).css_first("div.results-amount span.value")
+        return value.text() if value else None
+
+
+class FallbackExtractor:
+    """
+    Uses a fast backend and retries with BeautifulSoup when it finds nothing.
+    """
+
+    def __init__(self, primary):
+        self.primary = primary
+        self._fallback = None
+        self.name = primary.name
+
+    @property
+    def fallback(self):
+        # BeautifulSoup is only imported once a page needs it.
+        if self._fallback is None:
+            self._fallback = SoupExtractor()
+        return self._fallback
+
+    def article_links(self, html):
+        return self.primary.article_links(html) or self.fallback.article_links(html)
+
+    def article(self, html):
+        title, abstract = self.primary.article(html)
+        if title is None:
+            return self.fallback.article(html)
+        return title, abstract
+
+    def total_results(self, html):
+        return self.primary.total_results(html) or self.fallback.total_results(html)
+
+
+BACKENDS = {
+    "selectolax": SelectolaxExtractor,
+    "lxml": LxmlExtractor,
+    "streaming": StreamingExtractor,
+    "soup": SoupExtractor,
+}
+
+
+def get_extractor(name=None):
+    """
+    Create the HTML extractor for a backend name.
+
+    Args:
+        name (str): "selectolax", "lxml", "streaming", "soup" or "auto".
+            Defaults to the HTML_EXTRACTOR env var, or "auto", which picks the
+            fastest installed backend.
+
+    Returns:
+        object: An extractor with article_links(), article() and
+            total_results() methods. Non-soup backends fall back to
+            BeautifulSoup for pages where they find nothing.
+    """
+    name = (name or SETTINGS.get("HTML_EXTRACTOR", "auto")).lower()
+    if name == "soup":
+        return SoupExtractor()
+    if name != "auto":
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown HTML extractor: {name}")
+        return FallbackExtractor(BACKENDS[name]())
+    for backend in ("selectolax", "lxml"):
+        try:
+            return FallbackExtractor(BACKENDS[backend]())
+        except ImportError:
+            continue
+    return FallbackExtractor(StreamingExtractor())
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from settings import SETTINGS
+
+
+class CachedResponse:
+    """
+    A minimal stand-in for requests.Response served from the HTTP cache.
+    """
+
+    def __init__(self, url, text, status_code=200, headers=None):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.from_cache = True
+
+    def raise_for_status(self):
+        pass
+
+
+class HttpCache:
+    """
+    A content-addressed on-disk cache for fetched pages.
+
+    Each response is stored as a JSON file named after the SHA-256 of its URL.
+    Entries are fresh for `ttl` seconds; stale entries are revalidated with
+    their ETag/Last-Modified validators. File modification times track recency
+    so the least recently used entries are evicted once the cache grows past
+    `max_bytes`.
+    """
+
+    def __init__(self, cache_dir=None, ttl=None, max_bytes=None):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir (str): Directory holding the cache files.
+                Defaults to the HTTP_CACHE_DIR env var, or output/http-cache.
+            ttl (float): Seconds an entry is served without revalidation.
+                Defaults to the HTTP_CACHE_TTL env var, or 7 days.
+            max_bytes (int): Size cap of the cache directory.
+                Defaults to the HTTP_CACHE_MAX_MB env var (in MB), or 500 MB.
+        """
+        script_dir = os.path.dirname(__file__)
+        self.cache_dir = cache_dir or SETTINGS.get(
+            "HTTP_CACHE_DIR", os.path.join(script_dir, "../output/http-cache")
+        )
+        self.ttl = (
+            ttl if ttl is not None else float(SETTINGS.get("HTTP_CACHE_TTL", 604800))
+        )
+        self.max_bytes = max_bytes or int(
+            float(SETTINGS.get("HTTP_CACHE_MAX_MB", 500)) * 1024 * 1024
+        )
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self.total_bytes = None
+
+    def _path(self, url):
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.json")
+
+    def lookup(self, url):
+        """
+        Look up a cached entry for a URL.
+
+        Args:
+            url (str): The requested URL.
+
+        Returns:
+            tuple: (entry, fresh) where entry is the stored dict or None and
+                fresh tells whether it can be served without revalidation.
+        """
+        path = self._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, False
+
+        fresh = time.time() - entry["stored_at"] < self.ttl
+        if fresh:
+            with self.lock:
+                self.hits += 1
+            self._touch(path)
+        return entry, fresh
+
+    def validators(self, entry):
+        """
+        Build the conditional request headers for a stale entry.
+
+        Args:
+            entry (dict): The cached entry, or None.
+
+        Returns:
+            dict: If-None-Match / If-Modified-Since headers, possibly empty.
+        """
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def response_for(self, entry):
+        return CachedResponse(entry["url"], entry["text"], entry["status_code"])
+
+    def mark_revalidated(self, url, entry):
+        """
+        Refresh a stale entry after the server answered 304 Not Modified.
+
+        Args:
+            url (str): The requested URL.
+            entry (dict): The cached entry.
+
+        Returns:
+            CachedResponse: The cached response.
+        """
+        with self.lock:
+            self.revalidated += 1
+        entry["stored_at"] = time.time()
+        self._write(self._path(url), entry)
+        return self.response_for(entry)
+
+    def store(self, url, response):
+        """
+        Store a response fetched from the network, counting it as a miss.
+
+        Args:
+            url (str): The requested URL.
+            response (requests.Response): The response to cache.
+        """
+        with self.lock:
+            self.misses += 1
+        entry = {
+            "url": url,
+            "status_code": response.status_code,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "stored_at": time.time(),
+            "text": response.text,
+        }
+        self._write(self._path(url), entry)
+
+    def stats(self):
+        """
+        Report how well the cache is working.
+
+        Returns:
+            dict: Hit, miss, revalidation and eviction counters plus the hit rate.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses + self.revalidated
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidated": self.revalidated,
+                "evictions": self.evictions,
+                "hit_rate": (
+                    (self.hits + self.revalidated) / lookups if lookups else 0.0
+                ),
+            }
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _write(self, path, entry):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        # A unique temporary file, so writers in other threads or shard
+        # processes never share one, renamed into place atomically.
+        with tempfile.NamedTemporaryFile(
+            "w",
+            encoding="utf-8",
+            dir=os.path.dirname(path),
+            prefix=os.path.basename(path) + ".",
+            suffix=".tmp",
+            delete=False,
+        ) as f:
+            tmp_path = f.name
+            try:
+                json.dump(entry, f)
+            except BaseException:
+                f.close()
+                os.remove(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+        new_size = os.path.getsize(path)
+
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = self._scan_size()
+            else:
+                self.total_bytes += new_size - old_size
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        # Drop least recently used entries until the cache is back under 90% of
+        # its cap, so eviction doesn't run again on the very next write.
+        target = self.max_bytes * 0.9
+        for path, size, _ in sorted(self._entries(), key=lambda e: e[2]):
+            if self.total_bytes <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.total_bytes -= size
+            self.evictions += 1
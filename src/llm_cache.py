@@ -0,0 +1,182 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from settings import SETTINGS
+
+
+class LLMCache:
+    """
+    A persistent SQLite cache of LLM completions.
+
+    Entries are keyed on a hash of the model, the messages sent and the prompt
+    template version, so a repeat request returns the stored completion without
+    calling the API. Changing the prompt template changes its version, so the
+    entries made with the old one are no longer used. They are kept, so
+    switching back (e.g. toggling LLM_STRUCTURED_OUTPUT) finds them again;
+    only entries older than max_age are deleted.
+    """
+
+    def __init__(self, path=None, template_version=None, max_age=None):
+        """
+        Initialize the cache and open its database.
+
+        Args:
+            path (str): Path of the SQLite file.
+                Defaults to the LLM_CACHE_PATH env var, or output/llm-cache.sqlite3.
+            template_version (str): Identifier of the current prompt template.
+                Entries stored under any other version are not used.
+            max_age (float): Seconds after which an entry is deleted, whatever
+                its template version. Defaults to the LLM_CACHE_MAX_AGE env
+                var; entries are kept forever if neither is set.
+        """
+        script_dir = os.path.dirname(__file__)
+        self.path = path or SETTINGS.get(
+            "LLM_CACHE_PATH", os.path.join(script_dir, "../output/llm-cache.sqlite3")
+        )
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.template_version = template_version
+        if max_age is None and SETTINGS.get("LLM_CACHE_MAX_AGE"):
+            max_age = float(SETTINGS.get("LLM_CACHE_MAX_AGE"))
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    template_version TEXT,
+                    content TEXT NOT NULL,
+                    total_tokens INTEGER,
+                    created_at REAL
+                )
+                """)
+        if max_age is not None:
+            self.prune(max_age)
+
+    @staticmethod
+    def hash_template(template):
+        """
+        Return a short, stable version identifier for a prompt template.
+
+        Args:
+            template (str): The prompt template text.
+
+        Returns:
+            str: The template's hash.
+        """
+        return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+    def make_key(self, model, messages):
+        """
+        Build the cache key for a chat-completions request.
+
+        Args:
+            model (str): The model name.
+            messages (list): The chat messages sent to the model.
+
+        Returns:
+            str: The request's hash.
+        """
+        payload = json.dumps(
+            {
+                "model": model,
+                "messages": messages,
+                "template_version": self.template_version,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Return the stored completion for a key, or None on a miss.
+
+        Args:
+            key (str): The cache key from make_key().
+
+        Returns:
+            str: The cached completion content, or None.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content, total_tokens FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.tokens_saved += row[1] or 0
+            return row[0]
+
+    def set(self, key, model, content, total_tokens=None):
+        """
+        Store a completion.
+
+        Args:
+            key (str): The cache key from make_key().
+            model (str): The model that produced the completion.
+            content (str): The completion content.
+            total_tokens (int): Tokens the request used, if the API reported it.
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO completions VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    key,
+                    model,
+                    self.template_version,
+                    content,
+                    total_tokens,
+                    time.time(),
+                ),
+            )
+
+    def prune(self, max_age):
+        """
+        Delete the completions stored more than max_age seconds ago.
+
+        Args:
+            max_age (float): The age limit in seconds.
+
+        Returns:
+            int: The number of entries deleted.
+        """
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "DELETE FROM completions WHERE created_at < ?",
+                (time.time() - max_age,),
+            )
+            return cursor.rowcount
+
+    def clear(self):
+        """Delete every cached completion."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM completions")
+
+    def stats(self):
+        """
+        Report how well the cache is working.
+
+        Returns:
+            dict: Hits, misses, hit rate, tokens saved and the number of entries.
+        """
+        with self.lock:
+            (entries,) = self.conn.execute(
+                "SELECT COUNT(*) FROM completions"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "tokens_saved": self.tokens_saved,
+                "entries": entries,
+            }
@@ -0,0 +1,66 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from settings import SETTINGS
+
+
+class LLMDispatcher:
+    """
+    A class to run several LLM requests at once with a concurrency cap.
+    """
+
+    def __init__(self, send, max_concurrency=None):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            send (callable): Function that takes a batch of trials and returns
+                the LLM's response, e.g. LLMProcessor.process_trials.
+            max_concurrency (int): Maximum number of requests in flight.
+                Defaults to the LLM_MAX_CONCURRENCY env var, or 4.
+        """
+        self.send = send
+        self.max_concurrency = max_concurrency or int(
+            SETTINGS.get("LLM_MAX_CONCURRENCY", 4)
+        )
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+    def iter_dispatch(self, batches):
+        """
+        Send batches concurrently and yield their responses in submission order.
+
+        Batches are pulled from the iterable only while fewer than
+        max_concurrency requests are in flight, so a generator input is never
+        read far ahead of the responses.
+
+        Args:
+            batches (iterable): Batches of trials.
+
+        Yields:
+            tuple: (batch, response) pairs in the order the batches were given.
+        """
+        in_flight = deque()
+        for batch in batches:
+            in_flight.append((batch, self.executor.submit(self.send, batch)))
+            if len(in_flight) >= self.max_concurrency:
+                batch, future = in_flight.popleft()
+                yield batch, future.result()
+        while in_flight:
+            batch, future = in_flight.popleft()
+            yield batch, future.result()
+
+    def dispatch(self, batches):
+        """
+        Send batches concurrently and wait for all of them.
+
+        Args:
+            batches (iterable): Batches of trials.
+
+        Returns:
+            list: (batch, response) pairs in the order the batches were given.
+        """
+        return list(self.iter_dispatch(batches))
+
+    def shutdown(self):
+        """Stop the worker threads once in-flight requests finish."""
+        self.executor.shutdown(wait=True)
@@ -1,11 +1,98 @@
+import csv
+import io
 import json
+import logging
 import os
+import random
+import time
+
 import requests
-from dotenv import load_dotenv
 
-from prompts import CLINICAL_TRIAL_PROMPT
+from abstract_filter import AbstractFilter
+from batching import TrialBatcher, estimate_tokens
+from llm_cache import LLMCache
+from llm_dispatcher import LLMDispatcher
+from metrics import METRICS
+from prompts import CLINICAL_TRIAL_PROMPT, STRUCTURED_OUTPUT_INSTRUCTIONS
+from rate_limiter import parse_retry_after
+from response_parser import ResponseIndexer, parse_response, record_rows
+from settings import SETTINGS
+from structured_output import response_format, split_valid_trials, structured_records
+from transport import get_session
+from trial_store import TrialStore
+
+logger = logging.getLogger(__name__)
+
+
+class MalformedResponseError(ValueError):
+    """Raised when a streamed completion doesn't follow the expected line format."""
+
+
+class CompletionStream:
+    """
+    Collects a streamed completion from its server-sent event lines.
+
+    Each delta is fed to a ResponseIndexer, and every line it completes is
+    passed to the processor's on_line callback right away.
+    """
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.indexer = ResponseIndexer()
+        self.parts = []
+        self.usage = {}
+        self.start = time.perf_counter()
+        self.first_line = True
+
+    def feed(self, line):
+        """
+        Handle one line of the event stream.
+
+        Args:
+            line (str): The line, without its line break.
+
+        Returns:
+            bool: False once the stream is done.
+
+        Raises:
+            MalformedResponseError: If the stream is malformed or reports an error.
+        """
+        # Blank lines separate events; ":" lines are keep-alive comments.
+        if not line or not line.startswith("data:"):
+            return True
+        payload = line[len("data:") :].strip()
+        if payload == "[DONE]":
+            return False
+        event = json.loads(payload)
+        if "error" in event:
+            raise MalformedResponseError(f"Stream error: {event['error']}")
+        self.usage = event.get("usage") or self.usage
+        for choice in event.get("choices") or []:
+            delta = (choice.get("delta") or {}).get("content")
+            if not delta:
+                continue
+            self.parts.append(delta)
+            events = self.indexer.feed(delta)
+            if events and self.first_line:
+                METRICS.add_timing("llm_first_line", time.perf_counter() - self.start)
+                self.first_line = False
+            self.processor._emit(events)
+        if self.indexer.malformed(self.processor.stream_abort_lines):
+            raise MalformedResponseError(
+                f"No question, trial or group line in the first "
+                f"{self.indexer.lines_seen} lines of the stream"
+            )
+        return True
+
+    def close(self):
+        """
+        Finish the stream.
 
-load_dotenv()
+        Returns:
+            tuple: (content, usage) with usage {} if the API didn't report it.
+        """
+        self.processor._emit(self.indexer.close())
+        return "".join(self.parts), self.usage
 
 
 class LLMProcessor:
@@ -13,16 +100,106 @@ class LLMProcessor:
     A class to process clinical trial data using a Large Language Model (LLM) via OpenRouter API.
     """
 
-    def __init__(self, api_key):
+    SYSTEM_MESSAGE = "You are a helpful assistant specialized in analyzing multiple clinical trials at once."
+    RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        api_key,
+        cache=None,
+        batcher=None,
+        api_url=None,
+        max_concurrency=None,
+        max_retries=None,
+        timeout=None,
+        stream=None,
+        on_line=None,
+        structured=None,
+        session=None,
+        abstract_filter=None,
+    ):
         """
         Initialize the LLMProcessor with the given API key.
 
         Args:
             api_key (str): The API key for OpenRouter.
+            cache (LLMCache): Cache of previous completions. Defaults to a SQLite
+                cache under output/, unless LLM_CACHE is set to false.
+            batcher (TrialBatcher): Packs trials into requests that fit the
+                token budget. Defaults to one configured from the environment.
+            api_url (str): The chat-completions endpoint.
+                Defaults to the OPENROUTER_API_URL env var.
+            max_concurrency (int): Maximum number of LLM requests in flight.
+                Defaults to the LLM_MAX_CONCURRENCY env var, or 4.
+            max_retries (int): Retries on 429/5xx responses and network errors.
+                Defaults to the LLM_MAX_RETRIES env var, or 5.
+            timeout (tuple): (connect, read) timeouts in seconds. Defaults to
+                the LLM_CONNECT_TIMEOUT and LLM_READ_TIMEOUT env vars, or (10, 300).
+            stream (bool): Stream completions over SSE and index their lines as
+                they arrive. Defaults to the LLM_STREAM env var, or False.
+            on_line (callable): Called with each ResponseIndexer event of a
+                streamed completion as soon as its line is complete.
+            structured (bool): Ask for JSON matching structured_output's schema
+                instead of numbered lines, and re-request only the trials that
+                fail validation. Takes precedence over streaming. Defaults to
+                the LLM_STRUCTURED_OUTPUT env var, or False.
+            session (requests.Session): HTTP session. Defaults to the pooled
+                session shared through transport.get_session().
+            abstract_filter (AbstractFilter): Drops records without a usable
+                abstract and compacts the rest before they are batched.
+                Defaults to one configured from the environment, unless
+                ABSTRACT_FILTER is set to false.
         """
         self.api_key = api_key
-        self.api_url = os.getenv("OPENROUTER_API_URL")
+        self.api_url = api_url or SETTINGS.get("OPENROUTER_API_URL")
+        self.max_retries = (
+            max_retries
+            if max_retries is not None
+            else int(SETTINGS.get("LLM_MAX_RETRIES", 5))
+        )
+        self.timeout = timeout or (
+            float(SETTINGS.get("LLM_CONNECT_TIMEOUT", 10)),
+            float(SETTINGS.get("LLM_READ_TIMEOUT", 300)),
+        )
+        if stream is None:
+            stream = SETTINGS.get("LLM_STREAM", "false").lower() in ("1", "true")
+        self.stream = stream
+        self.on_line = on_line
+        # A stream is aborted when this many lines arrive without a single
+        # question, trial or group line.
+        self.stream_abort_lines = int(SETTINGS.get("LLM_STREAM_ABORT_LINES", 40))
+        if structured is None:
+            structured = SETTINGS.get("LLM_STRUCTURED_OUTPUT", "false").lower() in (
+                "1",
+                "true",
+            )
+        self.structured = structured
+        self.structured_retries = int(SETTINGS.get("LLM_STRUCTURED_RETRIES", 2))
+        instructions = STRUCTURED_OUTPUT_INSTRUCTIONS if structured else ""
+        self.dispatcher = LLMDispatcher(self.process_trials, max_concurrency)
+        # The pooled session keeps connections to the API alive across requests.
+        self.session = session or get_session()
+        if cache is None and SETTINGS.get("LLM_CACHE", "true").lower() != "false":
+            cache = LLMCache(
+                template_version=LLMCache.hash_template(
+                    CLINICAL_TRIAL_PROMPT + instructions + self.SYSTEM_MESSAGE
+                )
+            )
+        self.cache = cache
+        if (
+            abstract_filter is None
+            and SETTINGS.get("ABSTRACT_FILTER", "true").lower() != "false"
+        ):
+            abstract_filter = AbstractFilter()
+        self.abstract_filter = abstract_filter
+        self.batcher = batcher or TrialBatcher(
+            overhead_tokens=estimate_tokens(
+                CLINICAL_TRIAL_PROMPT + instructions + self.SYSTEM_MESSAGE
+            )
+            + 20
+        )
 
+    @METRICS.timed("process_trials")
     def process_trials(self, trials_data):
         """
         Process all trials at once using the LLM.
@@ -33,37 +210,248 @@ class LLMProcessor:
         Returns:
             str: The LLM's response for all trials.
         """
-        prompt = self.create_prompt(trials_data)
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json",
-                "X-Title": "Clinical Trial Analyzer",
-            }
-            data = {
-                "model": os.getenv("MODEL"),
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant specialized in analyzing multiple clinical trials at once.",
-                    },
-                    {"role": "user", "content": prompt},
-                ],
-            }
-            response = requests.post(self.api_url, headers=headers, json=data)
-            response.raise_for_status()
-            content = response.json()["choices"][0]["message"]["content"]
-            return content
+            data, cache_key, cached = self.begin_completion(trials_data)
+            if cached is not None:
+                return cached
+            if self.structured:
+                content, usage = self.complete_structured(trials_data, data)
+            elif self.stream:
+                content, usage = self.stream_completion(data)
+            else:
+                response_json = self.post_completion(data)
+                content = response_json["choices"][0]["message"]["content"]
+                usage = response_json.get("usage") or {}
+            return self.finish_completion(trials_data, data, cache_key, content, usage)
         except requests.Timeout:
-            print("The request to the LLM API timed out. Please try again later.")
+            logger.error(
+                "The request to the LLM API timed out. Please try again later."
+            )
         except requests.RequestException as e:
-            print(f"Network error when processing trials with LLM: {str(e)}")
-        except KeyError as e:
-            print(f"Unexpected response format: {str(e)}")
+            logger.error(f"Network error when processing trials with LLM: {str(e)}")
+        except (KeyError, MalformedResponseError) as e:
+            logger.error(f"Unexpected response format: {str(e)}")
         except Exception as e:
-            print(f"An unexpected error occurred: {str(e)}")
+            logger.error(f"An unexpected error occurred: {str(e)}")
         return None
 
+    def begin_completion(self, trials_data):
+        """
+        Build the request body for some trials and look it up in the cache.
+
+        Args:
+            trials_data (list): A list of dictionaries containing trial data.
+
+        Returns:
+            tuple: (data, cache_key, cached) with the request body, its cache
+                key (None without a cache) and the cached content, or None.
+        """
+        prompt = self.create_prompt(trials_data)
+        data = {"model": SETTINGS.get("MODEL"), "messages": self._messages(prompt)}
+        cache_key, cached = None, None
+        if self.cache:
+            cache_key = self.cache.make_key(data["model"], data["messages"])
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                METRICS.incr("llm_cache_hits")
+        return data, cache_key, cached
+
+    def finish_completion(self, trials_data, data, cache_key, content, usage):
+        """
+        Count a completion in the metrics and store it in the cache.
+
+        Args:
+            trials_data (list): The trials in the prompt.
+            data (dict): The request body from begin_completion().
+            cache_key (str): The cache key from begin_completion(), or None.
+            content (str): The completion.
+            usage (dict): The token usage the API reported, possibly empty.
+
+        Returns:
+            str: The completion.
+        """
+        METRICS.incr("llm_requests")
+        METRICS.incr("llm_trials", len(trials_data))
+        METRICS.incr("tokens_in", usage.get("prompt_tokens", 0))
+        METRICS.incr("tokens_out", usage.get("completion_tokens", 0))
+        if cache_key:
+            # Fall back to a rough 4-characters-per-token estimate when the
+            # API doesn't report usage.
+            prompt = data["messages"][-1]["content"]
+            total_tokens = (
+                usage.get("total_tokens") or (len(prompt) + len(content)) // 4
+            )
+            self.cache.set(cache_key, data["model"], content, total_tokens)
+        return content
+
+    def _messages(self, prompt):
+        return [
+            {"role": "system", "content": self.SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt},
+        ]
+
+    def complete_structured(self, trials_data, data):
+        """
+        Request a JSON completion and re-request the trials that fail validation.
+
+        Each trial of the response is validated on its own against
+        structured_output.TRIAL_SCHEMA. Invalid or missing trials are sent
+        again, on their own, up to LLM_STRUCTURED_RETRIES times; trials that
+        never validate are left out of the result.
+
+        Args:
+            trials_data (list): The trials in the prompt.
+            data (dict): The request body for all the trials.
+
+        Returns:
+            tuple: (content, usage) where content is the JSON of the valid
+                trials, numbered as in the original prompt, and usage sums the
+                token counts of every request.
+
+        Raises:
+            MalformedResponseError: If no trial validates.
+        """
+        usage = {}
+
+        def request(body):
+            response_json = self.post_completion(
+                dict(body, response_format=response_format())
+            )
+            for key, value in (response_json.get("usage") or {}).items():
+                if isinstance(value, int):
+                    usage[key] = usage.get(key, 0) + value
+            return response_json["choices"][0]["message"]["content"]
+
+        valid, failed = split_valid_trials(request(data), len(trials_data))
+        for _ in range(self.structured_retries):
+            if not failed:
+                break
+            logger.warning(
+                f"{len(failed)} of {len(trials_data)} trials failed schema "
+                f"validation. Re-requesting them."
+            )
+            METRICS.incr("llm_trials_rerequested", len(failed))
+            retry_prompt = self.create_prompt([trials_data[n - 1] for n in failed])
+            retry_valid, _ = split_valid_trials(
+                request(dict(data, messages=self._messages(retry_prompt))),
+                len(failed),
+            )
+            # The retry prompt numbers its trials from 1; map them back.
+            for retry_number, trial in retry_valid.items():
+                number = failed[retry_number - 1]
+                valid[number] = dict(trial, trial=number)
+            failed = [number for number in failed if number not in valid]
+
+        if not valid:
+            raise MalformedResponseError("No trial matched the response schema")
+        if failed:
+            logger.warning(
+                f"Dropping trials {failed} that never matched the response schema."
+            )
+        trials = [valid[number] for number in sorted(valid)]
+        return json.dumps({"trials": trials}), usage
+
+    def post_completion(self, data):
+        """
+        POST a chat-completions request, retrying on throttling and server errors.
+
+        429 and 5xx responses, connection errors and timeouts are retried with
+        exponential backoff and full jitter, honoring the Retry-After header
+        when the server sends one.
+
+        Args:
+            data (dict): The request body.
+
+        Returns:
+            dict: The decoded JSON response.
+
+        Raises:
+            requests.RequestException: If the request still fails after all retries.
+        """
+        return self._post(data).json()
+
+    def stream_completion(self, data):
+        """
+        Request a completion as server-sent events and index it while it streams.
+
+        Each delta is fed to a ResponseIndexer; every line it completes is
+        passed to on_line right away. The stream is abandoned as soon as it is
+        clearly not in the expected format.
+
+        Args:
+            data (dict): The request body, without the "stream" flag.
+
+        Returns:
+            tuple: (content, usage) with usage {} if the API didn't report it.
+
+        Raises:
+            requests.RequestException: If the request fails after all retries.
+            MalformedResponseError: If the stream is malformed or reports an error.
+        """
+        stream = CompletionStream(self)
+        with self._post(dict(data, stream=True), stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not stream.feed(line):
+                    break
+        return stream.close()
+
+    def _emit(self, events):
+        if self.on_line:
+            for event in events:
+                self.on_line(event)
+
+    def headers(self):
+        """Return the headers of a chat-completions request."""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "X-Title": "Clinical Trial Analyzer",
+        }
+
+    def _post(self, data, stream=False):
+        headers = self.headers()
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                METRICS.incr("llm_retries")
+            try:
+                with METRICS.timer("llm_request"):
+                    response = self.session.post(
+                        self.api_url,
+                        headers=headers,
+                        json=data,
+                        timeout=self.timeout,
+                        stream=stream,
+                    )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"LLM request failed ({e}). Retrying in {delay:.1f}s...")
+            else:
+                if (
+                    response.status_code not in self.RETRY_STATUS_CODES
+                    or attempt == self.max_retries
+                ):
+                    response.raise_for_status()
+                    return response
+                delay = self._retry_after(response)
+                response.close()
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(
+                    f"LLM API returned {response.status_code}. "
+                    f"Retrying in {delay:.1f}s..."
+                )
+            time.sleep(delay)
+
+    def _backoff(self, attempt):
+        base = float(SETTINGS.get("LLM_BACKOFF_BASE", 1))
+        cap = float(SETTINGS.get("LLM_BACKOFF_MAX", 60))
+        return random.uniform(0, min(cap, base * 2**attempt))
+
+    def _retry_after(self, response):
+        return parse_retry_after(response.headers.get("Retry-After"))
+
     def create_prompt(self, trials_data):
         """
         Create a prompt for the LLM based on multiple trials data.
@@ -80,29 +468,109 @@ class LLMProcessor:
                 for i, trial in enumerate(trials_data)
             ]
         )
-        return f"{CLINICAL_TRIAL_PROMPT}\n\nAnalyze the following clinical trials:\n\n{trials_text}"
+        instructions = STRUCTURED_OUTPUT_INSTRUCTIONS if self.structured else ""
+        return f"{CLINICAL_TRIAL_PROMPT}{instructions}\n\nAnalyze the following clinical trials:\n\n{trials_text}"
+
+    def process_in_batches(self, trials_data):
+        """
+        Process trials in as many requests as the token budget requires.
+
+        Args:
+            trials_data (list): A list of dictionaries containing trial data.
+
+        Returns:
+            list: (batch, response) pairs in the original trial order. The
+                response is None for batches the LLM failed to process.
+        """
+        return self.dispatcher.dispatch(
+            self.batcher.iter_batches(self.prepare_trials(trials_data))
+        )
+
+    def prepare_trials(self, trials_data, on_drop=None):
+        """
+        Run trials through the abstract filter, if there is one.
+
+        Args:
+            trials_data (iterable): Dictionaries containing trial data.
+            on_drop (callable): Called with each dropped trial and the reason.
+
+        Returns:
+            iterable: The trials worth sending, compacted, in their original order.
+        """
+        if self.abstract_filter is None:
+            return trials_data
+        return self.abstract_filter.iter_filter(trials_data, on_drop)
 
     def process_scraped_data(self, filepath):
-        with open(filepath, "r") as f:
-            trials_data = json.load(f)
+        """
+        Send the trials of a scraped data file to the LLM.
 
-        response = self.process_trials(trials_data)
-        return [response] if response else []
+        Args:
+            filepath (str): A JSON Lines file written by Scraper.scrape. Its
+                abstracts are read from disk as each batch's prompt is built.
 
-    def save_llm_response(self, responses, keyword):
+        Returns:
+            list: The LLM responses, in trial order.
+        """
+        store = None
+        if filepath.endswith(".json"):
+            # Scraped data saved as a JSON array by earlier versions.
+            with open(filepath, "r") as f:
+                trials_data = json.load(f)
+        else:
+            store = trials_data = TrialStore(filepath)
+        try:
+            return [
+                response
+                for _, response in self.process_in_batches(trials_data)
+                if response
+            ]
+        finally:
+            if store is not None:
+                store.close()
+
+    def response_data_path(self, keyword):
+        """Return the path of a keyword's LLM response JSON Lines file."""
         script_dir = os.path.dirname(__file__)
         output_dir = os.path.join(script_dir, "../output/response-data/")
-        os.makedirs(output_dir, exist_ok=True)
-        filename = f"{keyword.replace(' ', '_')}_llm_response.json"
-        filepath = os.path.join(output_dir, filename)
+        filename = f"{keyword.replace(' ', '_')}_llm_response.jsonl"
+        return os.path.join(output_dir, filename)
+
+    def save_llm_response(self, responses, keyword, append=False):
+        """
+        Write LLM responses to the keyword's response file, one JSON string per line.
 
-        with open(filepath, "w") as f:
-            json.dump(responses, f, indent=2)
+        Args:
+            responses (iterable): The raw responses.
+            keyword (str): The search keyword.
+            append (bool): Add to the file instead of replacing it.
+
+        Returns:
+            str: The path of the response file.
+        """
+        filepath = self.response_data_path(keyword)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+        with open(filepath, "a" if append else "w", encoding="utf-8") as f:
+            for response in responses:
+                f.write(json.dumps(response, ensure_ascii=False) + "\n")
 
-        print(f"LLM response saved to {filepath}")
+        logger.info(f"LLM response saved to {filepath}")
         return filepath
 
+    @METRICS.timed("parse_llm_response")
     def parse_llm_response(self, responses):
+        """
+        Parse LLM responses into structured records.
+
+        Args:
+            responses (list): A list of raw LLM response strings.
+
+        Returns:
+            dict: Record lists for the "Trial Identification", "Trial Questions",
+                "Study Groups" and "Group Questions" sections, concatenated
+                across responses. See response_parser.parse_response().
+        """
         parsed_data = {
             "Trial Identification": [],
             "Trial Questions": [],
@@ -111,85 +579,20 @@ class LLMProcessor:
         }
 
         for response in responses:
-            lines = response.split("\n")
-
-            # Parse Trial Identification
-            trial_count_line = next(
-                (line for line in lines if line.startswith("1A.")), ""
-            )
-            trial_count = (
-                trial_count_line.split(".")[-1].strip() if trial_count_line else "NA"
-            )
-            parsed_data["Trial Identification"].append(
-                f"1,How many Clinical Trials are there?,,\n1A,{trial_count},,\n,,,"
-            )
-
-            # Parse Trial Info
-            for line in lines:
-                if line.startswith("Trial"):
-                    parts = line.split(":")
-                    if len(parts) >= 4:
-                        parsed_data["Trial Identification"].append(
-                            f'{parts[0]},{parts[1]}," {parts[2]}",{parts[-1]}'
-                        )
-                    elif len(parts) == 3:
-                        parsed_data["Trial Identification"].append(
-                            f'{parts[0]},{parts[1]}," {parts[2]}",NA'
-                        )
-                    else:
-                        parsed_data["Trial Identification"].append(
-                            f"{parts[0]},NA,NA,NA"
-                        )
-
-            # Parse Trial Questions
-            trial_questions = []
-            for i in range(1, 10):  # Assuming 9 trial questions
-                question_line = next(
-                    (line for line in lines if line.startswith(f"{i}.")), ""
-                )
-                answer_line = next(
-                    (line for line in lines if line.startswith(f"{i}A.")), ""
-                )
-
-                question = (
-                    question_line.split(".", 1)[1].strip() if question_line else "NA"
-                )
-                answer = answer_line.split(".", 1)[1].strip() if answer_line else "NA"
-
-                trial_questions.append(f'{i}," {question}",,\n{i}A," {answer}",,')
-            parsed_data["Trial Questions"].extend(trial_questions)
-
-            # Parse Study Groups
-            study_groups = [
-                line for line in lines if line.startswith("Group") and ":" in line
-            ]
-            parsed_data["Study Groups"].extend(study_groups)
-
-            # Parse Group Questions
-            group_questions = []
-            for i in range(1, 25):  # Assuming 24 group questions
-                question_line = next(
-                    (line for line in lines if line.startswith(f"Group1-{i}.")), ""
-                )
-                answer_line = next(
-                    (line for line in lines if line.startswith(f"Group1-{i}A.")), ""
-                )
-
-                question = (
-                    question_line.split(".", 1)[1].strip() if question_line else "NA"
-                )
-                answer = answer_line.split(".", 1)[1].strip() if answer_line else "NA"
-
-                group_questions.append(
-                    f'Group1-{i}," {question}",,\nGroup1-{i}A," {answer}",,'
-                )
-            parsed_data["Group Questions"].extend(group_questions)
+            # Structured-output responses are JSON; everything else uses the
+            # numbered line format.
+            if response.lstrip().startswith("{"):
+                records_by_section = structured_records(json.loads(response)["trials"])
+            else:
+                records_by_section = parse_response(response)
+            for section, records in records_by_section.items():
+                parsed_data[section].extend(records)
 
         return parsed_data
 
     def clean_parsed_data(self, parsed_data):
         """
-        Remove specified lines from the parsed data.
+        Remove trial and study group records that carry no information.
 
         Args:
             parsed_data (dict): The parsed data dictionary.
@@ -197,30 +600,13 @@ class LLMProcessor:
         Returns:
             dict: The cleaned parsed data dictionary.
         """
-        # Remove "Trial Identification,NA,NA,NA"
-        parsed_data["Trial Identification"] = [
-            line
-            for line in parsed_data["Trial Identification"]
-            if not line.endswith(",NA,NA,NA")
-        ]
-
-        # Remove "Trial Questions,NA,NA,NA"
-        parsed_data["Trial Questions"] = [
-            line
-            for line in parsed_data["Trial Questions"]
-            if not line.endswith(",NA,NA,NA")
-        ]
-
-        # Remove "Group Questions:" and the two lines after it
-        study_groups = parsed_data["Study Groups"]
-        indices_to_remove = []
-        for i, line in enumerate(study_groups):
-            if "Group Questions" in line:
-                indices_to_remove.extend([i, i + 1, i + 2])
-
-        parsed_data["Study Groups"] = [
-            line for i, line in enumerate(study_groups) if i not in indices_to_remove
-        ]
+        for section in ("Trial Identification", "Study Groups"):
+            parsed_data[section] = [
+                record
+                for record in parsed_data[section]
+                if "fields" not in record
+                or any(field not in ("", "NA") for field in record["fields"])
+            ]
 
         return parsed_data
 
@@ -228,32 +614,18 @@ class LLMProcessor:
         # Clean the parsed data before formatting
         cleaned_data = self.clean_parsed_data(parsed_data)
 
-        csv_output = []
-
-        # Trial Identification
-        csv_output.append("Trial Identification:,,,")
-        csv_output.append(",,,")
-        csv_output.extend(cleaned_data["Trial Identification"])
-        csv_output.append(",,,")
-        csv_output.append(",,,")
-
-        # Trial Questions
-        csv_output.append("Trial Questions:,,,")
-        csv_output.append(",,,")
-        csv_output.extend(cleaned_data["Trial Questions"])
-        csv_output.append(",,,")
-        csv_output.append(",,,")
-
-        # Study Groups
-        csv_output.append("Study Groups:,,,")
-        csv_output.append(",,,")
-        csv_output.extend(cleaned_data["Study Groups"])
-        csv_output.append(",,,")
-        csv_output.append(",,,")
-
-        # Group Questions
-        csv_output.append("Group Questions:,,,")
-        csv_output.append(",,,")
-        csv_output.extend(cleaned_data["Group Questions"])
-
-        return "\n".join(csv_output)
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator="\n")
+        spacer = ["", "", "", ""]
+
+        sections = list(cleaned_data.items())
+        for i, (section, records) in enumerate(sections):
+            writer.writerow([f"{section}:", "", "", ""])
+            writer.writerow(spacer)
+            for record in records:
+                writer.writerows(record_rows(record))
+            if i < len(sections) - 1:
+                writer.writerow(spacer)
+                writer.writerow(spacer)
+
+        return output.getvalue().rstrip("\n")
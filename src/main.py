@@ -1,90 +1,378 @@
+import argparse
+import contextlib
+import functools
+import importlib
+import importlib.util
+import logging
 import sys
-from scraper import Scraper
+import time
+from eutils_source import get_scraper
 from llm_processor import LLMProcessor
 from data_saver import DataSaver
-import json
+from checkpoint_store import CheckpointStore
+from dedup_index import DedupIndex
+from metrics import METRICS, profiled
+from sharding import ShardedRunner
+from settings import SETTINGS
 import os
-import dotenv
 
-dotenv.load_dotenv()
+logger = logging.getLogger(__name__)
 
+# The module and class of each engine. The module is imported when the engine
+# is used, so threaded runs don't load asyncio.
+ENGINES = {
+    "threads": ("pipeline", "Pipeline"),
+    "async": ("async_pipeline", "AsyncPipeline"),
+}
 
-def main():
-    try:
-        keyword = input("Enter the keyword to search for (e.g. 'Breast Cancer'): ")
-        scraper = Scraper()
-
-        total_pages = scraper.get_total_pages(keyword)
-        if total_pages:
-            print(f"Total available pages: {total_pages}")
-            num_pages = int(
-                input(f"Enter the number of pages to scrape (1-{total_pages}): ")
+# The optional package each output format or engine needs; see
+# requirements-optional.txt.
+OPTIONAL_PACKAGES = {
+    "parquet": "pyarrow",
+    "async": "aiohttp",
+}
+
+
+def require_optional(option):
+    """
+    Check that the optional package an output format or engine needs is installed.
+
+    Args:
+        option (str): The output format or engine.
+
+    Raises:
+        ValueError: If its package is missing.
+    """
+    package = OPTIONAL_PACKAGES.get(option)
+    if package and importlib.util.find_spec(package) is None:
+        raise ValueError(
+            f"'{option}' needs the {package} package: "
+            "pip install -r requirements-optional.txt"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scrape clinical trials, analyze them with an LLM and save the results."
+    )
+    parser.add_argument(
+        "-k",
+        "--keyword",
+        action="append",
+        default=[],
+        help="Keyword to search for. Can be given several times.",
+    )
+    parser.add_argument(
+        "-f",
+        "--jobs-file",
+        help="File with one job per line: 'keyword' or 'keyword,pages'. "
+        "Blank lines and lines starting with # are ignored.",
+    )
+    parser.add_argument(
+        "-p",
+        "--pages",
+        type=int,
+        help="Pages to scrape for jobs without their own page limit "
+        "(default: all available pages).",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=["sections", "wide", "parquet", "long"],
+        help="Output layout; parquet needs pyarrow "
+        "(default: the OUTPUT_FORMAT env var, or sections).",
+    )
+    parser.add_argument(
+        "--source",
+        choices=["html", "eutils"],
+        help="Where articles come from: the PubMed web pages or the E-utilities "
+        "API (default: the SCRAPER_SOURCE env var, or html).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=list(ENGINES),
+        help="Run the stages in threads or on one asyncio event loop, which "
+        "needs aiohttp (default: the PIPELINE_ENGINE env var, or threads).",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=int(SETTINGS.get("SHARD_PROCESSES", 1)),
+        help="Split each job's pages across this many worker processes "
+        "(default: the SHARD_PROCESSES env var, or 1).",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        help="Where to write the JSON metrics report "
+        "(default: a timestamped file in METRICS_DIR, or output/metrics).",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Run the jobs under cProfile and dump the stats to PATH.",
+    )
+    parser.add_argument(
+        "--log-level",
+        default=SETTINGS.get("LOG_LEVEL", "INFO"),
+        help="Logging level (default: the LOG_LEVEL env var, or INFO).",
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Forget the checkpoints of the given keywords and start them over.",
+    )
+    return parser.parse_args(argv)
+
+
+def read_jobs(args):
+    """
+    Build the job queue from the command-line arguments.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        list: (keyword, pages) tuples, with pages None for "use the default".
+    """
+    jobs = [(keyword, args.pages) for keyword in args.keyword]
+    if args.jobs_file:
+        with open(args.jobs_file, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                keyword, _, pages = line.rpartition(",")
+                if keyword and pages.strip().isdigit():
+                    jobs.append((keyword.strip(), int(pages)))
+                elif pages.strip().isdigit():
+                    raise ValueError(f"Missing keyword on line {line_number}")
+                else:
+                    jobs.append((line, args.pages))
+    return jobs
+
+
+def build_pipeline(output_format=None, source=None, engine=None):
+    """
+    Create one pipeline whose session, caches and LLM pool every job shares.
+
+    Args:
+        output_format (str): Output layout, or None for the OUTPUT_FORMAT default.
+        source (str): Scraper source backend, or None for the SCRAPER_SOURCE default.
+        engine (str): "threads" or "async", or None for the PIPELINE_ENGINE
+            default.
+
+    Returns:
+        Pipeline: The pipeline.
+    """
+    engine = (engine or SETTINGS.get("PIPELINE_ENGINE", "threads")).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown pipeline engine: {engine}")
+    require_optional(engine)
+    require_optional(output_format or SETTINGS.get("OUTPUT_FORMAT", "sections"))
+    scraper = get_scraper(source)
+    llm_processor = LLMProcessor(api_key=SETTINGS.get("OPENROUTER_API_KEY"))
+    data_saver = DataSaver()
+
+    # Each scraped record flows to the LLM as soon as it is ready, and LLM
+    # results are appended to the CSV as they finish.
+    save_intermediate = SETTINGS.get("SAVE_INTERMEDIATE_FILES", "").lower() in (
+        "1",
+        "true",
+    )
+    checkpoints = None
+    if SETTINGS.get("CHECKPOINTS", "true").lower() != "false":
+        checkpoints = CheckpointStore()
+    dedup = None
+    if SETTINGS.get("DEDUP", "true").lower() != "false":
+        dedup = DedupIndex()
+    module, name = ENGINES[engine]
+    pipeline_class = getattr(importlib.import_module(module), name)
+    return pipeline_class(
+        scraper,
+        llm_processor,
+        data_saver,
+        save_intermediate=save_intermediate,
+        checkpoints=checkpoints,
+        output_format=output_format,
+        dedup=dedup,
+    )
+
+
+def run_jobs(pipeline, jobs, restart=False, runner=None):
+    """
+    Run keyword jobs one after another on a shared pipeline.
+
+    A failing job is reported and the queue moves on to the next one.
+
+    Args:
+        pipeline (Pipeline): The shared pipeline.
+        jobs (list): (keyword, pages) tuples; pages None means all pages.
+        restart (bool): Forget each keyword's checkpoints before running it.
+        runner (ShardedRunner): Runs the jobs across worker processes instead
+            of on the pipeline directly.
+
+    Returns:
+        list: One summary dict per job, with "status" and "seconds" added.
+    """
+    summaries = []
+    for i, (keyword, pages) in enumerate(jobs, start=1):
+        logger.info(f"[{i}/{len(jobs)}] {keyword}")
+        start = time.perf_counter()
+        try:
+            if restart and pipeline.checkpoints:
+                pipeline.checkpoints.reset(keyword)
+            total_pages = pipeline.scraper.get_total_pages(keyword)
+            if pages is None:
+                if not total_pages:
+                    raise ValueError("Couldn't determine the number of pages.")
+                pages = total_pages
+            elif total_pages:
+                pages = min(pages, total_pages)
+            summary = (runner or pipeline).run(keyword, pages)
+            summary["status"] = "ok"
+        except Exception as e:
+            logger.error(f"Job '{keyword}' failed: {e}")
+            summary = {"keyword": keyword, "trials": 0, "output_file": None}
+            summary["status"] = f"failed: {e}"
+        summary["seconds"] = time.perf_counter() - start
+        summaries.append(summary)
+    return summaries
+
+
+def print_summary(pipeline, summaries):
+    if summaries:
+        width = max(len(s["keyword"]) for s in summaries)
+        logger.info(
+            f"{'Keyword':<{width}}  {'Trials':>6}  {'Time':>8}  Status / Output"
+        )
+        for s in summaries:
+            detail = s["output_file"] if s["status"] == "ok" else s["status"]
+            logger.info(
+                f"{s['keyword']:<{width}}  {s['trials']:>6}  "
+                f"{s['seconds']:>7.1f}s  {detail or 'no data'}"
             )
-            if num_pages < 1 or num_pages > total_pages:
-                raise ValueError(f"Please enter a number between 1 and {total_pages}")
-        else:
-            num_pages = int(input("Enter the number of pages to scrape: "))
 
-        llm_processor = LLMProcessor(api_key=os.getenv("OPENROUTER_API_KEY"))
-        data_saver = DataSaver()
+    if pipeline.scraper.cache:
+        stats = pipeline.scraper.cache.stats()
+        logger.info(
+            f"HTTP cache: {stats['hits']} hits, {stats['revalidated']} revalidated, "
+            f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)"
+        )
+
+    if pipeline.llm_processor.cache:
+        stats = pipeline.llm_processor.cache.stats()
+        logger.info(
+            f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate), "
+            f"{stats['tokens_saved']} tokens saved"
+        )
+
+    if pipeline.llm_processor.abstract_filter:
+        stats = pipeline.llm_processor.abstract_filter.stats()
+        dropped = ", ".join(f"{n} {r}" for r, n in stats["dropped"].items())
+        logger.info(
+            f"Abstract filter: {stats['kept']} of {stats['records']} trials sent"
+            f"{f' ({dropped} dropped)' if dropped else ''}, "
+            f"~{stats['tokens_removed']} tokens and {stats['chars_removed']} "
+            f"characters removed"
+        )
+
+    if pipeline.dedup:
+        stats = pipeline.dedup.stats()
+        logger.info(
+            f"Dedup index: {stats['linked']} results reused from other keywords, "
+            f"{stats['articles']} articles indexed"
+        )
+
 
-        csv_lines = []
+def save_metrics(pipeline, summaries, path=None):
+    """
+    Write the run's metrics report, with the cache statistics and job summaries.
 
-        batch_size = 10
-        for start_page in range(1, num_pages + 1, batch_size):
-            end_page = min(start_page + batch_size - 1, num_pages)
-            print(f"Scraping pages {start_page} to {end_page}...")
+    Args:
+        pipeline (Pipeline): The pipeline the jobs ran on.
+        summaries (list): The summaries from run_jobs().
+        path (str): The report file, or None for the default location.
 
-            # Step 1: Scrape data and save to file
-            scraped_data_file = scraper.scrape(
-                keyword, end_page - start_page + 1, start_page
+    Returns:
+        str: The path of the report.
+    """
+    caches = {}
+    if pipeline.scraper.cache:
+        caches["http"] = pipeline.scraper.cache.stats()
+    if pipeline.llm_processor.cache:
+        caches["llm"] = pipeline.llm_processor.cache.stats()
+    if pipeline.dedup:
+        caches["dedup"] = pipeline.dedup.stats()
+    abstract_filter = pipeline.llm_processor.abstract_filter
+    return METRICS.save_report(
+        path,
+        caches=caches,
+        rate_limits=pipeline.scraper.rate_limiter.stats(),
+        abstract_filter=abstract_filter.stats() if abstract_filter else None,
+        jobs=summaries,
+    )
+
+
+def prompt_job(pipeline):
+    keyword = input("Enter the keyword to search for (e.g. 'Breast Cancer'): ")
+
+    total_pages = pipeline.scraper.get_total_pages(keyword)
+    if total_pages:
+        logger.info(f"Total available pages: {total_pages}")
+        num_pages = int(
+            input(f"Enter the number of pages to scrape (1-{total_pages}): ")
+        )
+        if num_pages < 1 or num_pages > total_pages:
+            raise ValueError(f"Please enter a number between 1 and {total_pages}")
+    else:
+        num_pages = int(input("Enter the number of pages to scrape: "))
+    return keyword, num_pages
+
+
+def main(argv=None):
+    try:
+        args = parse_args(argv)
+        # Worker processes of sharded runs read the level from the environment.
+        os.environ["LOG_LEVEL"] = args.log_level
+        logging.basicConfig(
+            level=args.log_level.upper(),
+            format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+        )
+        METRICS.reset()
+        jobs = read_jobs(args)
+        pipeline = build_pipeline(args.output_format, args.source, args.engine)
+
+        if not jobs:
+            # No keywords on the command line: ask for one interactively.
+            jobs = [prompt_job(pipeline)]
+
+        runner = None
+        if args.processes > 1:
+            factory = functools.partial(
+                build_pipeline, source=args.source, engine=args.engine
+            )
+            runner = ShardedRunner(pipeline, factory, args.processes)
+        with profiled(args.profile) if args.profile else contextlib.nullcontext():
+            summaries = run_jobs(pipeline, jobs, restart=args.restart, runner=runner)
+        print_summary(pipeline, summaries)
+        if (
+            args.metrics_file
+            or SETTINGS.get("METRICS_REPORT", "true").lower() != "false"
+        ):
+            logger.info(
+                f"Metrics saved to {save_metrics(pipeline, summaries, args.metrics_file)}"
             )
+        if args.profile:
+            logger.info(f"Profile saved to {args.profile}")
+        logger.info("Done!")
 
-            with open(scraped_data_file, "r") as f:
-                trials_data = json.load(f)
-
-            if not trials_data:
-                print("No trial data found in this batch. Continuing to next batch.")
-                continue
-
-            # Step 2: Process scraped data with LLM and save response
-            print("Processing trials with LLM...")
-            llm_responses = llm_processor.process_scraped_data(scraped_data_file)
-            print("Saving LLM response...")
-            saved_file = llm_processor.save_llm_response(llm_responses, keyword)
-
-            if saved_file:
-                print(f"Response saved to: {saved_file}")
-            else:
-                print("No file was saved.")
-
-            if not llm_responses:
-                print("No LLM responses generated. Continuing to next batch.")
-                continue
-
-            # Step 3: Parse LLM response and save to CSV
-            print("Parsing LLM response and converting to CSV format...")
-            parsed_data = llm_processor.parse_llm_response(
-                trials_data
-            )  # Use trials_data directly
-
-        # Save the CSV
-        if csv_lines:
-            print("Saving results to CSV file...")
-            csv_filename = f"{keyword.replace(' ', '_')}_clinical_trials_data.csv"
-            csv_output = llm_processor.format_parsed_data_as_csv(parsed_data)
-            saved_data = data_saver.save_csv_string(csv_output, csv_filename)
-            print(saved_data)
-            print(f"Results saved to {csv_filename}")
-        else:
-            print("No data to save.")
-
-        print("Done!")
+        if any(s["status"] != "ok" for s in summaries):
+            sys.exit(1)
 
     except ValueError as ve:
-        print(f"Invalid input: {ve}")
+        logger.error(f"Invalid input: {ve}")
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        logger.error(f"An unexpected error occurred: {e}")
         sys.exit(1)
 
 
@@ -0,0 +1,158 @@
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from settings import SETTINGS
+
+
+class Metrics:
+    """
+    Thread-safe timers and counters for one run.
+
+    Timers keep every duration so the report can give exact percentiles;
+    counters are plain sums (bytes fetched, tokens, retries, cache hits...).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget everything recorded so far and restart the run clock."""
+        with self.lock:
+            self.timings = {}
+            self.counters = {}
+            self.started_at = time.time()
+
+    def add_timing(self, name, seconds):
+        with self.lock:
+            self.timings.setdefault(name, []).append(seconds)
+
+    def incr(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def timer(self, name):
+        """Time the body of a with block under `name`, even if it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_timing(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        """Decorator timing every call of a function under `name`."""
+
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def report(self, **extra):
+        """
+        Summarize the run.
+
+        Args:
+            **extra: Additional sections to include, e.g. cache statistics.
+
+        Returns:
+            dict: Wall time, per-timer count/total/p50/p95/max in seconds,
+                the counters and the extra sections.
+        """
+        with self.lock:
+            timings = {name: sorted(values) for name, values in self.timings.items()}
+            counters = dict(self.counters)
+        return {
+            "started_at": self.started_at,
+            "wall_seconds": time.time() - self.started_at,
+            "timings": {
+                name: {
+                    "count": len(values),
+                    "total": sum(values),
+                    "p50": percentile(values, 50),
+                    "p95": percentile(values, 95),
+                    "max": values[-1],
+                }
+                for name, values in timings.items()
+            },
+            "counters": counters,
+            **extra,
+        }
+
+    def save_report(self, path=None, **extra):
+        """
+        Write the run report as JSON.
+
+        Args:
+            path (str): The report file. Defaults to a timestamped file in the
+                METRICS_DIR env var directory, or output/metrics.
+            **extra: Additional sections, see report().
+
+        Returns:
+            str: The path of the report.
+        """
+        if path is None:
+            script_dir = os.path.dirname(__file__)
+            directory = SETTINGS.get(
+                "METRICS_DIR", os.path.join(script_dir, "../output/metrics")
+            )
+            path = os.path.join(
+                directory, time.strftime("run-%Y%m%d-%H%M%S.json", time.localtime())
+            )
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(**extra), f, indent=2)
+        return path
+
+
+def percentile(sorted_values, pct):
+    """
+    Return a percentile of already sorted values by linear interpolation.
+
+    Args:
+        sorted_values (list): The values, in ascending order.
+        pct (float): The percentile, 0-100.
+
+    Returns:
+        float: The percentile, or None for no values.
+    """
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] * (1 - fraction) + sorted_values[upper] * fraction
+
+
+@contextmanager
+def profiled(path):
+    """
+    Run the body of a with block under cProfile and dump the stats to `path`.
+
+    The dump can be read with `python -m pstats <path>` or snakeviz. Only the
+    calling thread is profiled; worker threads show up through the time the
+    main thread spends waiting on them, and through the stage timers.
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        profiler.dump_stats(path)
+
+
+# Shared by every module of a run, like the logging module's loggers.
+METRICS = Metrics()
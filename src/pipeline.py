@@ -0,0 +1,350 @@
+import json
+import logging
+import os
+import queue
+import threading
+
+from checkpoint_store import CheckpointStore
+from settings import SETTINGS
+from trial_store import TrialStore
+
+logger = logging.getLogger(__name__)
+
+
+class Pipeline:
+    """
+    A class to stream trial records from the scraper through the LLM and into the CSV output.
+
+    Each stage runs in its own thread and hands work to the next one through a
+    bounded queue, so scraping and LLM calls overlap and memory stays flat no
+    matter how many pages are requested.
+    """
+
+    _DONE = object()
+    # How often a stage blocked on a queue checks whether the run stopped.
+    _POLL_SECONDS = 0.1
+
+    def __init__(
+        self,
+        scraper,
+        llm_processor,
+        data_saver,
+        queue_size=None,
+        save_intermediate=False,
+        checkpoints=None,
+        output_format=None,
+        dedup=None,
+    ):
+        """
+        Initialize the pipeline with the objects that run each stage.
+
+        Args:
+            scraper (Scraper): The scraper producing trial records.
+            llm_processor (LLMProcessor): The processor sending trials to the LLM.
+            data_saver (DataSaver): The saver writing the CSV output.
+            queue_size (int): Maximum number of items waiting between two stages.
+                Defaults to the PIPELINE_QUEUE_SIZE env var, or 50.
+            save_intermediate (bool): Also stream the scraped records and LLM
+                responses to the intermediate JSON Lines files.
+            checkpoints (CheckpointStore): Records each article's progress so an
+                interrupted or repeated run only processes new or failed articles.
+            output_format (str): "sections" for the sectioned CSV, "wide" for a
+                one-row-per-URL CSV, "parquet" for a Parquet dataset, "jsonl"
+                for the parsed records as JSON Lines or "long" for a tidy
+                one-row-per-record CSV.
+                Defaults to the OUTPUT_FORMAT env var, or "sections".
+            dedup (DedupIndex): Cross-keyword index of analyzed articles. Known
+                articles skip the fetch and LLM stages and their stored results
+                are written to this keyword's output.
+        """
+        self.scraper = scraper
+        self.llm_processor = llm_processor
+        self.data_saver = data_saver
+        self.queue_size = queue_size or int(SETTINGS.get("PIPELINE_QUEUE_SIZE", 50))
+        self.save_intermediate = save_intermediate
+        self.checkpoints = checkpoints
+        self.output_format = output_format or SETTINGS.get("OUTPUT_FORMAT", "sections")
+        self.dedup = dedup
+
+    def run(self, keyword, num_pages, start_page=1):
+        """
+        Scrape, analyze and save the trials for a keyword.
+
+        Args:
+            keyword (str): The search keyword.
+            num_pages (int): The number of search result pages to scrape.
+            start_page (int): The first search result page to scrape.
+
+        Returns:
+            dict: A summary with the keyword, the trial count and the output path.
+        """
+        records = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        # Set when the run is abandoned, by the LLM stage if it fails or by
+        # the output stage if writing fails: the stages stop taking new work.
+        stop = threading.Event()
+        run = KeywordRun(self, keyword)
+
+        def scrape_stage():
+            trials = self.scraper.iter_trials(
+                keyword,
+                num_pages,
+                start_page,
+                checkpoints=self.checkpoints,
+                dedup=self.dedup,
+            )
+            for trial in trials:
+                if stop.is_set():
+                    break
+                trial, result = run.route(trial)
+                if result:
+                    results.put(result)
+                elif trial:
+                    self._put(records, trial, stop)
+
+        def llm_stage():
+            try:
+                trials = self.llm_processor.prepare_trials(
+                    self._drain(records, stop), on_drop=run.skip
+                )
+                batches = self.llm_processor.batcher.iter_batches(trials)
+                dispatched = self.llm_processor.dispatcher.iter_dispatch(
+                    self._mark_sent(keyword, batches)
+                )
+                for batch, response in dispatched:
+                    if stop.is_set():
+                        break
+                    if response:
+                        results.put((batch, response, None, None))
+                    else:
+                        run.fail(batch)
+            except Exception:
+                # Stop the scrape stage rather than fetch pages nobody will send.
+                stop.set()
+                raise
+
+        threads = [
+            threading.Thread(
+                target=self._run_stage,
+                args=(scrape_stage, records, errors, stop),
+                daemon=True,
+            ),
+            threading.Thread(
+                target=self._run_stage,
+                args=(llm_stage, results, errors),
+                daemon=True,
+            ),
+        ]
+        for thread in threads:
+            thread.start()
+
+        try:
+            for result in self._drain(results):
+                run.write(*result)
+        except BaseException:
+            # Stop the stages and keep emptying the queues until they end, so
+            # none of them stays blocked on a full queue.
+            stop.set()
+            while any(thread.is_alive() for thread in threads):
+                for in_queue in (records, results):
+                    self._discard(in_queue)
+                for thread in threads:
+                    thread.join(self._POLL_SECONDS)
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+            run.close()
+
+        if errors:
+            raise errors[0]
+        return run.summary()
+
+    def _mark(self, keyword, batch, state):
+        if self.checkpoints:
+            self.checkpoints.mark(keyword, [trial["url"] for trial in batch], state)
+
+    def _mark_sent(self, keyword, batches):
+        for batch in batches:
+            self._mark(keyword, batch, CheckpointStore.SENT)
+            yield batch
+
+    def _run_stage(self, stage, out_queue, errors, stop=None):
+        try:
+            stage()
+        except Exception as e:
+            errors.append(e)
+        finally:
+            if stop:
+                self._put(out_queue, self._DONE, stop)
+            else:
+                out_queue.put(self._DONE)
+
+    def _put(self, out_queue, item, stop):
+        """Put an item on a queue, unless the queue is full and the run stopped."""
+        while True:
+            try:
+                out_queue.put(item, timeout=self._POLL_SECONDS)
+                return
+            except queue.Full:
+                if stop.is_set():
+                    return
+
+    def _drain(self, in_queue, stop=None):
+        """Yield a queue's items until its _DONE, or until the run is stopped."""
+        while not (stop and stop.is_set()):
+            try:
+                item = in_queue.get(timeout=self._POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is self._DONE:
+                return
+            yield item
+
+    @staticmethod
+    def _discard(in_queue):
+        try:
+            while True:
+                in_queue.get_nowait()
+        except queue.Empty:
+            pass
+
+
+class KeywordRun:
+    """
+    The outputs and bookkeeping of one keyword's run, shared by both engines.
+
+    Opens the output writer and the intermediate files, routes scraped trials
+    either to the LLM or, when the dedup index already has their result,
+    straight to the output, and writes each result and its checkpoints.
+    """
+
+    def __init__(self, pipeline, keyword):
+        """
+        Open the outputs of a run.
+
+        Args:
+            pipeline (Pipeline): The pipeline running the keyword.
+            keyword (str): The search keyword.
+        """
+        self.pipeline = pipeline
+        self.keyword = keyword
+        self.scraped_store, self.response_log = None, None
+        if pipeline.save_intermediate:
+            self.scraped_store = TrialStore(
+                pipeline.scraper.scraped_data_path(keyword), truncate=True
+            )
+            response_path = pipeline.llm_processor.response_data_path(keyword)
+            os.makedirs(os.path.dirname(response_path), exist_ok=True)
+            self.response_log = open(response_path, "w", encoding="utf-8")
+
+        output_name = f"{keyword.replace(' ', '_')}_clinical_trials_data"
+        self.csv_filename = f"{output_name}.csv"
+        self.output_path = None
+        self.writer = None
+        data_saver, checkpoints = pipeline.data_saver, pipeline.checkpoints
+        # Resuming: keep the rows of articles parsed in earlier runs. Otherwise
+        # the output is rewritten, so a re-run doesn't duplicate rows.
+        resuming = bool(
+            checkpoints and checkpoints.counts(keyword).get(CheckpointStore.PARSED)
+        )
+        if resuming:
+            logger.info(f"Resuming {keyword}: {checkpoints.counts(keyword)}")
+        if pipeline.output_format != "sections":
+            self.writer = data_saver.open_trial_writer(
+                output_name, pipeline.output_format, append=resuming
+            )
+            self.output_path = self.writer.path
+        elif resuming:
+            self.output_path = os.path.join(data_saver.output_dir, self.csv_filename)
+        self.trial_count = 0
+
+    def route(self, trial):
+        """
+        Record a scraped trial and tell where it goes next.
+
+        Args:
+            trial (dict): A record from the scraper's iter_trials().
+
+        Returns:
+            tuple: (trial, result) with the trial to send to the LLM, or the
+                (batch, response, parsed_data, urls) result to write as it is.
+        """
+        result_id = trial.pop("result_id", None)
+        if self.scraped_store is not None:
+            self.scraped_store.append(trial)
+        if not result_id:
+            return trial, None
+        # Already analyzed under another keyword: its stored result goes
+        # straight to the output stage, under the URL listed here.
+        _, parsed_data = self.pipeline.dedup.result(result_id)
+        return None, ([trial], None, parsed_data, [trial["url"]])
+
+    def skip(self, trial, reason):
+        """Checkpoint a trial the abstract filter dropped."""
+        self.pipeline._mark(self.keyword, [trial], CheckpointStore.SKIPPED)
+
+    def fail(self, batch):
+        """Checkpoint a batch the LLM failed to process."""
+        logger.warning(f"No LLM response for {len(batch)} trials. Skipping.")
+        self.pipeline._mark(self.keyword, batch, CheckpointStore.FAILED)
+
+    def write(self, batch, response, parsed_data, urls):
+        """
+        Write a result to the output and checkpoint its trials as parsed.
+
+        Trials are checkpointed once their rows are in the output file. A
+        writer that buffers rows (Parquet row groups, long CSV batches) only
+        reports them when it writes them, so a crash never leaves parsed
+        checkpoints for rows that were lost.
+
+        Args:
+            batch (list): The trials of the result.
+            response (str): The LLM response, or None for a linked result.
+            parsed_data (dict): The parsed records of a linked result.
+            urls (list): The article URLs of a linked result.
+        """
+        pipeline = self.pipeline
+        if response:
+            if self.response_log is not None:
+                self.response_log.write(json.dumps(response, ensure_ascii=False) + "\n")
+            parsed_data = pipeline.llm_processor.parse_llm_response([response])
+            if pipeline.dedup:
+                pipeline.dedup.store_result(batch, parsed_data)
+        if self.writer:
+            urls = urls or [trial["url"] for trial in batch]
+            self._mark_parsed(self.writer.write(" ".join(urls), parsed_data))
+        else:
+            csv_output = pipeline.llm_processor.format_parsed_data_as_csv(parsed_data)
+            if self.output_path is None:
+                pipeline.data_saver.save_csv_string(
+                    csv_output + "\n", self.csv_filename
+                )
+                self.output_path = os.path.join(
+                    pipeline.data_saver.output_dir, self.csv_filename
+                )
+            else:
+                pipeline.data_saver.append_csv_string(csv_output, self.csv_filename)
+            pipeline._mark(self.keyword, batch, CheckpointStore.PARSED)
+        self.trial_count += len(batch)
+        logger.info(f"Saved results for {self.trial_count} trials so far.")
+
+    def close(self):
+        if self.writer:
+            self._mark_parsed(self.writer.close())
+        if self.scraped_store is not None:
+            self.scraped_store.close()
+            self.response_log.close()
+
+    def _mark_parsed(self, urls):
+        if urls and self.pipeline.checkpoints:
+            self.pipeline.checkpoints.mark(self.keyword, urls, CheckpointStore.PARSED)
+
+    def summary(self):
+        """Return the run's summary with the keyword, trial count and output path."""
+        return {
+            "keyword": self.keyword,
+            "trials": self.trial_count,
+            "output_file": self.output_path,
+        }
@@ -5,3 +5,14 @@ CLINICAL_TRIAL_PROMPT = """
 Trial title: {headline}
 Trial abstract: {body}
 """
+
+STRUCTURED_OUTPUT_INSTRUCTIONS = """
+Answer with a single JSON object and nothing else. It must have a "trials"
+array with one object per trial, in the order given, each with:
+- "trial": the trial's number from "Trial N:" below
+- "trial_info": the trial's identification fields (registry ID, title, PMID)
+- "questions": the numbered trial questions as {"id", "question", "answer"}
+- "groups": one {"fields", "questions"} object per study group, with the
+  numbered group questions as {"id", "question", "answer"}
+Use "NA" for unknown answers. Do not use Markdown or code fences.
+"""
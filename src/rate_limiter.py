@@ -0,0 +1,328 @@
+import logging
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+from settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value (str): Delay in seconds or an HTTP date, or None.
+
+    Returns:
+        float: The delay in seconds, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket used to cap the request rate to a single host.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate (float): Tokens added per second (i.e. the sustained request rate).
+            capacity (float): Maximum burst size. Defaults to one second of tokens.
+        """
+        if rate <= 0:
+            raise ValueError("Rate must be greater than 0.")
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity else max(1.0, self.rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        # No tokens are earned while the bucket is paused.
+        elapsed = max(0.0, now - max(self.updated_at, self.paused_until))
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens=1):
+        """
+        Consume the requested number of tokens if they are available now.
+
+        Args:
+            tokens (float): The number of tokens to consume.
+
+        Returns:
+            float: 0 if the tokens were consumed, otherwise the seconds to
+                wait before trying again.
+        """
+        with self.lock:
+            self._refill()
+            wait = self.paused_until - self.updated_at
+            if wait <= 0:
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return 0.0
+                wait = (tokens - self.tokens) / self.rate
+            return wait
+
+    def acquire(self, tokens=1):
+        """
+        Block until the requested number of tokens is available, then consume them.
+
+        Args:
+            tokens (float): The number of tokens to consume.
+        """
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens=1):
+        """Like acquire(), but sleeps without blocking the event loop."""
+        import asyncio
+
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def set_rate(self, rate):
+        """
+        Change the sustained rate; tokens already earned are kept.
+
+        Args:
+            rate (float): The new number of tokens added per second.
+        """
+        with self.lock:
+            self._refill()
+            self.rate = float(rate)
+
+    def pause(self, seconds):
+        """
+        Hand out no tokens for the given number of seconds, e.g. after a Retry-After.
+
+        Args:
+            seconds (float): How long to pause, from now.
+        """
+        with self.lock:
+            self._refill()
+            self.paused_until = max(self.paused_until, self.updated_at + seconds)
+            # Resume at the sustained rate rather than with a burst.
+            self.tokens = min(self.tokens, 1.0)
+
+
+class HostRateLimiter:
+    """
+    Keeps one token bucket per host so every server gets its own request budget.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate (float): Requests per second allowed for each host.
+            capacity (float): Maximum burst size for each host.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def bucket_for(self, url):
+        host = urlsplit(url).netloc
+        with self.lock:
+            bucket = self.buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.capacity)
+                self.buckets[host] = bucket
+            return bucket
+
+    def wait(self, url):
+        """
+        Block until a request to the host of the given URL is allowed.
+
+        Args:
+            url (str): The URL about to be requested.
+        """
+        self.bucket_for(url).acquire()
+
+    async def wait_async(self, url):
+        """Like wait(), for coroutines: other tasks run while this one waits."""
+        await self.bucket_for(url).acquire_async()
+
+    def record(self, url, status, latency, retry_after=None):
+        """
+        Report the outcome of a request. The fixed-rate limiter ignores it.
+
+        Args:
+            url (str): The requested URL.
+            status (int): The response status, or None if the request failed
+                without a response.
+            latency (float): Seconds the request took.
+            retry_after (float): The server's Retry-After delay, if any.
+        """
+
+    def scaled(self, share):
+        """
+        Return a new limiter allowing a share of this one's rate.
+
+        Args:
+            share (float): The fraction of the rate, e.g. 1/N for N processes.
+
+        Returns:
+            HostRateLimiter: The new limiter.
+        """
+        return HostRateLimiter(self.rate * share, self.capacity)
+
+    def stats(self):
+        """
+        Return each host's current request rate.
+
+        Returns:
+            dict: Host to {"rate": requests per second}.
+        """
+        with self.lock:
+            return {host: {"rate": b.rate} for host, b in self.buckets.items()}
+
+
+class AdaptiveRateLimiter(HostRateLimiter):
+    """
+    A per-host limiter whose rate follows the server's responses (AIMD).
+
+    Every successful, fast response raises the host's rate additively, by
+    about `increase` requests per second each second. A 429 or 503 response, a
+    failed request or a response slower than `latency_target` cuts the rate by
+    the factor `decrease`, at most once per `cooldown` seconds so a burst of
+    throttled responses counts as one event. A Retry-After header also pauses
+    the host for that long. The rate stays between min_rate and max_rate.
+    """
+
+    THROTTLE_STATUSES = {429, 503}
+
+    def __init__(
+        self,
+        rate,
+        capacity=None,
+        min_rate=None,
+        max_rate=None,
+        increase=None,
+        decrease=None,
+        latency_target=None,
+        cooldown=None,
+    ):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate (float): Starting requests per second for each host.
+            capacity (float): Maximum burst size for each host.
+            min_rate (float): Lowest rate. Defaults to the
+                SCRAPER_MIN_REQUESTS_PER_SECOND env var, or 0.2.
+            max_rate (float): Highest rate. Defaults to the
+                SCRAPER_MAX_REQUESTS_PER_SECOND env var, or 8.
+            increase (float): Additive increase, in requests per second per
+                second. Defaults to the SCRAPER_RATE_INCREASE env var, or 0.5.
+            decrease (float): Multiplicative decrease factor. Defaults to the
+                SCRAPER_RATE_DECREASE env var, or 0.5.
+            latency_target (float): Response time in seconds above which the
+                server counts as overloaded. Defaults to the
+                SCRAPER_LATENCY_TARGET env var, or 2.
+            cooldown (float): Minimum seconds between two decreases. Defaults
+                to the SCRAPER_RATE_COOLDOWN env var, or 1.
+        """
+        self.min_rate = min_rate or float(
+            SETTINGS.get("SCRAPER_MIN_REQUESTS_PER_SECOND", 0.2)
+        )
+        self.max_rate = max_rate or float(
+            SETTINGS.get("SCRAPER_MAX_REQUESTS_PER_SECOND", 8)
+        )
+        self.increase = increase or float(SETTINGS.get("SCRAPER_RATE_INCREASE", 0.5))
+        self.decrease = decrease or float(SETTINGS.get("SCRAPER_RATE_DECREASE", 0.5))
+        self.latency_target = latency_target or float(
+            SETTINGS.get("SCRAPER_LATENCY_TARGET", 2)
+        )
+        self.cooldown = cooldown or float(SETTINGS.get("SCRAPER_RATE_COOLDOWN", 1))
+        # An explicit starting rate outside the bounds widens them.
+        self.min_rate = min(self.min_rate, rate)
+        self.max_rate = max(self.max_rate, rate)
+        super().__init__(rate, capacity)
+        self.hosts = {}
+
+    def record(self, url, status, latency, retry_after=None):
+        bucket = self.bucket_for(url)
+        host = urlsplit(url).netloc
+        congested = (
+            status is None
+            or status in self.THROTTLE_STATUSES
+            or latency > self.latency_target
+        )
+        with self.lock:
+            state = self.hosts.setdefault(
+                host, {"requests": 0, "throttled": 0, "decreased_at": 0.0}
+            )
+            state["requests"] += 1
+            if congested:
+                state["throttled"] += 1
+                now = time.monotonic()
+                # One decrease per congestion event, not one per response.
+                if now - state["decreased_at"] >= self.cooldown:
+                    state["decreased_at"] = now
+                    rate = max(self.min_rate, bucket.rate * self.decrease)
+                    bucket.set_rate(rate)
+                    logger.info(
+                        f"{host} is overloaded (status {status}, {latency:.2f}s); "
+                        f"slowing down to {rate:.2f} requests/s"
+                    )
+            elif status < 400:
+                # Spread the increase over the responses of one second.
+                bucket.set_rate(
+                    min(self.max_rate, bucket.rate + self.increase / bucket.rate)
+                )
+        if congested and retry_after:
+            bucket.pause(retry_after)
+
+    def scaled(self, share):
+        return AdaptiveRateLimiter(
+            self.rate * share,
+            self.capacity,
+            self.min_rate * share,
+            self.max_rate * share,
+            self.increase * share,
+            self.decrease,
+            self.latency_target,
+            self.cooldown,
+        )
+
+    def stats(self):
+        """
+        Return each host's current rate and request counts.
+
+        Returns:
+            dict: Host to {"rate", "requests", "throttled"}.
+        """
+        rates = super().stats()
+        with self.lock:
+            for host, state in self.hosts.items():
+                rates.setdefault(host, {}).update(
+                    requests=state["requests"], throttled=state["throttled"]
+                )
+        return rates
@@ -0,0 +1,297 @@
+import re
+
+# "1.", "1A.", "Group2-14.", "Group2-14A." question/answer prefixes.
+QA_PATTERN = re.compile(r"(?:Group(\d+)-)?(\d+)(A?)\.(.*)")
+# "Group2: ..." study group lines.
+GROUP_PATTERN = re.compile(r"Group(\d+)\s*:(.*)")
+# "Trial3-Info" trial identification record IDs.
+TRIAL_INFO_ID = re.compile(r"Trial(\d+)")
+
+TRIAL_QUESTION_COUNT = 9
+GROUP_QUESTION_COUNT = 24
+
+
+class ResponseIndexer:
+    """
+    Incrementally indexes an LLM response as its text arrives.
+
+    feed() accepts arbitrary chunks of text (e.g. streamed tokens) and returns
+    the lines completed by that chunk, so question, answer, trial and study
+    group lines can be used as soon as the model has finished writing them.
+    """
+
+    def __init__(self):
+        self.qa = {}
+        self.trials = []
+        self.groups = {}
+        self.lines_seen = 0
+        self.lines_recognized = 0
+        self.pending = ""
+
+    def feed(self, text):
+        """
+        Add text to the response.
+
+        Args:
+            text (str): The next chunk of the response.
+
+        Returns:
+            list: Events for the lines completed by this chunk: ("trial",
+                fields), ("qa", (group, number, is_answer), content) or
+                ("group", number, content). Unrecognized lines are skipped.
+        """
+        lines = (self.pending + text).split("\n")
+        self.pending = lines.pop()
+        return self._index_lines(lines)
+
+    def close(self):
+        """Index the last line, which has no trailing newline, and return its events."""
+        lines, self.pending = [self.pending], ""
+        return self._index_lines(lines)
+
+    def malformed(self, min_lines):
+        """True once `min_lines` non-blank lines went by without a recognized one."""
+        return self.lines_seen >= min_lines and not self.lines_recognized
+
+    @property
+    def index(self):
+        return {"qa": self.qa, "trials": self.trials, "groups": self.groups}
+
+    def _index_lines(self, lines):
+        events = []
+        add_event = events.append
+        qa, groups, trials = self.qa, self.groups, self.trials
+        seen = 0
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            seen += 1
+            # Cheap first-character check so free-text lines skip the regexes.
+            first = line[0]
+            if not (first.isdigit() or first in ("G", "T")):
+                continue
+            if line.startswith("Trial"):
+                fields = line.split(":")
+                trials.append(fields)
+                add_event(("trial", fields))
+                continue
+            match = QA_PATTERN.match(line)
+            if match:
+                group, number, answer, content = match.groups()
+                key = (int(group) if group else None, int(number), bool(answer))
+                # Only the prompt's questions count; "2023. ..." is just text.
+                count = TRIAL_QUESTION_COUNT if group is None else GROUP_QUESTION_COUNT
+                if not 1 <= key[1] <= count:
+                    continue
+                if key not in qa:
+                    content = qa[key] = content.strip()
+                    add_event(("qa", key, content))
+                continue
+            match = GROUP_PATTERN.match(line)
+            if match:
+                number = int(match.group(1))
+                if number not in groups:
+                    content = groups[number] = match.group(2)
+                    add_event(("group", number, content))
+        self.lines_seen += seen
+        self.lines_recognized += len(events)
+        return events
+
+
+def index_response(response):
+    """
+    Index an LLM response in a single pass over its lines.
+
+    Args:
+        response (str): The raw LLM response.
+
+    Returns:
+        dict: "qa" maps (group, number, is_answer) keys to their content, with
+            group None for trial questions; "trials" lists the Trial lines split
+            on ":"; "groups" maps group numbers to their study group line.
+            Only the first line for each key is kept.
+    """
+    indexer = ResponseIndexer()
+    indexer.feed(response)
+    indexer.close()
+    return indexer.index
+
+
+def parse_response(response, index=None):
+    """
+    Parse an LLM response into structured records.
+
+    Question records are dicts with "id", "question" and "answer" keys; trial
+    and study group records are dicts with "id" and a list of "fields". Missing
+    values are "NA". Each response has a record for trial questions 1 to
+    TRIAL_QUESTION_COUNT and, per group, for questions 1 to
+    GROUP_QUESTION_COUNT; lines numbered outside those ranges are ignored.
+
+    Args:
+        response (str): The raw LLM response.
+        index (dict): The response's index, if it was already built while
+            streaming; see ResponseIndexer.
+
+    Returns:
+        dict: Record lists under the "Trial Identification", "Trial Questions",
+            "Study Groups" and "Group Questions" sections.
+    """
+    index = index or index_response(response)
+    qa = index["qa"]
+
+    trial_identification = [
+        {
+            "id": "1",
+            "question": "How many Clinical Trials are there?",
+            "answer": qa.get((None, 1, True), "NA").split(".")[-1].strip() or "NA",
+        }
+    ]
+    for parts in index["trials"]:
+        fields = [part.strip() for part in parts[1:]]
+        if len(fields) > 3:
+            fields = fields[:2] + fields[-1:]
+        fields += ["NA"] * (3 - len(fields))
+        trial_identification.append({"id": parts[0].strip(), "fields": fields})
+
+    trial_questions = [
+        _question_record(qa, None, number, str(number))
+        for number in range(1, TRIAL_QUESTION_COUNT + 1)
+    ]
+
+    study_groups = [
+        {
+            "id": f"Group{group}",
+            "fields": [field.strip() for field in index["groups"][group].split(":")],
+        }
+        for group in sorted(index["groups"])
+    ]
+
+    # Groups with a study group line or an answered question.
+    groups = set(index["groups"])
+    groups.update(group for group, _, _ in qa if group is not None)
+    group_questions = []
+    for group in sorted(groups or {1}):
+        for number in range(1, GROUP_QUESTION_COUNT + 1):
+            record = _question_record(qa, group, number, f"Group{group}-{number}")
+            record["group"] = group
+            group_questions.append(record)
+
+    return {
+        "Trial Identification": trial_identification,
+        "Trial Questions": trial_questions,
+        "Study Groups": study_groups,
+        "Group Questions": group_questions,
+    }
+
+
+def split_by_article(urls, parsed_data):
+    """
+    Split the parsed records of one LLM response into one result per article.
+
+    A response covering several URLs has one trial per article, so the
+    records of trial N belong to the Nth URL; records without a trial number
+    (the line format's questions and study groups) belong to the first. Each
+    article's records are renumbered as if it had been analyzed alone: its
+    trial is trial 1, its study groups are numbered from 1 and its trial count
+    is its number of trial infos. A single-URL response is returned as it is.
+
+    Args:
+        urls (list): The article URLs the response covers, in prompt order.
+        parsed_data (dict): Records from parse_response().
+
+    Returns:
+        list: (url, parsed_data) per URL, in URL order.
+    """
+    if len(urls) <= 1:
+        return [(url, parsed_data) for url in urls]
+
+    def trial_of(record):
+        match = TRIAL_INFO_ID.match(record["id"]) if "fields" in record else None
+        return int(match.group(1)) if match else record.get("trial", 1)
+
+    articles = []
+    for trial, url in enumerate(urls, start=1):
+        infos = [
+            dict(record, id=TRIAL_INFO_ID.sub("Trial1", record["id"], count=1))
+            for record in parsed_data["Trial Identification"]
+            if "fields" in record and trial_of(record) == trial
+        ]
+        # The article's groups, renumbered from 1 in the order of their numbers.
+        groups = {
+            int(record["id"][len("Group") :])
+            for record in parsed_data["Study Groups"]
+            if trial_of(record) == trial
+        }
+        groups.update(
+            record["group"]
+            for record in parsed_data["Group Questions"]
+            if trial_of(record) == trial
+        )
+        group_numbers = {group: n for n, group in enumerate(sorted(groups), start=1)}
+        article = {
+            "Trial Identification": [
+                {
+                    "id": "1",
+                    "question": "How many Clinical Trials are there?",
+                    "answer": str(len(infos)) if infos else "NA",
+                }
+            ]
+            + infos,
+            "Trial Questions": [
+                _renumbered(record)
+                for record in parsed_data["Trial Questions"]
+                if trial_of(record) == trial
+            ],
+            "Study Groups": [],
+            "Group Questions": [],
+        }
+        for record in parsed_data["Study Groups"]:
+            if trial_of(record) == trial:
+                group = group_numbers[int(record["id"][len("Group") :])]
+                article["Study Groups"].append(_renumbered(record, id=f"Group{group}"))
+        for record in parsed_data["Group Questions"]:
+            if trial_of(record) == trial:
+                group = group_numbers[record["group"]]
+                number = record["id"].rsplit("-", 1)[1]
+                article["Group Questions"].append(
+                    _renumbered(record, id=f"Group{group}-{number}", group=group)
+                )
+        articles.append((url, article))
+    return articles
+
+
+def _renumbered(record, **changes):
+    if "trial" in record:
+        changes["trial"] = 1
+    return dict(record, **changes)
+
+
+def record_rows(record):
+    """
+    Turn a parsed record into the 4-column CSV rows used in the output files.
+
+    Args:
+        record (dict): A record from parse_response().
+
+    Returns:
+        list: One row for trial and study group records, a question row and an
+            answer row for question records.
+    """
+    if "question" in record:
+        return [
+            [record["id"], record["question"], "", ""],
+            [f"{record['id']}A", record["answer"], "", ""],
+        ]
+    fields = record["fields"]
+    if len(fields) < 3:
+        fields = fields + [""] * (3 - len(fields))
+    return [[record["id"], *fields]]
+
+
+def _question_record(qa, group, number, record_id):
+    return {
+        "id": record_id,
+        "question": qa.get((group, number, False)) or "NA",
+        "answer": qa.get((group, number, True)) or "NA",
+    }
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from checkpoint_store import pmid_from_url
+
+# One row per parsed record. Trial and study group records have no question;
+# their fields are joined with ":" into the answer, as in the wide layout.
+LONG_COLUMNS = [
+    "url",
+    "pmid",
+    "section",
+    "record_id",
+    "trial",
+    "group",
+    "question_id",
+    "question",
+    "answer",
+]
+
+# Field records whose fields are all "" or "NA".
+EMPTY_FIELDS = r"(?:NA)?(?::(?:NA)?)*"
+
+
+def long_frame(results):
+    """
+    Build the long-format frame of many parsed LLM responses in one batch.
+
+    Args:
+        results (iterable): (url, parsed_data) pairs, where url holds the
+            space-separated article URLs a response covers and parsed_data
+            comes from LLMProcessor.parse_llm_response.
+
+    Returns:
+        pandas.DataFrame: LONG_COLUMNS, one row per record, in response and
+            record order. pmid is the PMID of the record's trial when it is
+            known, otherwise the response's PMIDs separated by spaces.
+    """
+    urls, sections, record_ids, trials, questions, answers = [], [], [], [], [], []
+    url_pmids = {}
+    for url, parsed_data in results:
+        url_pmids.setdefault(url, [pmid_from_url(part) for part in url.split()])
+        for section, records in parsed_data.items():
+            urls += [url] * len(records)
+            sections += [section] * len(records)
+            record_ids += [record["id"] for record in records]
+            trials += [record.get("trial", np.nan) for record in records]
+            questions += [record.get("question") for record in records]
+            answers += [
+                (
+                    record["answer"]
+                    if "fields" not in record
+                    else ":".join(record["fields"])
+                )
+                for record in records
+            ]
+    if not urls:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+
+    # Record IDs repeat across responses, so they are parsed once per value.
+    id_codes, unique_ids = pd.factorize(pd.Series(record_ids, dtype=object))
+    parts = pd.Series(unique_ids).str.extract(
+        r"^(?:Trial(?P<trial>\d+)-Info|Group(?P<group>\d+))?(?:-?(?P<number>\d+))?$"
+    )
+    parts = parts.apply(pd.to_numeric).to_numpy(dtype=float)
+    info_trial, group, number = (parts[id_codes, i] for i in range(3))
+    has_question = pd.notna(np.array(questions, dtype=object))
+
+    trial = np.array(trials, dtype=float)
+    trial = np.where(np.isnan(trial), info_trial, trial)
+    df = pd.DataFrame(
+        {
+            "url": urls,
+            "section": sections,
+            "record_id": record_ids,
+            "trial": _int64(trial),
+            "group": _int64(group),
+            "question_id": _int64(np.where(has_question, number, np.nan)),
+            "question": questions,
+            "answer": answers,
+        }
+    )
+
+    url_codes, unique_urls = pd.factorize(df["url"])
+    pmid_lists = [url_pmids[url] for url in unique_urls]
+    joined = np.array([" ".join(ids) for ids in pmid_lists], dtype=object)
+    pmid = joined[url_codes]
+    # Records of trial N belong to the response's Nth article.
+    counts = np.array([len(ids) for ids in pmid_lists])
+    trial_index = np.nan_to_num(trial, nan=0).astype(int)
+    known = (trial_index >= 1) & (trial_index <= counts[url_codes])
+    flat = np.array([p for ids in pmid_lists for p in ids], dtype=object)
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    pmid[known] = flat[offsets[url_codes[known]] + trial_index[known] - 1]
+    df["pmid"] = pmid
+    return df[LONG_COLUMNS]
+
+
+def _int64(values):
+    # Much faster than converting the floats with pd.array(values, "Int64").
+    missing = np.isnan(values)
+    return pd.arrays.IntegerArray(np.where(missing, 0, values).astype("int64"), missing)
+
+
+def clean_long(long, drop_na=False):
+    """
+    Drop the records that carry no information, like clean_parsed_data().
+
+    Args:
+        long (pandas.DataFrame): A frame from long_frame().
+        drop_na (bool): Also drop question records whose answer is "NA".
+
+    Returns:
+        pandas.DataFrame: The remaining rows, with questions and answers
+            stripped of surrounding whitespace.
+    """
+    long = long.assign(
+        question=_per_value(long["question"], "strip"),
+        answer=_per_value(long["answer"], "strip"),
+    )
+    is_fields = long["question"].isna() & long["record_id"].ne("1")
+    empty = _per_value(long["answer"], "fullmatch", EMPTY_FIELDS).astype(bool)
+    keep = ~(is_fields & empty)
+    if drop_na:
+        keep &= is_fields | long["answer"].ne("NA")
+    return long[keep].reset_index(drop=True)
+
+
+def _per_value(values, method, *args):
+    # Questions and answers repeat across responses, so the string method runs
+    # once per distinct value and is mapped back to the rows.
+    codes, uniques = pd.factorize(values)
+    result = getattr(pd.Series(uniques, dtype=object).str, method)(*args)
+    result = np.append(result.to_numpy(dtype=object), None)
+    return pd.Series(result[codes], index=values.index)
@@ -1,12 +1,20 @@
+import logging
 import requests
-from bs4 import BeautifulSoup
-import time
-import random
-import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import os
-import dotenv
+import time
 
-dotenv.load_dotenv()
+from checkpoint_store import CheckpointStore
+from html_extractors import get_extractor
+from http_cache import HttpCache
+from metrics import METRICS
+from rate_limiter import AdaptiveRateLimiter, HostRateLimiter, parse_retry_after
+from settings import SETTINGS
+from trial_store import TrialStore
+from transport import get_session
+
+logger = logging.getLogger(__name__)
 
 
 class Scraper:
@@ -14,54 +22,280 @@ class Scraper:
     A class to scrape clinical trial data from a given website.
     """
 
-    BASE_URL = os.getenv("BASE_URL")
-    SEARCH_URL = (
-        BASE_URL + "?term={}&filter=pubt.randomizedcontrolledtrial&sort=date&size=10"
-    )
+    SEARCH_QUERY = "?term={}&filter=pubt.randomizedcontrolledtrial&sort=date&size=10"
+    _ALREADY_PARSED = object()
+
+    def __init__(
+        self,
+        max_workers=None,
+        requests_per_second=None,
+        cache=None,
+        extractor=None,
+        session=None,
+        adaptive=None,
+        page_retries=None,
+        base_url=None,
+    ):
+        """
+        Initialize the scraper with a requests session.
+
+        Args:
+            max_workers (int): Number of article pages fetched concurrently.
+                Defaults to the SCRAPER_MAX_WORKERS env var, or 4.
+            requests_per_second (float): Request rate allowed per host, or the
+                starting rate when adaptive. Defaults to the
+                SCRAPER_REQUESTS_PER_SECOND env var, or 2.
+            cache (HttpCache): Cache for fetched pages. Defaults to an on-disk
+                cache under output/, unless HTTP_CACHE is set to false.
+            extractor (object): HTML extractor backend. Defaults to the one
+                selected by the HTML_EXTRACTOR env var, see get_extractor().
+            session (requests.Session): HTTP session. Defaults to the pooled
+                session shared through transport.get_session().
+            adaptive (bool): Adjust each host's rate to its response times and
+                throttling responses, see AdaptiveRateLimiter. Defaults to the
+                SCRAPER_ADAPTIVE_RATE env var, or True.
+            page_retries (int): How many more times a search page that failed
+                is tried again, after the other pages. Defaults to the
+                SCRAPER_PAGE_RETRIES env var, or 3.
+            base_url (str): The PubMed site the search and article pages are
+                read from. Defaults to the BASE_URL env var, which must be set.
+
+        Raises:
+            ValueError: If no base URL is given and BASE_URL isn't set.
+        """
+        self.base_url = base_url or SETTINGS.require("BASE_URL")
+        self.search_url = self.base_url + self.SEARCH_QUERY
+        self.session = session or get_session()
+        self.max_workers = max_workers or int(SETTINGS.get("SCRAPER_MAX_WORKERS", 4))
+        rate = requests_per_second or float(
+            SETTINGS.get("SCRAPER_REQUESTS_PER_SECOND", 2)
+        )
+        if adaptive is None:
+            adaptive = SETTINGS.get("SCRAPER_ADAPTIVE_RATE", "true").lower() != "false"
+        self.rate_limiter = (
+            AdaptiveRateLimiter(rate) if adaptive else HostRateLimiter(rate)
+        )
+        if page_retries is None:
+            page_retries = int(SETTINGS.get("SCRAPER_PAGE_RETRIES", 3))
+        self.page_retries = page_retries
+        if cache is None and SETTINGS.get("HTTP_CACHE", "true").lower() != "false":
+            cache = HttpCache()
+        self.cache = cache
+        self.extractor = extractor or get_extractor()
+
+    def fetch(self, url, use_cache=False):
+        """
+        GET a URL through the shared session once the host's rate limit allows it.
+
+        Args:
+            url (str): The URL to fetch.
+            use_cache (bool): Serve the page from the HTTP cache when possible.
 
-    def __init__(self):
-        """Initialize the scraper with a requests session."""
-        self.session = requests.Session()
+        Returns:
+            requests.Response: The response, after raise_for_status().
+        """
+        entry = None
+        headers = {}
+        if use_cache and self.cache:
+            entry, fresh = self.cache.lookup(url)
+            if fresh:
+                METRICS.incr("http_cache_hits")
+                return self.cache.response_for(entry)
+            headers = self.cache.validators(entry)
+
+        with METRICS.timer("rate_limit_wait"):
+            self.rate_limiter.wait(url)
+        start = time.perf_counter()
+        try:
+            with METRICS.timer("http_get"):
+                response = self.session.get(url, headers=headers)
+        except (requests.ConnectionError, requests.Timeout):
+            self.rate_limiter.record(url, None, time.perf_counter() - start)
+            raise
+        METRICS.incr("http_requests")
+        self._record_outcome(url, response, time.perf_counter() - start)
+        if entry and response.status_code == 304:
+            METRICS.incr("http_cache_revalidated")
+            return self.cache.mark_revalidated(url, entry)
+        response.raise_for_status()
+        METRICS.incr("bytes_fetched", len(response.content))
+        if use_cache and self.cache:
+            self.cache.store(url, response)
+        return response
+
+    def _record_outcome(self, url, response, elapsed):
+        """Report a response and the retries behind it to the rate limiter."""
+        retries = getattr(getattr(response, "raw", None), "retries", None)
+        history = getattr(retries, "history", ())
+        statuses = [attempt.status for attempt in history] + [response.status_code]
+        METRICS.incr(
+            "http_throttled",
+            sum(s in AdaptiveRateLimiter.THROTTLE_STATUSES for s in statuses),
+        )
+        for status in statuses[:-1]:
+            self.rate_limiter.record(url, status, 0.0)
+        # After adapter retries, the elapsed time is mostly their backoff.
+        self.rate_limiter.record(
+            url,
+            response.status_code,
+            0.0 if history else elapsed,
+            parse_retry_after(response.headers.get("Retry-After")),
+        )
 
     def scrape(self, keyword, num_pages, start_page=1):
+        """
+        Scrape the trials for a keyword into its scraped data file.
+
+        Records are appended to the JSON Lines file as they are scraped, so
+        the full list is never held in memory; open the file with TrialStore
+        to read it back.
+
+        Args:
+            keyword (str): The search keyword.
+            num_pages (int): The number of search result pages to scrape.
+            start_page (int): The first search result page to scrape.
+
+        Returns:
+            str: The path of the scraped data file.
+        """
         if num_pages <= 0:
-            print("Number of pages must be greater than 0.")
+            logger.warning("Number of pages must be greater than 0.")
             return []
-        trials_data = []
-        search_url = self.SEARCH_URL.format(keyword)
-        total_pages = self.get_total_pages(keyword)
-        for page in range(start_page, min(start_page + num_pages, total_pages + 1)):
-            try:
-                print(f"Scraping page {page}...")
-                url = search_url + f"&page={page}"
-                response = self.session.get(url)
-                response.raise_for_status()
-                soup = BeautifulSoup(response.text, "html.parser")
-
-                article_links = soup.find_all("a", class_="docsum-title")
+        filepath = self.scraped_data_path(keyword)
+        with TrialStore(filepath, truncate=True) as store:
+            count = store.extend(self.iter_trials(keyword, num_pages, start_page))
+        logger.info(f"Scraped {count} trials successfully.")
+        logger.info(f"Scraped data saved to {filepath}")
+        return filepath
+
+    def iter_trials(
+        self, keyword, num_pages, start_page=1, checkpoints=None, dedup=None
+    ):
+        """
+        Yield trial records one by one as their article pages are scraped.
+
+        Args:
+            keyword (str): The search keyword.
+            num_pages (int): The number of search result pages to scrape.
+            start_page (int): The first search result page to scrape.
+            checkpoints (CheckpointStore): If given, articles already parsed in
+                a previous run are skipped, already fetched ones are read from
+                the store, and every fetch is recorded.
+            dedup (DedupIndex): If given, articles analyzed under any keyword
+                are not fetched again; their records are yielded with the
+                "result_id" of the stored LLM result added.
+
+        Yields:
+            dict: A dictionary containing the article's title, abstract and url.
+        """
+        if num_pages <= 0:
+            logger.warning("Number of pages must be greater than 0.")
+            return
+        search_url = self.search_url.format(keyword)
+        total_pages = self.get_total_pages(keyword) or start_page + num_pages - 1
+        # Pages that failed are tried again after the others, so a throttling
+        # server has time to recover and the rate limiter to slow down.
+        pages = deque(range(start_page, min(start_page + num_pages, total_pages + 1)))
+        attempts = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pages:
+                page = pages.popleft()
+                try:
+                    logger.info(f"Scraping page {page}...")
+                    url = search_url + f"&page={page}"
+                    response = self.fetch(url)
+                except requests.RequestException as e:
+                    attempts[page] = attempts.get(page, 0) + 1
+                    if attempts[page] > self.page_retries:
+                        logger.error(f"Error scraping page {page}: {e}. Giving up.")
+                    else:
+                        logger.warning(
+                            f"Error scraping page {page}: {e}. Retrying it later."
+                        )
+                        METRICS.incr("pages_retried")
+                        pages.append(page)
+                    continue
+
+                article_links = self.extractor.article_links(response.text)
                 if not article_links:
-                    print(f"No articles found on page {page}. Stopping scrape.")
+                    logger.warning(
+                        f"No articles found on page {page}. Stopping scrape."
+                    )
                     break
 
-                for link in article_links:
-                    article_url = self.BASE_URL + link["href"]
-                    trial_data = self.scrape_article_page(article_url)
+                article_urls = [self.base_url + href for href in article_links]
+                if checkpoints:
+                    checkpoints.mark_listed(keyword, article_urls)
+                # map() yields results in submission order, so the output
+                # order matches the search results page.
+                for trial_data in executor.map(
+                    lambda url: self._scrape_or_resume(
+                        url, keyword, checkpoints, dedup
+                    ),
+                    article_urls,
+                ):
+                    if trial_data is self._ALREADY_PARSED:
+                        continue
                     if trial_data:
-                        trials_data.append(trial_data)
+                        yield trial_data
                     else:
-                        print("Skipping trial due to scraping failure")
-                    time.sleep(random.uniform(0.5, 1))
+                        logger.warning("Skipping trial due to scraping failure")
 
-                print(f"Finished scraping page {page}...")
-                time.sleep(random.uniform(2, 3))
+                logger.info(f"Finished scraping page {page}...")
 
-            except requests.RequestException as e:
-                print(f"Error scraping page {page}: {e}")
-                continue
-        print(f"Scraped {len(trials_data)} trials successfully.")
-        filepath = self.save_scraped_data(trials_data, keyword)
-        return filepath
+    def _scrape_or_resume(self, url, keyword, checkpoints, dedup):
+        trial_data = self._resume(url, keyword, checkpoints, dedup)
+        if trial_data is not None:
+            return trial_data
+        return self._record_fetched(
+            url, keyword, self.scrape_article_page(url), checkpoints, dedup
+        )
+
+    def _resume(self, url, keyword, checkpoints, dedup):
+        """
+        Return what is already known about an article, without fetching it.
+
+        Returns:
+            dict: The stored record (with "result_id" if it was analyzed under
+                another keyword), _ALREADY_PARSED, or None if it must be fetched.
+        """
+        state, record = None, None
+        if checkpoints:
+            state, record = checkpoints.lookup(keyword, url)
+            if state == CheckpointStore.PARSED:
+                return self._ALREADY_PARSED
+        if dedup:
+            indexed_record, result_id = dedup.lookup(url)
+            if result_id:
+                return dict(indexed_record, result_id=result_id)
+            record = record or indexed_record
+        if record:
+            if checkpoints and state != CheckpointStore.FETCHED:
+                checkpoints.mark_fetched(keyword, record)
+            return record
+        return None
+
+    def _record_fetched(self, url, keyword, trial_data, checkpoints, dedup):
+        """
+        Record the outcome of fetching an article in the checkpoint and dedup stores.
 
+        Returns:
+            dict: The trial data, with "result_id" added if an article with the
+                same abstract was already analyzed, or None if the fetch failed.
+        """
+        if checkpoints:
+            if trial_data:
+                checkpoints.mark_fetched(keyword, trial_data)
+            else:
+                checkpoints.mark(keyword, [url], CheckpointStore.FAILED)
+        if dedup and trial_data:
+            # A different PMID with the same abstract may already be analyzed.
+            result_id = dedup.add_record(keyword, trial_data)
+            if result_id:
+                trial_data = dict(trial_data, result_id=result_id)
+        return trial_data
+
+    @METRICS.timed("scrape_article_page")
     def scrape_article_page(self, url):
         """
         Scrape an individual article page for title and abstract.
@@ -73,60 +307,69 @@ class Scraper:
             dict: A dictionary containing the article's title and abstract.
         """
         try:
-            response = self.session.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            title = soup.find("h1", class_="heading-title").text.strip()
-
-            abstract_div = soup.find("div", class_="abstract-content selected")
-            abstract = (
-                abstract_div.text.strip() if abstract_div else "Abstract not available"
-            )
-
-            return {"title": title, "abstract": abstract, "url": url}
+            return self.article_record(url, self.fetch(url, use_cache=True))
         except requests.RequestException as e:
-            print(f"Network error when accessing {url}: {e}")
+            logger.error(f"Network error when accessing {url}: {e}")
         except AttributeError as e:
-            print(f"Element not found when scraping article page {url}: {e}")
+            logger.warning(f"Element not found when scraping article page {url}: {e}")
         except Exception as e:
-            print(f"Unexpected error when scraping article page {url}: {e}")
+            logger.error(f"Unexpected error when scraping article page {url}: {e}")
 
         return None
 
+    def article_record(self, url, response):
+        """
+        Extract the record of an article from its fetched page.
+
+        Args:
+            url (str): The URL of the article page.
+            response: The fetched page.
+
+        Returns:
+            dict: A dictionary containing the article's title, abstract and url.
+
+        Raises:
+            AttributeError: If the page has no title.
+        """
+        with METRICS.timer("html_parse"):
+            title, abstract = self.extractor.article(response.text)
+        if title is None:
+            raise AttributeError("h1.heading-title is missing")
+        if abstract is None:
+            abstract = "Abstract not available"
+        return {"title": title, "abstract": abstract, "url": url}
+
+    @METRICS.timed("get_total_pages")
     def get_total_pages(self, keyword):
         try:
-            search_url = self.SEARCH_URL.format(keyword)
-            response = self.session.get(search_url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, "html.parser")
-
-            results_info = soup.find("div", class_="results-amount")
-            if results_info:
-                total_results = int(
-                    results_info.find("span", class_="value").text.replace(",", "")
-                )
+            search_url = self.search_url.format(keyword)
+            response = self.fetch(search_url, use_cache=True)
+            results_value = self.extractor.total_results(response.text)
+            if results_value:
+                total_results = int(results_value.replace(",", ""))
                 return (total_results + 9) // 10  # 10 results per page
             else:
-                print("Couldn't find total results information.")
+                logger.warning("Couldn't find total results information.")
                 return None
         except requests.RequestException as e:
-            print(f"Network error when getting total pages: {e}")
+            logger.error(f"Network error when getting total pages: {e}")
         except ValueError as e:
-            print(f"Error parsing total results: {e}")
+            logger.error(f"Error parsing total results: {e}")
         except Exception as e:
-            print(f"Unexpected error when getting total pages: {e}")
+            logger.error(f"Unexpected error when getting total pages: {e}")
         return None
 
-    def save_scraped_data(self, data, keyword):
+    def scraped_data_path(self, keyword):
+        """Return the path of a keyword's scraped data JSON Lines file."""
         script_dir = os.path.dirname(__file__)
         output_dir = os.path.join(script_dir, "../output/scraped-data/")
-        os.makedirs(output_dir, exist_ok=True)
-        filename = f"{keyword.replace(' ', '_')}_scraped_data.json"
-        filepath = os.path.join(output_dir, filename)
+        filename = f"{keyword.replace(' ', '_')}_scraped_data.jsonl"
+        return os.path.join(output_dir, filename)
 
-        with open(filepath, "w") as f:
-            json.dump(data, f, indent=2)
+    def save_scraped_data(self, data, keyword):
+        filepath = self.scraped_data_path(keyword)
+        with TrialStore(filepath, truncate=True) as store:
+            store.extend(data)
 
-        print(f"Scraped data saved to {filepath}")
+        logger.info(f"Scraped data saved to {filepath}")
         return filepath
@@ -0,0 +1,58 @@
+import os
+import threading
+
+
+class Settings:
+    """
+    The configuration of the process, read from the environment.
+
+    The .env file is loaded the first time a setting is read rather than when
+    a module is imported, so importing the library is cheap and works without
+    any variable set. Variables already in the environment take precedence
+    over the .env file, and settings are read when the objects that use them
+    are created, so tests and benchmarks can set them just before.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loaded = False
+
+    def load(self):
+        """Load the .env file into the environment, once per process."""
+        if self.loaded:
+            return
+        with self.lock:
+            if not self.loaded:
+                import dotenv
+
+                dotenv.load_dotenv()
+                self.loaded = True
+
+    def get(self, name, default=None):
+        """
+        Return a setting, like os.getenv.
+
+        Args:
+            name (str): The environment variable.
+            default: The value to return when the variable isn't set.
+
+        Returns:
+            str: The variable's value, or default.
+        """
+        self.load()
+        return os.getenv(name, default)
+
+    def require(self, name):
+        """
+        Return a setting that has no default.
+
+        Raises:
+            ValueError: If the variable isn't set or is empty.
+        """
+        value = self.get(name)
+        if not value:
+            raise ValueError(f"The {name} environment variable is not set.")
+        return value
+
+
+SETTINGS = Settings()
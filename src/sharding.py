@@ -0,0 +1,185 @@
+import glob
+import json
+import logging
+import os
+
+from checkpoint_store import CheckpointStore, pmid_from_url
+from response_parser import split_by_article
+from settings import SETTINGS
+
+logger = logging.getLogger(__name__)
+
+
+def split_pages(start_page, num_pages, shards):
+    """
+    Split a page range into contiguous, nearly equal shards.
+
+    Args:
+        start_page (int): The first page.
+        num_pages (int): The number of pages.
+        shards (int): The number of shards wanted.
+
+    Returns:
+        list: (start_page, num_pages) per shard, in page order, without empty shards.
+    """
+    shards = max(1, min(shards, num_pages))
+    size, extra = divmod(num_pages, shards)
+    ranges = []
+    for i in range(shards):
+        count = size + (1 if i < extra else 0)
+        ranges.append((start_page, count))
+        start_page += count
+    return ranges
+
+
+def _run_shard(pipeline_factory, keyword, start_page, num_pages, shard_dir, share):
+    """Run one shard's pages through its own pipeline into a JSON Lines file."""
+    logging.basicConfig(
+        level=SETTINGS.get("LOG_LEVEL", "INFO").upper(),
+        format=f"%(asctime)s %(levelname)s shard-{start_page} %(name)s: %(message)s",
+    )
+    pipeline = pipeline_factory(output_format="jsonl")
+    pipeline.data_saver.output_dir = shard_dir
+    # Shards run side by side, so each gets its share of the politeness budget.
+    pipeline.scraper.rate_limiter = pipeline.scraper.rate_limiter.scaled(share)
+    return pipeline.run(keyword, num_pages, start_page)
+
+
+def _sort_key(url):
+    pmid = pmid_from_url(url)
+    return ((0, int(pmid)) if pmid.isdigit() else (1, pmid)), url
+
+
+class ShardedRunner:
+    """
+    Runs a keyword's pages across several processes and merges their outputs.
+
+    Each worker process builds its own pipeline, runs the fetch, parse and LLM
+    stages for a contiguous page range and writes its parsed records as JSON
+    Lines. The coordinator then merges every shard file of the keyword,
+    ordered by PMID, into the final output with its own DataSaver.
+    """
+
+    def __init__(self, pipeline, pipeline_factory, processes):
+        """
+        Initialize the runner.
+
+        Args:
+            pipeline (Pipeline): The coordinator's pipeline, whose data saver,
+                LLM processor and output format produce the final output.
+            pipeline_factory (callable): Picklable function returning a new
+                Pipeline for a given output_format; called in each worker.
+            processes (int): Number of worker processes.
+        """
+        self.pipeline = pipeline
+        self.pipeline_factory = pipeline_factory
+        self.processes = processes
+
+    def run(self, keyword, num_pages, start_page=1):
+        """
+        Scrape, analyze and save the trials for a keyword with sharded workers.
+
+        Args:
+            keyword (str): The search keyword.
+            num_pages (int): The number of search result pages to scrape.
+            start_page (int): The first search result page to scrape.
+
+        Returns:
+            dict: A summary with the keyword, the trial count, the output path
+                and the number of shards.
+        """
+        output_name = f"{keyword.replace(' ', '_')}_clinical_trials_data"
+        shards_root = os.path.join(self.pipeline.data_saver.output_dir, "shards")
+        shard_ranges = split_pages(start_page, num_pages, self.processes)
+        logger.info(f"Running {keyword} in {len(shard_ranges)} shards")
+        checkpoints = self.pipeline.checkpoints
+        if not checkpoints or not checkpoints.counts(keyword).get(
+            CheckpointStore.PARSED
+        ):
+            # Nothing is resumed (no checkpoints, a new keyword or --restart),
+            # so earlier shard files would only duplicate rows.
+            pattern = os.path.join(shards_root, "*", f"{output_name}.jsonl")
+            for path in glob.glob(pattern):
+                os.remove(path)
+
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # Spawned workers don't inherit the coordinator's open SQLite
+        # connections, sessions or locks.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(len(shard_ranges), mp_context=context) as executor:
+            futures = [
+                executor.submit(
+                    _run_shard,
+                    self.pipeline_factory,
+                    keyword,
+                    shard_start,
+                    shard_pages,
+                    os.path.join(shards_root, f"pages-{shard_start:06d}"),
+                    1 / len(shard_ranges),
+                )
+                for shard_start, shard_pages in shard_ranges
+            ]
+            summaries = [future.result() for future in futures]
+
+        output_path = self.merge(output_name, shards_root)
+        return {
+            "keyword": keyword,
+            "trials": sum(summary["trials"] for summary in summaries),
+            "output_file": output_path,
+            "shards": len(shard_ranges),
+        }
+
+    def merge(self, output_name, shards_root):
+        """
+        Merge every shard file of an output into the final layout, ordered by PMID.
+
+        Each response is split into one entry per article, so the output is
+        ordered by PMID whatever the LLM batches were. Shard files are kept
+        between runs, so a resumed run still produces the complete output. An
+        article found in several shard files is written once.
+
+        Args:
+            output_name (str): The output name without extension.
+            shards_root (str): The directory holding the shard directories.
+
+        Returns:
+            str: The path of the final output, or None if there was nothing to merge.
+        """
+        entries = {}
+        pattern = os.path.join(shards_root, "*", f"{output_name}.jsonl")
+        for path in sorted(glob.glob(pattern)):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries.update(
+                            split_by_article(entry["url"].split(), entry["parsed_data"])
+                        )
+        if not entries:
+            return None
+
+        data_saver = self.pipeline.data_saver
+        output_format = self.pipeline.output_format
+        ordered = sorted(entries.items(), key=lambda item: _sort_key(item[0]))
+        if output_format == "sections":
+            csv_filename = f"{output_name}.csv"
+            for i, (_, parsed_data) in enumerate(ordered):
+                csv_output = self.pipeline.llm_processor.format_parsed_data_as_csv(
+                    parsed_data
+                )
+                if i == 0:
+                    data_saver.save_csv_string(csv_output + "\n", csv_filename)
+                else:
+                    data_saver.append_csv_string(csv_output, csv_filename)
+            return os.path.join(data_saver.output_dir, csv_filename)
+
+        # The merge rewrites the whole output from the shard files.
+        writer = data_saver.open_trial_writer(output_name, output_format)
+        try:
+            for url, parsed_data in ordered:
+                writer.write(url, parsed_data)
+        finally:
+            writer.close()
+        return writer.path
@@ -0,0 +1,202 @@
+import json
+
+from response_parser import GROUP_QUESTION_COUNT, TRIAL_QUESTION_COUNT
+
+_QUESTION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "integer"},
+        "question": {"type": "string"},
+        "answer": {"type": "string"},
+    },
+    "required": ["id", "question", "answer"],
+    "additionalProperties": False,
+}
+
+# One analyzed trial. "trial" is the trial's number in the prompt.
+TRIAL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "trial": {"type": "integer"},
+        "trial_info": {"type": "array", "items": {"type": "string"}},
+        "questions": {"type": "array", "items": _QUESTION_SCHEMA},
+        "groups": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "fields": {"type": "array", "items": {"type": "string"}},
+                    "questions": {"type": "array", "items": _QUESTION_SCHEMA},
+                },
+                "required": ["fields", "questions"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["trial", "trial_info", "questions", "groups"],
+    "additionalProperties": False,
+}
+
+RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {"trials": {"type": "array", "items": TRIAL_SCHEMA}},
+    "required": ["trials"],
+    "additionalProperties": False,
+}
+
+_TYPES = {
+    "object": dict,
+    "array": list,
+    "string": str,
+    "integer": int,
+}
+
+
+def validate(instance, schema, path="$"):
+    """
+    Validate a decoded JSON value against a schema.
+
+    Only the JSON Schema keywords used by the schemas in this module are
+    supported: type, properties, required, additionalProperties and items.
+
+    Args:
+        instance: The decoded JSON value.
+        schema (dict): The schema.
+        path (str): Location of the value, used in error messages.
+
+    Returns:
+        list: Error messages; empty if the value is valid.
+    """
+    expected = _TYPES[schema["type"]]
+    # bool is an int subclass, but not a JSON integer.
+    if not isinstance(instance, expected) or isinstance(instance, bool):
+        return [f"{path}: expected {schema['type']}"]
+    errors = []
+    if expected is dict:
+        properties = schema.get("properties", {})
+        for name in schema.get("required", []):
+            if name not in instance:
+                errors.append(f"{path}: missing {name}")
+        for name, value in instance.items():
+            if name in properties:
+                errors += validate(value, properties[name], f"{path}.{name}")
+            elif schema.get("additionalProperties") is False:
+                errors.append(f"{path}: unexpected {name}")
+    elif expected is list and "items" in schema:
+        for i, item in enumerate(instance):
+            errors += validate(item, schema["items"], f"{path}[{i}]")
+    return errors
+
+
+def response_format():
+    """Return the chat-completions response_format requesting RESPONSE_SCHEMA."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "clinical_trials",
+            "strict": True,
+            "schema": RESPONSE_SCHEMA,
+        },
+    }
+
+
+def split_valid_trials(content, trial_count):
+    """
+    Decode a structured response and check each trial against TRIAL_SCHEMA.
+
+    Args:
+        content (str): The raw response.
+        trial_count (int): The number of trials in the prompt.
+
+    Returns:
+        tuple: ({trial number: trial} for the valid trials, sorted list of the
+            trial numbers that are missing or invalid). Undecodable JSON makes
+            every trial invalid.
+    """
+    try:
+        trials = json.loads(content)["trials"]
+    except (ValueError, KeyError, TypeError):
+        return {}, list(range(1, trial_count + 1))
+    if not isinstance(trials, list):
+        return {}, list(range(1, trial_count + 1))
+    valid = {}
+    for trial in trials:
+        if not validate(trial, TRIAL_SCHEMA) and 1 <= trial["trial"] <= trial_count:
+            valid.setdefault(trial["trial"], trial)
+    failed = [number for number in range(1, trial_count + 1) if number not in valid]
+    return valid, failed
+
+
+def structured_records(trials):
+    """
+    Turn validated trials into the records parse_response() produces.
+
+    Trial questions, study groups and group questions carry the trial number
+    under "trial"; study groups are numbered across all trials, as in the line
+    format.
+
+    Args:
+        trials (list): Trial objects matching TRIAL_SCHEMA, in trial order.
+
+    Returns:
+        dict: Record lists under the "Trial Identification", "Trial Questions",
+            "Study Groups" and "Group Questions" sections.
+    """
+    parsed_data = {
+        "Trial Identification": [
+            {
+                "id": "1",
+                "question": "How many Clinical Trials are there?",
+                "answer": str(len(trials)),
+            }
+        ],
+        "Trial Questions": [],
+        "Study Groups": [],
+        "Group Questions": [],
+    }
+    group = 0
+    for trial in trials:
+        number = trial["trial"]
+        fields = [field.strip() for field in trial["trial_info"]][:3]
+        fields += ["NA"] * (3 - len(fields))
+        parsed_data["Trial Identification"].append(
+            {"id": f"Trial{number}-Info", "fields": fields}
+        )
+        for record in _question_records(trial["questions"], TRIAL_QUESTION_COUNT):
+            record["trial"] = number
+            parsed_data["Trial Questions"].append(record)
+        for trial_group in trial["groups"]:
+            group += 1
+            parsed_data["Study Groups"].append(
+                {
+                    "id": f"Group{group}",
+                    "fields": [field.strip() for field in trial_group["fields"]],
+                    "trial": number,
+                }
+            )
+            questions = trial_group["questions"]
+            for record in _question_records(questions, GROUP_QUESTION_COUNT):
+                record["id"] = f"Group{group}-{record['id']}"
+                record["group"] = group
+                record["trial"] = number
+                parsed_data["Group Questions"].append(record)
+    return parsed_data
+
+
+def _question_records(questions, count):
+    by_id = {}
+    for question in questions:
+        # Only the prompt's `count` questions are kept.
+        if 1 <= question["id"] <= count:
+            by_id.setdefault(question["id"], question)
+    records = []
+    for number in range(1, count + 1):
+        question = by_id.get(number, {})
+        records.append(
+            {
+                "id": str(number),
+                "question": question.get("question", "").strip() or "NA",
+                "answer": question.get("answer", "").strip() or "NA",
+            }
+        )
+    return records
@@ -0,0 +1,216 @@
+import contextlib
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from settings import SETTINGS
+
+
+def accept_encoding():
+    """
+    Return the Accept-Encoding header value for the installed decoders.
+
+    Brotli is only advertised when a brotli package is installed, because
+    urllib3 can't decode br responses without one.
+    """
+    for module in ("brotli", "brotlicffi"):
+        try:
+            __import__(module)
+            return "gzip, deflate, br"
+        except ImportError:
+            continue
+    return "gzip, deflate"
+
+
+class IdempotentRetry(Retry):
+    """
+    A Retry that never retries a non-idempotent request.
+
+    urllib3 retries connection errors whatever the method, so a POST would
+    be retried by the adapter and again by its caller. Such requests are
+    treated as if their retries were Retry(0): the first error is raised.
+    """
+
+    def increment(self, method=None, *args, **kwargs):
+        if method and method.upper() not in self.allowed_methods:
+            return Retry.increment(self.new(total=0), method, *args, **kwargs)
+        return super().increment(method, *args, **kwargs)
+
+
+class TransportSession(requests.Session):
+    """
+    A requests.Session that applies a default timeout to every request.
+
+    An explicit timeout argument, like the LLM's longer read timeout, still
+    takes precedence.
+    """
+
+    def __init__(self, timeout):
+        super().__init__()
+        self.timeout = timeout
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(pool_maxsize=None, max_retries=None, timeout=None):
+    """
+    Create a pooled, keep-alive session with retrying adapters.
+
+    Idempotent requests that hit a connection error or a 429/5xx response are
+    retried by the adapter with exponential backoff, honoring Retry-After.
+    POSTs are never retried by the adapter; LLMProcessor retries them itself,
+    so a failing LLM request is attempted LLM_MAX_RETRIES + 1 times in all.
+
+    Args:
+        pool_maxsize (int): Connections kept alive per host. Defaults to the
+            HTTP_POOL_MAXSIZE env var, or 16.
+        max_retries (int): Adapter-level retries. Defaults to the
+            HTTP_MAX_RETRIES env var, or 3.
+        timeout (tuple): Default (connect, read) timeouts in seconds. Defaults
+            to the HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT env vars, or (10, 30).
+
+    Returns:
+        TransportSession: The session.
+    """
+    pool_maxsize = pool_maxsize or int(SETTINGS.get("HTTP_POOL_MAXSIZE", 16))
+    if max_retries is None:
+        max_retries = int(SETTINGS.get("HTTP_MAX_RETRIES", 3))
+    timeout = timeout or (
+        float(SETTINGS.get("HTTP_CONNECT_TIMEOUT", 10)),
+        float(SETTINGS.get("HTTP_READ_TIMEOUT", 30)),
+    )
+    retry = IdempotentRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        status_forcelist=(429, 500, 502, 503, 504),
+        backoff_factor=float(SETTINGS.get("HTTP_BACKOFF_FACTOR", 0.5)),
+        respect_retry_after_header=True,
+        # Hand the final error response back instead of raising, so callers
+        # see the status code as before.
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=10, pool_maxsize=pool_maxsize, max_retries=retry
+    )
+    session = TransportSession(timeout)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers["Accept-Encoding"] = accept_encoding()
+    session.headers["Connection"] = "keep-alive"
+    return session
+
+
+_session = None
+_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the process-wide shared session, creating it on first use.
+
+    Scraper and LLMProcessor both use it unless they are given their own, so
+    connections to each host are pooled and reused across the whole run.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def set_session(session):
+    """
+    Replace the shared session, e.g. with a stand-in in tests or benchmarks.
+
+    Args:
+        session: An object with the requests.Session interface, or None to
+            create a fresh default session on next use.
+    """
+    global _session
+    with _lock:
+        _session = session
+
+
+class BufferedResponse:
+    """
+    A fully read response of the async transport, with the parts of the
+    requests.Response interface that Scraper and HttpCache use.
+    """
+
+    def __init__(self, url, status_code, headers, content, encoding=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding or "utf-8"
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(
+                f"{self.status_code} Error for url: {self.url}", response=self
+            )
+
+
+@contextlib.contextmanager
+def async_errors():
+    """
+    Re-raise aiohttp and asyncio errors as the requests exceptions they match.
+
+    Lets code shared by both engines handle network failures in one way.
+    """
+    import asyncio
+
+    import aiohttp
+
+    try:
+        yield
+    except asyncio.TimeoutError as e:
+        raise requests.Timeout(str(e) or "The request timed out") from e
+    except aiohttp.ClientError as e:
+        raise requests.ConnectionError(str(e)) from e
+
+
+def create_async_session(pool_maxsize=None, timeout=None):
+    """
+    Create the aiohttp session of the async engine.
+
+    Uses the same pool size, timeouts and Accept-Encoding header as
+    create_session(). Retries are left to the callers. Needs the optional
+    aiohttp package and a running event loop.
+
+    Args:
+        pool_maxsize (int): Connections kept open per host. Defaults to the
+            HTTP_POOL_MAXSIZE env var, or 16.
+        timeout (tuple): Default (connect, read) timeouts in seconds. Defaults
+            to the HTTP_CONNECT_TIMEOUT and HTTP_READ_TIMEOUT env vars, or (10, 30).
+
+    Returns:
+        aiohttp.ClientSession: The session; close it, or use it as an async
+            context manager.
+    """
+    import aiohttp
+
+    pool_maxsize = pool_maxsize or int(SETTINGS.get("HTTP_POOL_MAXSIZE", 16))
+    connect, read = timeout or (
+        float(SETTINGS.get("HTTP_CONNECT_TIMEOUT", 10)),
+        float(SETTINGS.get("HTTP_READ_TIMEOUT", 30)),
+    )
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=0, limit_per_host=pool_maxsize),
+        timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+        headers={"Accept-Encoding": accept_encoding()},
+    )
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import threading
+from collections.abc import Mapping
+
+logger = logging.getLogger(__name__)
+
+
+class TrialRecord(Mapping):
+    """
+    A scraped article whose abstract stays on disk until it is read.
+
+    Behaves like the read-only {"title", "abstract", "url"} dict the scraper
+    produces, so it can be batched, prompted and copied with
+    dict(record, abstract=...) like one. Only the title, the URL and the
+    record's byte offset in its TrialStore are kept in memory; every access to
+    the abstract reads it back from the store.
+    """
+
+    __slots__ = ("title", "url", "_store", "_offset")
+
+    FIELDS = ("title", "abstract", "url")
+
+    def __init__(self, title, url, store, offset):
+        self.title = title
+        self.url = url
+        self._store = store
+        self._offset = offset
+
+    @property
+    def abstract(self):
+        return self._store.read(self._offset)["abstract"]
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self):
+        return len(self.FIELDS)
+
+    def __repr__(self):
+        return f"TrialRecord(title={self.title!r}, url={self.url!r})"
+
+    def to_dict(self):
+        """Return the record as a plain dict, abstract included."""
+        return {"title": self.title, "abstract": self.abstract, "url": self.url}
+
+
+class TrialStore:
+    """
+    An append-only JSON Lines file of scraped records with a byte-offset index.
+
+    Each line holds one {"title", "abstract", "url"} record. Opening an
+    existing file scans it once to index every record's offset; after that,
+    records are TrialRecords whose abstracts are read back with a single seek.
+    Appends and reads are safe from several threads.
+    """
+
+    def __init__(self, path, truncate=False):
+        """
+        Open or create a store.
+
+        Args:
+            path (str): The JSON Lines file.
+            truncate (bool): Start a new, empty file instead of indexing and
+                appending to an existing one.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Append mode: writes always go to the end, reads seek freely.
+        self._file = open(path, "wb+" if truncate else "ab+")
+        self._lock = threading.Lock()
+        self._records = []
+        self._by_url = {}
+        if not truncate:
+            self._load_index()
+
+    def _load_index(self):
+        self._file.seek(0)
+        offset = 0
+        for line in self._file:
+            if line.strip():
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run; later appends
+                    # must not be glued onto it.
+                    logger.warning(
+                        f"Dropping a truncated record at byte {offset} of {self.path}"
+                    )
+                    self._file.truncate(offset)
+                    break
+                self._add(data["title"], data["url"], offset)
+            offset += len(line)
+
+    def _add(self, title, url, offset):
+        record = TrialRecord(title, url, self, offset)
+        self._records.append(record)
+        self._by_url[url] = record
+        return record
+
+    def append(self, record):
+        """
+        Append a scraped record to the file.
+
+        Args:
+            record (dict): A dictionary containing the article's title,
+                abstract and url. Other keys are not stored.
+
+        Returns:
+            TrialRecord: The stored record.
+        """
+        line = json.dumps(
+            {key: record[key] for key in TrialRecord.FIELDS}, ensure_ascii=False
+        )
+        with self._lock:
+            offset = self._file.seek(0, os.SEEK_END)
+            self._file.write(line.encode("utf-8") + b"\n")
+            self._file.flush()
+            return self._add(record["title"], record["url"], offset)
+
+    def extend(self, records):
+        """
+        Append every record of an iterable, e.g. a scraper's iter_trials().
+
+        Returns:
+            int: The number of records appended.
+        """
+        count = 0
+        for record in records:
+            self.append(record)
+            count += 1
+        return count
+
+    def read(self, offset):
+        """
+        Read the full record stored at a byte offset.
+
+        Args:
+            offset (int): The offset of the record's line.
+
+        Returns:
+            dict: The record, abstract included.
+        """
+        with self._lock:
+            self._file.seek(offset)
+            line = self._file.readline()
+        return json.loads(line)
+
+    def get(self, url):
+        """Return the record of an article URL, or None if it isn't stored."""
+        return self._by_url.get(url)
+
+    def __iter__(self):
+        return iter(list(self._records))
+
+    def __len__(self):
+        return len(self._records)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
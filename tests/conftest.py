@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+# The modules under test and the replay server are imported as top-level
+# modules, like the scripts in src/ and benchmarks/ do.
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
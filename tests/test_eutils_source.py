@@ -0,0 +1,51 @@
+import pytest
+
+from bench_eutils_source import normalized
+from eutils_source import EutilsScraper
+from replay_server import ReplayServer
+from scraper import Scraper
+
+ARTICLES = 30
+FIELDS = ("title", "abstract", "url")
+
+
+@pytest.fixture(scope="module")
+def server():
+    with ReplayServer(total_results=ARTICLES) as server:
+        yield server
+
+
+def scrape(scraper):
+    records = scraper.iter_trials("breast cancer", (ARTICLES + 9) // 10)
+    return {record["url"]: normalized(record) for record in records}
+
+
+def options(server):
+    return {
+        "cache": False,
+        "requests_per_second": 1e9,
+        "adaptive": False,
+        "base_url": server.url.rstrip("/"),
+    }
+
+
+def test_eutils_records_match_the_article_pages(server):
+    expected = scrape(Scraper(**options(server)))
+    efetches = server.requests["efetch"]
+    actual = scrape(
+        EutilsScraper(eutils_url=server.url, batch_size=7, **options(server))
+    )
+
+    assert len(expected) == ARTICLES
+    assert actual.keys() == expected.keys()
+    for url, record in expected.items():
+        for field in FIELDS:
+            assert actual[url][field] == record[field], (url, field)
+    # The articles were fetched in batches rather than one request each.
+    assert 1 < server.requests["efetch"] - efetches < ARTICLES
+
+
+def test_eutils_source_skips_the_article_pages(server):
+    pages = server.requests["article"]
+    scrape(EutilsScraper(eutils_url=server.url, batch_size=50, **options(server)))
+    assert server.requests["article"] == pages
@@ -0,0 +1,14 @@
+import pytest
+
+from bench_import_time import import_time, library_modules
+
+BUDGET_MS = 50
+REPEAT = 3
+
+
+@pytest.mark.parametrize("module", library_modules())
+def test_module_imports_within_budget(module):
+    runs = [import_time(module) for _ in range(REPEAT)]
+    assert None not in runs, f"importing {module} failed"
+    assert runs[0]["deferred"] == [], f"{module} loads {runs[0]['deferred']}"
+    assert min(run["own_ms"] for run in runs) <= BUDGET_MS
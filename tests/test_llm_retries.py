@@ -0,0 +1,55 @@
+import pytest
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from bench_llm_retries import run_case
+from replay_server import ReplayServer
+from transport import create_session
+
+MAX_RETRIES = 3
+RETRY_AFTER = 0.2
+
+
+@pytest.fixture(scope="module")
+def server():
+    with ReplayServer(chat_retry_after=RETRY_AFTER) as server:
+        yield server
+
+
+@pytest.fixture(autouse=True)
+def short_backoff(monkeypatch):
+    # Keep the backoff of errors without Retry-After short.
+    monkeypatch.setenv("LLM_BACKOFF_BASE", "0.05")
+
+
+def connection_error():
+    return NewConnectionError(None, "Connection refused")
+
+
+def test_adapter_does_not_retry_post_connection_errors():
+    retry = create_session().get_adapter("http://localhost/").max_retries
+    with pytest.raises(MaxRetryError):
+        retry.increment(method="POST", error=connection_error())
+
+
+def test_adapter_retries_get_connection_errors():
+    session = create_session(max_retries=MAX_RETRIES)
+    retry = session.get_adapter("http://localhost/").max_retries
+    retry = retry.increment(method="GET", error=connection_error())
+    assert retry.total == MAX_RETRIES - 1
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_recovers_after_throttling_and_server_errors(server, engine):
+    result = run_case(engine, server, [503, 429, 500], MAX_RETRIES)
+    assert result["error"] is None
+    assert result["attempts"] == 4
+    # The 503 and the 429 each carried a Retry-After delay.
+    assert result["seconds"] >= 2 * RETRY_AFTER
+
+
+@pytest.mark.parametrize("engine", ["threads", "async"])
+def test_gives_up_after_max_retries(server, engine):
+    result = run_case(engine, server, [429] * (MAX_RETRIES + 2), MAX_RETRIES)
+    assert result["error"]
+    # The transport adds no retries of its own to the LLM's.
+    assert result["attempts"] == MAX_RETRIES + 1
@@ -0,0 +1,33 @@
+from types import SimpleNamespace
+
+import pytest
+
+from bench_llm_stream import check_engine
+from replay_server import ReplayServer
+
+OPTIONS = SimpleNamespace(chunk_latency=0.005, abort_lines=40)
+
+
+@pytest.fixture(scope="module", params=["threads", "async"])
+def results(request):
+    """The early, parity and abort checks of one engine, by check name."""
+    with ReplayServer(stream_chunk_latency=OPTIONS.chunk_latency) as server:
+        results = check_engine(request.param, server, OPTIONS)
+    return {result["check"]: result for result in results}
+
+
+def test_lines_reach_on_line_while_streaming(results):
+    result = results["early"]
+    assert result["ok"], result["detail"]
+
+
+def test_streamed_completion_matches_the_plain_one(results):
+    result = results["parity"]
+    assert result["events"] > 0
+    assert result["ok"], result["detail"]
+
+
+def test_off_format_stream_is_abandoned(results):
+    result = results["abort"]
+    assert result["error"] is not None
+    assert result["ok"], result["detail"]
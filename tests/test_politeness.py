@@ -0,0 +1,21 @@
+from bench_politeness import bench_limiter
+from metrics import METRICS
+from replay_server import ReplayServer
+
+PAGES = 3
+THROTTLE_RATE = 15
+START_RATE = 50
+
+
+def test_adaptive_limiter_backs_off_when_throttled(monkeypatch):
+    monkeypatch.setenv("SCRAPER_MAX_REQUESTS_PER_SECOND", str(START_RATE))
+    with ReplayServer(total_results=PAGES * 10, throttle_rate=THROTTLE_RATE) as server:
+        result = bench_limiter("adaptive", PAGES, START_RATE, True, server)
+
+    # Every article was scraped despite the 429s...
+    assert result["articles"] == PAGES * 10
+    assert result["throttled"] >= 1
+    # The adapter retried the 429s, and the limiter was told about them.
+    assert METRICS.report()["counters"].get("http_throttled", 0) >= 1
+    # ...and the limiter slowed down below the rate that got it throttled.
+    assert result["final_rate"] < START_RATE